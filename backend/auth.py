@@ -0,0 +1,157 @@
+# -----------------------
+# Kimlik doğrulama (JWT)
+# -----------------------
+# Tüm korumalı route'lar @require_auth kullanır:
+#   - Authorization: Bearer <token> okunur, HS256 ile doğrulanır
+#   - Doğrulanmış token'lar sınırlı bir LRU'da tutulur (anahtar: token);
+#     süresi (exp) dolan girdi önbellekten de reddedilir
+#   - Kimlik flask.g üzerinde: g.user (payload), g.username, g.role
+#   - current_user_id(): token'daki user_id, yoksa username -> id önbelleği
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import jwt
+from dotenv import load_dotenv
+from flask import g, jsonify, request
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+
+import db
+from metrics import stage
+
+load_dotenv()
+
+JWT_SECRET = os.getenv("JWT_SECRET")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", "10000"))
+USER_ID_CACHE_TTL = int(os.getenv("USER_ID_CACHE_TTL", "600"))
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class _LruCache:
+    # key -> (expires_at, value); süresi dolan girdi okunurken silinir
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+token_cache = _LruCache(TOKEN_CACHE_SIZE)
+user_id_cache = _LruCache(USER_ID_CACHE_SIZE)
+
+
+def decode_token(token):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    except ExpiredSignatureError:
+        raise AuthError("Token süresi dolmuş")
+    except InvalidTokenError:
+        raise AuthError("Geçersiz token")
+    # exp'siz token'lar önbelleğe alınmaz (her seferinde doğrulanır)
+    if "exp" in payload:
+        token_cache.put(token, payload, payload["exp"])
+    return payload
+
+
+def authenticate(auth_header):
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise AuthError("Token eksik")
+    payload = decode_token(auth_header.split(" ", 1)[1])
+    if not payload.get("username"):
+        raise AuthError("Geçersiz token")
+    return payload
+
+
+def require_auth(fn=None, *, allow_query_token=False):
+    # allow_query_token: EventSource header gönderemez, ?token= kabul edilir
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # CORS ön kontrolü token taşımaz
+            if request.method == "OPTIONS":
+                return view(*args, **kwargs)
+            auth_header = request.headers.get("Authorization")
+            if not auth_header and allow_query_token and request.args.get("token"):
+                auth_header = f"Bearer {request.args.get('token')}"
+            try:
+                with stage("auth"):
+                    payload = authenticate(auth_header)
+            except AuthError as e:
+                return jsonify({"error": e.message}), e.status
+            g.user = payload
+            g.username = payload["username"]
+            g.role = payload.get("role", "user")
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator(fn) if fn else decorator
+
+
+def remember_user_id(username, user_id):
+    user_id_cache.put(username, user_id, time.time() + USER_ID_CACHE_TTL)
+
+
+def lookup_user_id(username):
+    user_id = user_id_cache.get(username)
+    if user_id is None:
+        cursor = db.get_db().cursor()
+        cursor.execute("SELECT id FROM users WHERE username=%s", (username,))
+        row = cursor.fetchone()
+        if not row:
+            # Bulunamayan kullanıcı önbelleğe yazılmaz (sonradan kayıt olabilir)
+            return None
+        user_id = row[0]
+        remember_user_id(username, user_id)
+    return user_id
+
+
+def current_user_id():
+    # Yeni token'larda user_id payload'dadır; eski token'lar için önbellekli sorgu
+    if "user_id" not in g:
+        g.user_id = g.user.get("user_id") or lookup_user_id(g.username)
+    return g.user_id
+
+
+def cache_stats():
+    return {"tokens": token_cache.stats(), "user_ids": user_id_cache.stats()}
@@ -0,0 +1,180 @@
+# -----------------------
+# Toplu tahlil analizi (klinik yüklemeleri)
+# -----------------------
+# Tek istekte N PDF veya PDF içeren zip:
+#   - Dosyalar parça parça geçici dosyalara yazılır (zip üyeleri dahil)
+#   - Çıkarma + regex lab değeri taraması süreç havuzunda paralel
+#     (jobs.InProcessJobQueue.submit_in_process)
+#   - Gemini çağrıları BATCH_GEMINI_CONCURRENCY ile sınırlı (sohbet trafiği
+#     paylaşılan istemcinin slotlarını kaybetmesin)
+#   - Sonuçlar bittikçe tek tek üretilir (route NDJSON olarak akıtır)
+# Tek dosyanın hatası (bozuk PDF, boyut, tür) yalnızca o satırı "failed" yapar.
+import os
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from lab_parser import extract_summary, save_stream_to_temp
+from pdf_analysis import AI_ERROR_REPLY, analyze_pdf, format_pdf_reply
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", str(20 * 1024 * 1024)))
+BATCH_GEMINI_CONCURRENCY = int(os.getenv("BATCH_GEMINI_CONCURRENCY", "4"))
+
+BatchItem = namedtuple("BatchItem", "index filename path digest error")
+
+
+class BatchTooLarge(Exception):
+    pass
+
+
+def _add_item(items, filename, path=None, digest=None, error=None, max_files=BATCH_MAX_FILES):
+    if len(items) >= max_files:
+        if path:
+            os.remove(path)
+        raise BatchTooLarge(f"En fazla {max_files} dosya gönderilebilir")
+    items.append(BatchItem(len(items), filename, path, digest, error))
+
+
+def _add_upload(items, filename, stream, max_files, max_file_bytes):
+    path, digest = save_stream_to_temp(stream)
+    if os.path.getsize(path) > max_file_bytes:
+        os.remove(path)
+        _add_item(items, filename, error="Dosya çok büyük", max_files=max_files)
+    else:
+        _add_item(items, filename, path, digest, max_files=max_files)
+
+
+def _add_zip(items, filename, stream, max_files, max_file_bytes):
+    zip_path, _ = save_stream_to_temp(stream, suffix=".zip")
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or os.path.basename(info.filename).startswith("."):
+                    continue
+                name = f"{filename}/{info.filename}"
+                if not info.filename.lower().endswith(".pdf"):
+                    _add_item(items, name, error="Desteklenmeyen dosya türü", max_files=max_files)
+                elif info.file_size > max_file_bytes:
+                    # Açılmadan reddedilir; okuma da bildirilen boyutla sınırlı
+                    _add_item(items, name, error="Dosya çok büyük", max_files=max_files)
+                else:
+                    with archive.open(info) as member:
+                        _add_upload(items, name, member, max_files, max_file_bytes)
+    except zipfile.BadZipFile:
+        _add_item(items, filename, error="Zip dosyası okunamadı", max_files=max_files)
+    finally:
+        os.remove(zip_path)
+
+
+def collect_batch_files(files, max_files=BATCH_MAX_FILES, max_file_bytes=BATCH_MAX_FILE_BYTES):
+    # files: request.files.getlist(...) (FileStorage listesi). BatchItem listesi döner;
+    # sınır aşılırsa o ana kadar yazılan geçici dosyalar silinip BatchTooLarge yükselir.
+    items = []
+    try:
+        for storage in files:
+            filename = storage.filename or "dosya"
+            lower = filename.lower()
+            if lower.endswith(".zip"):
+                _add_zip(items, filename, storage.stream, max_files, max_file_bytes)
+            elif lower.endswith(".pdf"):
+                _add_upload(items, filename, storage.stream, max_files, max_file_bytes)
+            else:
+                _add_item(items, filename, error="Desteklenmeyen dosya türü", max_files=max_files)
+    except BaseException:
+        discard(items)
+        raise
+    return items
+
+
+def discard(items):
+    for item in items:
+        if item.path and os.path.exists(item.path):
+            os.remove(item.path)
+
+
+def failed_result(item, error, started=None):
+    return {
+        "type": "item",
+        "index": item.index,
+        "filename": item.filename,
+        "status": "failed",
+        "error": error,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000) if started else 0
+    }
+
+
+class BatchAnalyzer:
+    # submit_extract(fn, path) -> Future (süreç havuzu); generate(prompt) -> str
+    def __init__(self, submit_extract, generate, processes, gemini_concurrency=BATCH_GEMINI_CONCURRENCY):
+        self.submit_extract = submit_extract
+        self.generate = generate
+        # Çıkarma ve Gemini aşamaları aynı anda dolu kalabilsin
+        self.workers = max(1, processes) + max(1, gemini_concurrency)
+        self._semaphore = threading.BoundedSemaphore(max(1, gemini_concurrency))
+
+    def _extract(self, path):
+        return self.submit_extract(extract_summary, path).result()
+
+    def _generate(self, prompt):
+        with self._semaphore:
+            return self.generate(prompt)
+
+    def _analyze(self, item):
+        started = time.perf_counter()
+        try:
+            analysis, cached = analyze_pdf(item.path, item.digest, extract=self._extract, generate=self._generate)
+        except Exception as e:
+            print("Toplu PDF okuma hatası:", item.filename, e)
+            return failed_result(item, "PDF okunamadı", started)
+        finally:
+            os.remove(item.path)
+        return {
+            "type": "item",
+            "index": item.index,
+            "filename": item.filename,
+            "status": "done",
+            "reply": format_pdf_reply(analysis),
+            "referans_disi": analysis["referans_disi"],
+            "cached": cached,
+            "ai_ok": analysis["ai_reply"] != AI_ERROR_REPLY,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000)
+        }
+
+    def run(self, items):
+        # Sonuçları bitiş sırasıyla üretir. Üretici erken kapatılırsa (istemci koptu)
+        # başlamamış işler iptal edilir ve geçici dosyaları silinir.
+        for item in items:
+            if item.error:
+                yield failed_result(item, item.error)
+        pending_items = [item for item in items if not item.error]
+        if not pending_items:
+            return
+        pool = ThreadPoolExecutor(max_workers=min(self.workers, len(pending_items)),
+                                  thread_name_prefix="batch-pdf")
+        futures = {pool.submit(self._analyze, item): item for item in pending_items}
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future, item in futures.items():
+                if future.cancel():
+                    discard([item])
+            pool.shutdown(wait=False)
+
+
+def summarize(results, started):
+    failed = sum(1 for r in results if r["status"] == "failed")
+    return {
+        "type": "summary",
+        "total": len(results),
+        "done": len(results) - failed,
+        "failed": failed,
+        "cached": sum(1 for r in results if r.get("cached")),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000)
+    }
@@ -0,0 +1,91 @@
+# -----------------------
+# Toplu PDF analizi throughput benchmark'ı
+# -----------------------
+# --files sentetik tahlil PDF'i üretir, gecikme enjekte edilmiş sahte Gemini'ye karşı:
+#   sıralı  : /upload_pdf'in yaptığı gibi dosya dosya analyze_pdf
+#   toplu   : batch_analysis.BatchAnalyzer (süreç havuzu + sınırlı Gemini eşzamanlılığı)
+# PDF önbelleği kapalıdır (her dosya çıkarma + Gemini çağrısı yapar).
+# Kullanım: python bench/bench_batch.py --files 40 --pages 5 --latency 0.5 --processes 4 --gemini 4
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pdf_parser import make_synthetic_pdf  # noqa: E402
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="sahte Gemini gecikmesi (sn)")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--gemini", type=int, default=4, help="toplu Gemini eşzamanlılığı")
+    args = parser.parse_args()
+
+    server, base = start_fake_gemini(latency=args.latency)
+    # Modüller env okunduktan sonra yüklenmeli
+    os.environ["GEMINI_API_BASE"] = base
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ["PDF_CACHE"] = "off"
+    from batch_analysis import BatchAnalyzer, BatchItem  # noqa: E402
+    from gemini_client import client as gemini  # noqa: E402
+    from lab_parser import save_stream_to_temp  # noqa: E402
+    from pdf_analysis import analyze_pdf  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as directory:
+        sources = []
+        for i in range(args.files):
+            path = os.path.join(directory, f"rapor{i}.pdf")
+            make_synthetic_pdf(path, args.pages, seed=i)
+            sources.append(path)
+
+        def copies():
+            # Her iki yol da geçici kopyaları siler; kaynaklar korunur
+            items = []
+            for i, source in enumerate(sources):
+                with open(source, "rb") as f:
+                    path, digest = save_stream_to_temp(f)
+                items.append(BatchItem(i, os.path.basename(source), path, digest, None))
+            return items
+
+        start = time.perf_counter()
+        for item in copies():
+            try:
+                analyze_pdf(item.path, item.digest)
+            finally:
+                os.remove(item.path)
+        sequential = time.perf_counter() - start
+        calls = server.request_count
+
+        pool = ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context("spawn"))
+        list(pool.map(abs, range(args.processes)))  # süreçleri ısıt (spawn maliyeti ölçüme girmesin)
+        analyzer = BatchAnalyzer(pool.submit, gemini.generate, args.processes, args.gemini)
+        items = copies()
+        start = time.perf_counter()
+        first = None
+        results = []
+        for result in analyzer.run(items):
+            first = first or time.perf_counter() - start
+            results.append(result)
+        batch = time.perf_counter() - start
+        pool.shutdown()
+
+    failed = sum(1 for r in results if r["status"] != "done")
+    print(f"{args.files} PDF x {args.pages} sayfa, Gemini gecikmesi {args.latency}s, "
+          f"{args.processes} süreç, Gemini eşzamanlılığı {args.gemini}")
+    print(f"  sıralı   {sequential:7.2f}s  {args.files / sequential:6.2f} dosya/sn  ({calls} Gemini çağrısı)")
+    print(f"  toplu    {batch:7.2f}s  {args.files / batch:6.2f} dosya/sn  "
+          f"(ilk sonuç {first * 1000:.0f} ms, {failed} hata)  {sequential / batch:.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# -----------------------
+# Gemini single-flight (aynı prompt birleştirme) eşzamanlılık testi
+# -----------------------
+# Gecikmeli sahte Gemini'ye karşı N thread aynı anda (Barrier) çağrı yapar:
+#   1) aynı prompt (yarısı farklı boşluklarla)  -> tam 1 upstream çağrısı, herkes aynı cevap
+#   2) aynı prompt, upstream 400                -> tam 1 upstream çağrısı, herkes HTTP 400 alır
+#                                                  (her bekleyen kendi exception nesnesini)
+#   3) farklı prompt'lar                        -> N upstream çağrısı (birleştirme yok)
+#   4) kısa süreli bekleyenler (SingleFlight)   -> kendi sürelerinde UpstreamUnavailable, lider cevabı alır
+#   5) aynı prompt, farklı deneme politikası    -> politika başına 1 upstream çağrısı
+#   6) uygulama üzerinden: N kullanıcı aynı PDF'i (PDF_CACHE=off) ve aynı hazır soruyu
+#      POST /upload_pdf ve POST /chat/<id> ile aynı anda gönderir -> her biri tam 1 upstream çağrısı
+# PostgreSQL gerekmez (bellek içi sohbet deposu, boş profil).
+# Kullanım: python bench/bench_coalesce.py --concurrency 50 --latency 0.5
+import argparse
+import datetime
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pdf_parser import make_synthetic_pdf  # noqa: E402
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+def check(label, ok, detail):
+    print(f"  [{'OK' if ok else 'HATA'}] {label}: {detail}")
+    return ok
+
+
+class Fault:
+    def __init__(self, latency):
+        self.latency = latency
+        self.status = None
+
+
+def run_together(fn, args_list):
+    # Tüm çağrılar Barrier'da buluşup aynı anda başlar; (sonuç | exception) listesi döner
+    barrier = threading.Barrier(len(args_list))
+
+    def call(args):
+        barrier.wait()
+        started = time.perf_counter()
+        try:
+            return fn(*args), time.perf_counter() - started
+        except Exception as e:
+            return e, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=len(args_list)) as pool:
+        return list(pool.map(call, args_list))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    n = args.concurrency
+
+    fault = Fault(args.latency)
+    fake, base = start_fake_gemini(latency=lambda: fault.latency, fail_status=lambda: fault.status)
+    os.environ.update({"GEMINI_API_BASE": base, "GEMINI_API_KEY": "bench", "GEMINI_COALESCE": "1",
+                       "PDF_CACHE": "off"})
+    os.environ.setdefault("CHAT_STORE", "memory")
+    os.environ.setdefault("JWT_SECRET", "bench-secret-bench-secret-bench-secret")
+    import server  # noqa: E402
+    from gemini_client import GeminiClient  # noqa: E402
+    from profile_cache import build_profile_context  # noqa: E402
+    from resilience import RetryPolicy, SingleFlight, UpstreamUnavailable  # noqa: E402
+
+    client = GeminiClient(api_base=base, api_key="bench", max_concurrency=n, pool_size=n)
+    prompt = "Tahlil raporu:\n    Hemoglobin 11.2 g/dL (12-16)\n    Ferritin 8 ng/mL (15-150)\n"
+    variant = "  Tahlil raporu: Hemoglobin 11.2 g/dL (12-16)\n\n Ferritin 8 ng/mL (15-150)"
+    print(f"{n} eşzamanlı çağrı, upstream gecikmesi {args.latency} sn")
+    passed = True
+
+    def upstream_calls(fn):
+        before = fake.request_count
+        results = fn()
+        return results, fake.request_count - before
+
+    results, calls = upstream_calls(lambda: run_together(client.generate, [(prompt if i % 2 else variant,)
+                                                                           for i in range(n)]))
+    replies = {r for r, _ in results if isinstance(r, str)}
+    slowest = max(t for _, t in results)
+    passed &= check("aynı prompt", calls == 1 and len(replies) == 1 and all(isinstance(r, str) for r, _ in results),
+                    f"{n} çağrı -> {calls} upstream çağrısı, {len(replies)} farklı cevap, en yavaş {slowest:.2f} sn")
+
+    fault.status = 400
+    results, calls = upstream_calls(lambda: run_together(client.generate, [(prompt,)] * n))
+    errors = [r for r, _ in results if isinstance(r, requests.HTTPError)]
+    distinct = len({id(e) for e in errors})
+    passed &= check("aynı hata", calls == 1 and len(errors) == n and distinct == n
+                    and all(e.response.status_code == 400 for e in errors),
+                    f"{calls} upstream çağrısı, {len(errors)}/{n} çağıran HTTP 400 aldı, "
+                    f"{distinct} ayrı exception nesnesi")
+    fault.status = None
+
+    results, calls = upstream_calls(lambda: run_together(client.generate, [(f"{prompt} #{i}",) for i in range(n)]))
+    passed &= check("farklı prompt'lar", calls == n, f"{n} çağrı -> {calls} upstream çağrısı")
+
+    # Lider uzun süreyle başlar; bekleyenler 0.2 sn sonra vazgeçer, lider cevabı alır.
+    # İstemci politikayı anahtara kattığı için bekleme süresi SingleFlight üzerinde denenir
+    patient = RetryPolicy(attempts=1, deadline=args.latency * 4)
+    flight = SingleFlight("bench")
+    slow = f"{prompt} (uzun)"
+    results_leader = []
+    leader = threading.Thread(target=lambda: results_leader.append(
+        flight.do(slow, lambda: client.generate(slow, retry=patient), timeout=patient.deadline)))
+    before = fake.request_count
+    leader.start()
+    time.sleep(0.05)
+    results = run_together(lambda: flight.do(slow, lambda: client.generate(slow, retry=patient), timeout=0.2),
+                           [()] * (n - 1))
+    leader.join()
+    timed_out = [t for r, t in results if isinstance(r, UpstreamUnavailable)] or [float("inf")]
+    passed &= check("anahtar zaman aşımı",
+                    len(timed_out) == n - 1 and max(timed_out) < 0.2 + 0.15 and len(results_leader) == 1
+                    and fake.request_count - before == 1,
+                    f"{len(timed_out)}/{n - 1} bekleyen {max(timed_out):.2f} sn'de vazgeçti, "
+                    f"lider cevabı {'aldı' if results_leader else 'ALMADI'}, "
+                    f"{fake.request_count - before} upstream çağrısı")
+
+    # Sohbet (varsayılan) ve arka plan işi politikaları birbirinin çağrısına katılmaz
+    job = RetryPolicy(attempts=3, base_delay=0.5, max_delay=8.0)
+    results, calls = upstream_calls(lambda: run_together(
+        lambda policy: client.generate(prompt, retry=policy), [(None if i % 2 else job,) for i in range(n)]))
+    passed &= check("farklı politika", calls == 2 and all(isinstance(r, str) for r, _ in results),
+                    f"{n} çağrı (2 politika) -> {calls} upstream çağrısı")
+    print(f"  istemci: {client.coalescer.stats()}")
+
+    # Uygulama üzerinden (paylaşılan server.gemini istemcisi)
+    server.profile_cache.loader = lambda username: build_profile_context(None)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}"
+
+    def token(i):
+        return jwt.encode({
+            "username": f"coalesce_user{i}", "role": "user", "user_id": i + 1,
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        }, server.JWT_SECRET, algorithm="HS256")
+    headers = [{"Authorization": f"Bearer {token(i)}"} for i in range(n)]
+
+    pdf_path = os.path.join(tempfile.mkdtemp(prefix="chatdoc-coalesce-"), "sablon.pdf")
+    make_synthetic_pdf(pdf_path, 2, seed=7)
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    def upload(i):
+        return requests.post(f"{url}/upload_pdf", files={"pdf": ("sablon.pdf", pdf_bytes, "application/pdf")},
+                             headers=headers[i], timeout=60)
+
+    def ask(i):
+        return requests.post(f"{url}/chat/1", json={"message": "Kansızlık için ne yemeliyim?"},
+                             headers=headers[i], timeout=60)
+
+    shared = server.gemini.coalescer
+    for label, fn in (("POST /upload_pdf", upload), ("POST /chat", ask)):
+        coalesced = shared.stats()["coalesced"]
+        results, calls = upstream_calls(lambda: run_together(fn, [(i,) for i in range(n)]))
+        ok = [r for r, _ in results if isinstance(r, requests.Response) and r.status_code == 200]
+        replies = {r.json()["reply"] for r in ok}
+        passed &= check(label, calls == 1 and len(ok) == n and len(replies) == 1,
+                        f"{len(ok)}/{n} başarılı, {calls} upstream çağrısı, "
+                        f"{shared.stats()['coalesced'] - coalesced} birleştirilen")
+    print(f"  uygulama: {shared.stats()}")
+
+    httpd.shutdown()
+    fake.shutdown()
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -----------------------
+# Konuşma bağlamı boyutu benchmark'ı
+# -----------------------
+# Sentetik sohbetler (kısa/uzun sorular, ~200 kelimelik cevaplar, arada
+# [PDF Analizi] mesajları) MemoryChatStore'a tur tur yazılır. Her turda:
+#   eski : son 10 mesaj olduğu gibi
+#   yeni : context_builder.build_context (bütçe + özet + PDF indirgeme)
+# "Konuşma geçmişi" bölümünün yaklaşık token dağılımı (p50/p90/p99/max) raporlanır.
+# Kullanım: python bench/bench_context.py --chats 200 --turns 40 --budget 1500
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_store import MemoryChatStore  # noqa: E402
+from context_builder import build_context, estimate_tokens  # noqa: E402
+from pdf_analysis import format_pdf_reply  # noqa: E402
+
+WORDS = ("baş ağrısı ateş öksürük halsizlik uyku iştah tansiyon şeker kolesterol vitamin "
+         "egzersiz beslenme su ilaç doktor tahlil değer yüksek düşük normal hafif şiddetli "
+         "sabah akşam gün hafta ay yıl").split()
+TESTS = ["Hemoglobin", "Glukoz", "Ferritin", "TSH", "Kolesterol", "Kreatinin", "Sodyum"]
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def reply(rng):
+    return " ".join(sentence(rng, rng.randint(8, 16)) for _ in range(rng.randint(10, 18)))
+
+
+def pdf_reply(rng):
+    flagged = [f"{t} {rng.choice(['yüksek', 'düşük'])} ({rng.uniform(1, 300):.1f} mg/dL, ref: 10-200)"
+               for t in rng.sample(TESTS, rng.randint(0, 4))]
+    return format_pdf_reply({"referans_disi": flagged, "ai_reply": reply(rng) + " " + reply(rng)})
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p * len(values)))]  # noqa: E731
+    return pick(0.5), pick(0.9), pick(0.99), values[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--pdf-rate", type=float, default=0.1, help="turda PDF yükleme olasılığı")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    store = MemoryChatStore()
+    old_sizes, new_sizes = [], []
+    for chat in range(args.chats):
+        username = f"user{chat}"
+        store.ensure_default_chat(username)
+        for _ in range(rng.randint(1, args.turns)):
+            if rng.random() < args.pdf_rate:
+                store.append(username, 1, "user", "[PDF dosyası yüklendi] tahlil.pdf")
+                store.append(username, 1, "bot", f"[PDF Analizi]\n{pdf_reply(rng)}")
+            store.append(username, 1, "user", sentence(rng, rng.choice([6, 12, 40])))
+
+            history = store.get_messages(username, 1, limit=10)
+            old_sizes.append(estimate_tokens("".join(f"{m['sender'].capitalize()}: {m['text']}\n" for m in history)))
+            new_sizes.append(build_context(store, username, 1, budget=args.budget).tokens)
+
+            store.append(username, 1, "bot", reply(rng))
+
+    print(f"{len(old_sizes)} tur, {args.chats} sohbet, bütçe {args.budget} token (yaklaşık)")
+    for label, sizes in (("eski (son 10 mesaj)", old_sizes), ("yeni (bütçe + özet)", new_sizes)):
+        p50, p90, p99, top = percentiles(sizes)
+        print(f"  {label:<22} p50 {p50:6d}  p90 {p90:6d}  p99 {p99:6d}  max {top:6d}")
+
+
+if __name__ == "__main__":
+    main()
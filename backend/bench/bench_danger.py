@@ -0,0 +1,121 @@
+# -----------------------
+# Tehlikeli ifade eşleştirme micro-benchmark'ı
+# -----------------------
+# Eski döngü (any(word in msg.lower() ...)) ile derlenmiş PhraseMatcher'ı
+# farklı ifade sayılarında karşılaştırır. Mesajların bir kısmına büyük harfli
+# ifade eklenir; eski döngünün kaçırdığı eşleşmeler (ör. "BAYILMA") sayılarda görünür.
+# Önce sabit örneklerle doğruluk kontrol edilir: eşleşmesi gerekenler (büyük harf,
+# aksansız yazım, ekli biçimler: "kalp krizim") ve gerekmeyenler (katlanınca "sok"
+# ile başlayan "sokak", "soktum"; kelime ortası). Hata varsa çıkış kodu 1.
+# Kullanım: python bench/bench_danger.py --phrases 34 1000 5000 --messages 2000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from danger import PhraseMatcher  # noqa: E402
+
+
+def check(label, ok, detail):
+    print(f"  [{'OK' if ok else 'HATA'}] {label}: {detail}")
+    return ok
+
+BASE_PHRASES = [
+    "göğüs ağrısı", "çarpıntı", "nefes darlığı", "bayılma", "hipotansiyon",
+    "kalp krizi", "kalp durması", "nabız düşüklüğü", "felç", "baş dönmesi",
+    "nöbet", "astım krizi", "şiddetli karın ağrısı", "kusma", "kan kusmak",
+    "intihar", "kendime zarar", "zehirlen", "anafilaksi", "bilinç kaybı", "şok$",
+    "şiddetli kanama",
+]
+# (mesaj, eşleşmeli mi)
+CASES = [
+    ("ŞOK geçiriyor galiba", True),
+    ("anafilaktik değil ama şok!", True),
+    ("gogus agrisi var", True),
+    ("dün gece zehirlendim", True),
+    ("intihara teşebbüs", True),
+    ("NÖBET geçirdi", True),
+    # Ekli biçimler (ifade kelime başında eşleşir, sonu açık)
+    ("göğüs ağrısım var", True),
+    ("nefes darlığım var", True),
+    ("kalp krizim oluyor", True),
+    ("bayılmak üzereyim", True),
+    ("kusmam durmuyor", True),
+    ("nöbetim geldi", True),
+    ("şiddetli kanamam var", True),
+    ("çarpıntım var", True),
+    ("bilinç kaybım oldu", True),
+    # "şok$" tam kelime: katlanınca "sok" ile başlayan kelimeler eşleşmez
+    ("sokakta yürürken", False),
+    ("ilacı ağzına soktum", False),
+    ("iğne sokuldu", False),
+    ("şoklama tedavisi sordum", False),
+    # Kelime ortası eşleşmez
+    ("antihipotansiyon ilacı kullanıyorum", False),
+]
+WORDS = ("dün akşam başım ağrıyor midem bulanıyor uyuyamıyorum ateşim var "
+         "boğazım yanıyor öksürük halsizlik yorgunluk sırt ağrısı iştahsızlık").split()
+SYLLABLES = ["ka", "rı", "nö", "şi", "ğü", "ba", "ta", "mı", "lo", "ze", "fu", "çe"]
+
+
+def synthetic_phrases(count, rng):
+    phrases = list(BASE_PHRASES)
+    while len(phrases) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5)))
+        phrases.append(word + " " + rng.choice(BASE_PHRASES).split()[-1])
+    return phrases[:count]
+
+
+def synthetic_messages(count, rng):
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 40))]
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words)), rng.choice(BASE_PHRASES).upper())
+        messages.append(" ".join(words))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--phrases", type=int, nargs="+", default=[34, 1000, 5000])
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    passed = True
+    matcher = PhraseMatcher(BASE_PHRASES)
+    print("doğruluk")
+    for message, expected in CASES:
+        found = [m.phrase for m in matcher.find_all(message)]
+        passed &= check(message, bool(found) == expected, found or "eşleşme yok")
+
+    rng = random.Random(42)
+    messages = synthetic_messages(args.messages, rng)
+    print(f"{args.messages} mesaj")
+    for count in args.phrases:
+        phrases = synthetic_phrases(count, rng)
+
+        start = time.perf_counter()
+        words = [phrase.rstrip("$") for phrase in phrases]
+        loop_hits = sum(any(word in msg.lower() for word in words) for msg in messages)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher = PhraseMatcher(phrases)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ac_hits = sum(matcher.search(msg) for msg in messages)
+        ac_time = time.perf_counter() - start
+
+        print(f"  {count:>5} ifade: döngü {loop_time * 1e6 / len(messages):8.1f} µs/mesaj ({loop_hits} eşleşme) | "
+              f"otomat {ac_time * 1e6 / len(messages):8.1f} µs/mesaj ({ac_hits} eşleşme), "
+              f"derleme {build_time * 1000:.1f} ms")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
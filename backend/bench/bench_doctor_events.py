@@ -0,0 +1,169 @@
+# -----------------------
+# Doktora Sor: polling vs SSE push yük testi
+# -----------------------
+# Uygulamayı thread'li werkzeug sunucusunda başlatır, N istemci bağlar ve
+# PostgreSQL'in işlem sayacından (pg_stat_database) DB işlem/sn değerini ölçer.
+#   poll: her istemci eski frontend gibi 3 sn'de bir /my-questions + mesajları çeker
+#   push: her istemci /events'e bağlanır, yalnızca olay gelince yeniden çeker
+# Bir "doktor" thread'i --interval saniyede bir soruya cevap yazar (olay üretir).
+# Tüm istemciler aynı kullanıcıdır: her olay N istemcinin hepsine gider (en kötü
+# durum). Olay yokken push modunda DB yükü ~0'dır (--interval 0: doktor yazmaz).
+# werkzeug sunucusunun thread sınırı yok: EVENT_MAX_SUBSCRIPTIONS verilmezse abonelik
+# sınırı --clients'a yükseltilir. Sınırda 503 alan (veya bağlanamayan) istemciler
+# reddedildi olarak raporlanır.
+# .env'deki veritabanında --username kullanıcısına ait --question sorusu olmalı.
+# Kullanım: DB_MAX_CONN=64 python bench/bench_doctor_events.py --clients 1000 --question 1
+import argparse
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import jwt
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import server  # noqa: E402
+
+
+def make_token(username, role):
+    return jwt.encode({
+        "username": username,
+        "role": role,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, server.JWT_SECRET, algorithm="HS256")
+
+
+def db_transactions():
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = current_database()"
+        )
+        return cursor.fetchone()[0]
+
+
+def refetch(session, base, headers, question_id):
+    session.get(f"{base}/my-questions", headers=headers, timeout=30)
+    session.get(f"{base}/doctor-question/{question_id}/messages", headers=headers, timeout=30)
+
+
+def poll_client(base, token, question_id, stop, period):
+    session = requests.Session()
+    headers = {"Authorization": f"Bearer {token}"}
+    # İstemciler aynı anda başlamasın
+    stop.wait(random.uniform(0, period))
+    while not stop.is_set():
+        try:
+            refetch(session, base, headers, question_id)
+        except requests.RequestException:
+            pass
+        stop.wait(period)
+
+
+def push_client(base, token, question_id, stop, received, refused):
+    # Abonelik sınırında 503 alan istemci sayılır (ölçülen push yükü yalnızca bağlananlarındır)
+    session = requests.Session()
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        response = session.get(f"{base}/events", params={"token": token}, stream=True, timeout=(5, None))
+    except requests.RequestException as e:
+        refused.append(type(e).__name__)
+        return
+    if response.status_code != 200:
+        refused.append(response.status_code)
+        response.close()
+        return
+    try:
+        with response:
+            response.encoding = "utf-8"
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if stop.is_set():
+                    break
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif not line and event:
+                    # Frontend davranışı: "ready" ve her olayda ilgili soruyu yeniden çek
+                    if event != "ready":
+                        received.append(event)
+                    refetch(session, base, headers, question_id)
+                    event = None
+    except requests.RequestException:
+        pass
+
+
+def doctor_writer(base, token, question_id, stop, interval):
+    headers = {"Authorization": f"Bearer {token}"}
+    n = 0
+    while not stop.wait(interval):
+        n += 1
+        requests.post(f"{base}/doctor-question/{question_id}/messages",
+                      data={"message": f"bench cevap {n}"}, headers=headers, timeout=30)
+
+
+def run(mode, args, base, user_token, doctor_token):
+    stop = threading.Event()
+    received, refused = [], []
+    for _ in range(args.clients):
+        if mode == "poll":
+            target = poll_client, (base, user_token, args.question, stop, args.period)
+        else:
+            target = push_client, (base, user_token, args.question, stop, received, refused)
+        threading.Thread(target=target[0], args=target[1], daemon=True).start()
+    # Bağlantı kurulumu ve ilk çekimler ölçüme girmesin
+    time.sleep(args.warmup)
+
+    if args.interval > 0:
+        threading.Thread(target=doctor_writer,
+                         args=(base, doctor_token, args.question, stop, args.interval), daemon=True).start()
+    before = db_transactions()
+    time.sleep(args.duration)
+    after = db_transactions()
+    stop.set()
+    # Sayaç sorgularının kendisi (2 işlem) düşülür
+    rate = (after - before - 2) / args.duration
+    print(f"  {mode:<4} {args.clients:>5} istemci: {rate:9.1f} DB işlem/sn"
+          + (f" ({len(received)} olay teslim edildi, {args.clients - len(refused)} bağlı, "
+             f"{len(refused)} reddedildi)" if mode == "push" else ""))
+    if refused:
+        print(f"       reddedilenler: {dict(Counter(refused))} (EVENT_MAX_SUBSCRIPTIONS, gunicorn.events.conf.py)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--question", type=int, required=True)
+    parser.add_argument("--username", default="bench_user")
+    parser.add_argument("--doctor", default="bench_doctor")
+    parser.add_argument("--period", type=float, default=3.0, help="eski polling aralığı (sn)")
+    parser.add_argument("--interval", type=float, default=30.0, help="doktor cevap aralığı (sn), 0 = hiç")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=10.0)
+    parser.add_argument("--modes", nargs="+", default=["poll", "push"])
+    args = parser.parse_args()
+
+    if "EVENT_MAX_SUBSCRIPTIONS" not in os.environ:
+        server.event_slots = threading.BoundedSemaphore(args.clients)
+    httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    user_token = make_token(args.username, "user")
+    doctor_token = make_token(args.doctor, "doctor")
+
+    print(f"{args.duration:.0f} sn ölçüm, doktor cevabı aralığı {args.interval:.0f} sn, olay backend: "
+          f"{server.event_bus.stats()['backend']}")
+    for mode in args.modes:
+        run(mode, args, base, user_token, doctor_token)
+        time.sleep(2)
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# -----------------------
+# Doktor gelen kutusu sorgu benchmark'ı
+# -----------------------
+# Ayrı bir şemada (varsayılan bench_inbox) sentetik veri üretir: --questions soru,
+# soru başına --messages mesaj, --doctors doktora eşit dağılmış. Sonra bir
+# doktorun gelen kutusu için:
+#   eski      : soru başına iki korelasyonlu alt sorgu (index yok / index var)
+#   yeni      : migration 003 sütunları + keyset sayfalama (ilk sayfa, derin sayfa)
+# sorgu sürelerini (ms, en iyi --repeat) raporlar. Şema sonunda silinir (--keep hariç).
+# Kullanım: python bench/bench_doctor_inbox.py --questions 100000 --doctors 10
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from migrations import MIGRATIONS  # noqa: E402
+
+OLD_QUERY = """
+    SELECT q.id, q.subject, u.username, u.gender, q.status,
+        (SELECT message FROM doctor_messages WHERE question_id=q.id AND sender='user' ORDER BY created_at ASC LIMIT 1),
+        (SELECT message FROM doctor_messages WHERE question_id=q.id AND sender='doctor' ORDER BY created_at DESC LIMIT 1)
+    FROM doctor_questions q
+    JOIN users u ON q.user_id = u.id
+    WHERE q.doctor_id = %s
+    ORDER BY q.created_at DESC
+"""
+NEW_QUERY = """
+    SELECT q.id, q.subject, u.username, u.gender, q.status, q.first_user_message, q.last_doctor_reply
+    FROM doctor_questions q
+    JOIN users u ON q.user_id = u.id
+    WHERE q.doctor_id = %s {keyset}
+    ORDER BY q.created_at DESC, q.id DESC
+    LIMIT %s
+"""
+KEYSET = "AND (q.created_at, q.id) < (SELECT created_at, id FROM doctor_questions WHERE id = %s)"
+
+
+def seed(cursor, schema, questions, messages, doctors):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    cursor.execute(f"SET search_path TO {schema}")
+    cursor.execute("""
+        CREATE TABLE users (id SERIAL PRIMARY KEY, username TEXT, gender TEXT, role TEXT);
+        CREATE TABLE doctor_questions (
+            id SERIAL PRIMARY KEY, user_id INTEGER, doctor_id INTEGER, subject TEXT,
+            status TEXT, created_at TIMESTAMP
+        );
+        CREATE TABLE doctor_messages (
+            id SERIAL PRIMARY KEY, question_id INTEGER, sender TEXT, message TEXT,
+            file_url TEXT, created_at TIMESTAMP
+        );
+    """)
+    cursor.execute("""
+        INSERT INTO users (username, gender, role)
+        SELECT 'doktor' || i, 'female', 'doctor' FROM generate_series(1, %s) i
+    """, (doctors,))
+    cursor.execute("""
+        INSERT INTO users (username, gender, role)
+        SELECT 'hasta' || i, CASE WHEN i %% 2 = 0 THEN 'male' ELSE 'female' END, 'user'
+        FROM generate_series(1, 5000) i
+    """)
+    cursor.execute("""
+        INSERT INTO doctor_questions (user_id, doctor_id, subject, status, created_at)
+        SELECT %s + 1 + (i %% 5000), 1 + (i %% %s), 'Soru ' || i, 'pending',
+               NOW() - (%s - i) * INTERVAL '1 minute'
+        FROM generate_series(1, %s) i
+    """, (doctors, doctors, questions, questions))
+    # Sırayla kullanıcı / doktor mesajları; ilk mesaj her zaman kullanıcının
+    cursor.execute("""
+        INSERT INTO doctor_messages (question_id, sender, message, created_at)
+        SELECT q.id, CASE WHEN m %% 2 = 1 THEN 'user' ELSE 'doctor' END,
+               repeat('mesaj ', 20) || m, q.created_at + m * INTERVAL '1 second'
+        FROM doctor_questions q, generate_series(1, %s) m
+    """, (messages,))
+    cursor.execute("ANALYZE")
+
+
+def timed(cursor, sql, params, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def report(label, cursor, sql, params, repeat):
+    try:
+        elapsed, rows = timed(cursor, sql, params, repeat)
+        print(f"  {label:<34} {elapsed * 1000:10.1f} ms  ({len(rows)} satır)")
+        return rows
+    except psycopg2.errors.QueryCanceled:
+        cursor.connection.rollback()
+        print(f"  {label:<34}    timeout")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=4, help="soru başına mesaj")
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=int, default=120, help="sorgu zaman aşımı (sn)")
+    parser.add_argument("--schema", default="bench_inbox")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    migration_sql = dict(MIGRATIONS)["003_doctor_inbox"]
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            start = time.perf_counter()
+            seed(cursor, args.schema, args.questions, args.messages, args.doctors)
+            conn.commit()
+            print(f"{args.questions} soru x {args.messages} mesaj, {args.doctors} doktor "
+                  f"(doktor başına ~{args.questions // args.doctors} soru), veri {time.perf_counter() - start:.1f} sn")
+
+            # Oturum ayarları commit edilir; zaman aşımı rollback'i bunları geri almaz
+            cursor.execute(f"SET search_path TO {args.schema}")
+            cursor.execute("SET statement_timeout = %s", (args.timeout * 1000,))
+            conn.commit()
+            report("eski sorgu, index yok", cursor, OLD_QUERY, (1,), 1)
+
+            start = time.perf_counter()
+            cursor.execute(migration_sql)
+            cursor.execute("ANALYZE")
+            conn.commit()
+            print(f"  migration 003 (index + backfill)   {time.perf_counter() - start:10.1f} sn")
+
+            report("eski sorgu, index var", cursor, OLD_QUERY, (1,), args.repeat)
+            first = report(f"yeni sorgu, ilk sayfa ({args.page})", cursor,
+                           NEW_QUERY.format(keyset=""), (1, args.page), args.repeat)
+            report("yeni sorgu, tüm liste", cursor,
+                   NEW_QUERY.format(keyset=""), (1, args.questions), args.repeat)
+            if first:
+                # Listenin ortasından bir sayfa (keyset: OFFSET taraması yok)
+                _, rows = timed(cursor, NEW_QUERY.format(keyset=""), (1, args.questions), 1)
+                middle = rows[len(rows) // 2][0]
+                report(f"yeni sorgu, orta sayfa ({args.page})", cursor,
+                       NEW_QUERY.format(keyset=KEYSET), (1, middle, args.page), args.repeat)
+        finally:
+            conn.rollback()
+            cursor.execute("SET search_path TO DEFAULT")
+            cursor.execute("SET statement_timeout TO DEFAULT")
+            if not args.keep:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -----------------------
+# Gemini istemcisi throughput benchmark'ı
+# -----------------------
+# Gecikme enjekte edilmiş sahte Gemini sunucusuna karşı:
+#   1) eski yol: her çağrıda requests.post (havuz yok)
+#   2) GeminiClient.generate (keep-alive havuzu, thread'ler)
+#   3) GeminiClient.agenerate (async, tek thread; aynı FairSlots sınırı)
+# Sahte sunucu HTTP/1.1 konuşur: async yol eşzamanlılık kadar bağlantı açar ve httpcore
+# havuzu her istekte tüm bağlantıları taradığı için yüksek eşzamanlılıkta thread yolunun
+# gerisinde kalabilir. Gerçek Gemini HTTP/2 (ALPN) ile tek bağlantıda çoklar.
+# Kullanım: python bench/bench_gemini_client.py --calls 400 --concurrency 50 --latency 0.1
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from gemini_client import GeminiClient  # noqa: E402
+
+
+def run_threads(fn, calls, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: fn(f"soru {i}"), range(calls)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server, base = start_fake_gemini(latency=args.latency)
+    client = GeminiClient(api_base=base, api_key="bench", max_concurrency=args.concurrency,
+                          pool_size=args.concurrency)
+
+    def naive(prompt):
+        response = requests.post(
+            f"{base}:generateContent",
+            headers={"Content-Type": "application/json", "X-goog-api-key": "bench"},
+            json={"contents": [{"parts": [{"text": prompt}]}]}
+        )
+        response.raise_for_status()
+        return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    results = {}
+    results["requests.post (havuzsuz)"] = run_threads(naive, args.calls, args.concurrency)
+    results["GeminiClient.generate"] = run_threads(client.generate, args.calls, args.concurrency)
+
+    async def run_async():
+        start = time.perf_counter()
+        await asyncio.gather(*(client.agenerate(f"soru {i}") for i in range(args.calls)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        return elapsed
+    results["GeminiClient.agenerate"] = asyncio.run(run_async())
+
+    print(f"{args.calls} çağrı, eşzamanlılık {args.concurrency}, upstream gecikme {args.latency}s")
+    for name, elapsed in results.items():
+        print(f"  {name:<28} {elapsed:7.2f}s  {args.calls / elapsed:8.1f} çağrı/sn")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# -----------------------
+# Metrik altyapısı ek yük benchmark'ı
+# -----------------------
+# 1) Mikro: Histogram.observe ve `with stage(...)` çağrı başına maliyeti (ns),
+#    --threads thread aynı histograma yazarken (kilit çekişmesi dahil)
+# 2) İstek: aynı blueprint'i metrics.init_app'li ve init_app'siz iki uygulamada
+#    test client ile GET /healthz; fark = istek başına ölçüm maliyeti (µs)
+# Kullanım: python bench/bench_metrics.py --ops 1000000 --requests 20000 --threads 8
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+import server  # noqa: E402
+
+
+def per_op_ns(fn, ops, threads):
+    per_thread = ops // threads
+
+    def run(_):
+        for _ in range(per_thread):
+            fn()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run, range(threads)))
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def per_request_us(app, requests):
+    client = app.test_client()
+    for _ in range(200):
+        client.get("/healthz")
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get("/healthz")
+        elapsed = (time.perf_counter() - start) / requests * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=1000000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    histogram = metrics.Histogram("bench_seconds", "bench", ("stage",))
+
+    def with_stage():
+        with metrics.stage("bench"):
+            pass
+
+    def empty():
+        pass
+
+    print(f"Mikro ({args.ops} işlem)")
+    for threads in (1, args.threads):
+        base = per_op_ns(empty, args.ops, threads)
+        observe = per_op_ns(lambda: histogram.observe(0.003, "db"), args.ops, threads) - base
+        staged = per_op_ns(with_stage, args.ops, threads) - base
+        print(f"  {threads:>2} thread: observe {observe:6.0f} ns   with stage() {staged:6.0f} ns")
+
+    plain = Flask("plain")
+    plain.register_blueprint(server.api)
+    instrumented = Flask("instrumented")
+    metrics.init_app(instrumented)
+    instrumented.register_blueprint(server.api)
+
+    without = per_request_us(plain, args.requests)
+    with_metrics = per_request_us(instrumented, args.requests)
+    print(f"İstek (GET /healthz, test client, {args.requests} istek, en iyi 3)")
+    print(f"  metriksiz      {without:8.1f} µs/istek")
+    print(f"  metrikli       {with_metrics:8.1f} µs/istek  (+{with_metrics - without:.1f} µs, "
+          f"%{(with_metrics / without - 1) * 100:.1f})")
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"  /metrics çıktısı {len(body)} bayt, {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# -----------------------
+# PDF tahlil ayrıştırıcı benchmark'ı
+# -----------------------
+# Sentetik çok sayfalı tahlil PDF'leri üretir; eski yol (tüm sayfaları birleştir +
+# tek regex) ile lab_parser.extract_report_from_path'i süre ve Python tarafı
+# tepe bellek (tracemalloc) açısından karşılaştırır.
+# Kullanım: python bench/bench_pdf_parser.py --pages 10 100 300
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab_parser import extract_report_from_path  # noqa: E402
+
+TESTS = [
+    ("Hemoglobin", "g/dL", 12, 16), ("Lokosit", "10^3/uL", 4, 10), ("Glukoz", "mg/dL", 70, 100),
+    ("Kreatinin", "mg/dL", 0.6, 1.2), ("Kolesterol", "mg/dL", 0, 200), ("Ferritin", "ng/mL", 15, 150),
+    ("TSH", "mIU/L", 0.4, 4), ("Sodyum", "mmol/L", 135, 145), ("Potasyum", "mmol/L", 3.5, 5.1),
+]
+OLD_PATTERN = r"([A-Za-zçğıöşüÇĞİÖŞÜ ]+):\s*([\d.,]+)\s*(\w+/?.*)\s*\(Ref[:\-]?\s*([<>]?\d+[\-–]?\d*)\)?"
+
+
+def make_synthetic_pdf(path, pages, seed=0):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page()
+        lines = [f"Laboratuvar Sonuç Raporu - Sayfa {page_no + 1}", "Hasta: Test Hasta", ""]
+        for _ in range(35):
+            name, unit, low, high = rng.choice(TESTS)
+            value = round(rng.uniform(low * 0.7, high * 1.3), 1)
+            lines.append(f"{name}: {value} {unit} (Ref: {low}-{high})")
+        page.insert_text((40, 40), "\n".join(lines), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def old_extract(path):
+    with open(path, "rb") as f:
+        doc = fitz.open(stream=f.read(), filetype="pdf")
+    text = "".join([page.get_text() for page in doc])
+    referans_disi = []
+    for test, value, unit, ref in re.findall(OLD_PATTERN, text):
+        try:
+            value_num = float(value.replace(",", "."))
+            if "-" in ref:
+                low, high = map(float, ref.split("-"))
+                if value_num < low or value_num > high:
+                    referans_disi.append(test.strip())
+        except ValueError:
+            continue
+    return text[:3000], referans_disi
+
+
+def measure(fn, path, repeat=3):
+    # Süre ve bellek ayrı ölçülür (tracemalloc süreyi şişirir)
+    elapsed = min(_timed(fn, path) for _ in range(repeat))
+    tracemalloc.start()
+    fn(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def _timed(fn, path):
+    start = time.perf_counter()
+    fn(path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 300])
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            make_synthetic_pdf(path, pages)
+            old_time, old_peak = measure(old_extract, path)
+            new_time, new_peak = measure(extract_report_from_path, path)
+            print(f"{pages:>4} sayfa: eski {old_time * 1000:8.1f} ms / {old_peak / 1024:8.0f} KiB | "
+                  f"yeni {new_time * 1000:8.1f} ms / {new_peak / 1024:8.0f} KiB")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
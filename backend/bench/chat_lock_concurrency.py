@@ -0,0 +1,128 @@
+# -----------------------
+# Sohbet kilidi eşzamanlılık testi
+# -----------------------
+# Uygulamayı thread'li werkzeug sunucusunda, sahte Gemini'ye karşı başlatır ve
+# aynı sohbete --sends paralel mesaj yollar:
+#   reddet : CHAT_LOCK_WAIT=0 -> tam olarak 1 cevap (200), diğerleri 409
+#   sırala : CHAT_LOCK_WAIT>0 -> hepsi 200, geçmiş kullanıcı/bot sırasıyla dizilir
+#   hata   : profil okuma bir kez hata verir -> sonraki mesaj yine kabul edilir
+#            (eski waiting_for_bot bu durumda sohbeti kalıcı kilitliyordu)
+# --no-db: profil DB yerine boş döner (PostgreSQL olmadan çalıştırmak için).
+# CHAT_LOCK=postgres ile çalıştırılırsa kilit tablosu kullanılır (DB gerekir).
+# Kullanım: python bench/chat_lock_concurrency.py --sends 20 --latency 0.3 --no-db [--stream]
+import argparse
+import datetime
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+def check(label, ok, detail):
+    print(f"  [{'OK' if ok else 'HATA'}] {label}: {detail}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sends", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--username", default="lock_user")
+    parser.add_argument("--stream", action="store_true", help="?stream=1 ile gönder")
+    parser.add_argument("--no-db", action="store_true")
+    args = parser.parse_args()
+
+    fake, base = start_fake_gemini(latency=args.latency, chunk_delay=0.01)
+    os.environ["GEMINI_API_BASE"] = base
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ.setdefault("JWT_SECRET", "bench-secret-bench-secret-bench-secret")
+    # Aynı sohbete eşzamanlı mesajlar: 429 değil kilit sonucu (409 / sıra) ölçülür
+    os.environ.setdefault("RATE_LIMIT", "off")
+    import server  # noqa: E402
+    from profile_cache import build_profile_context  # noqa: E402
+
+    if args.no_db:
+        server.profile_cache.loader = lambda username: build_profile_context(None)
+
+    httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}/chat/1" + ("?stream=1" if args.stream else "")
+    token = jwt.encode({
+        "username": args.username, "role": "user", "user_id": 1,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, server.JWT_SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    server.chat_store.ensure_default_chat(args.username)
+
+    def send(i):
+        response = requests.post(url, json={"message": f"mesaj {i}"}, headers=headers, timeout=120)
+        response.content  # akış bitene kadar oku
+        return response.status_code
+
+    def fire(n):
+        barrier = threading.Barrier(n)
+
+        def task(i):
+            barrier.wait()
+            return send(i)
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            return list(pool.map(task, range(n)))
+
+    def transcript():
+        return server.chat_store.get_messages(args.username, 1, limit=100000)
+
+    print(f"{args.sends} paralel mesaj, Gemini gecikmesi {args.latency}s, "
+          f"kilit: {server.chat_lock.stats()['backend']}, akış: {'evet' if args.stream else 'hayır'}")
+    passed = True
+
+    before = len(transcript())
+    server.CHAT_LOCK_WAIT = 0
+    codes = fire(args.sends)
+    added = len(transcript()) - before
+    passed &= check("reddet", codes.count(200) == 1 and codes.count(409) == args.sends - 1 and added == 2,
+                    f"200 x{codes.count(200)}, 409 x{codes.count(409)}, geçmişe {added} mesaj")
+
+    before = len(transcript())
+    server.CHAT_LOCK_WAIT = args.sends * (args.latency + 1) + 10
+    codes = fire(args.sends)
+    messages = transcript()[before:]
+    alternating = [m["sender"] for m in messages] == ["user", "bot"] * args.sends
+    passed &= check("sırala", codes.count(200) == args.sends and alternating,
+                    f"200 x{codes.count(200)}, {len(messages)} mesaj, kullanıcı/bot sırası "
+                    f"{'korunuyor' if alternating else 'BOZUK'}")
+
+    server.CHAT_LOCK_WAIT = 0
+    loader = server.profile_cache.loader
+    calls = []
+
+    def failing_loader(username):
+        calls.append(username)
+        if len(calls) == 1:
+            raise RuntimeError("profil sorgusu başarısız (enjekte)")
+        return loader(username)
+    server.profile_cache.invalidate(args.username)
+    server.profile_cache.loader = failing_loader
+    first = send("hata")
+    server.profile_cache.invalidate(args.username)
+    second = send("sonra")
+    server.profile_cache.loader = loader
+    passed &= check("hata", first == 500 and second == 200,
+                    f"hatalı istek {first}, sonraki istek {second}")
+
+    print(f"  kilit sayaçları: {server.chat_lock.stats()}")
+    httpd.shutdown()
+    fake.shutdown()
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -----------------------
+# Yerel sahte Gemini sunucusu
+# -----------------------
+# generateContent ve streamGenerateContent?alt=sse uçlarını taklit eder.
+# Kullanım:
+#   python bench/fake_gemini.py --port 8090 --latency 0.5 --chunks 20
+#   GEMINI_API_BASE=http://127.0.0.1:8090/v1beta/models/gemini-2.0-flash python server.py
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_TEXT = (
+    "Belirttiğiniz şikayet çoğu zaman yorgunluk ve susuzlukla ilişkilidir. "
+    "Bol su için, düzenli uyuyun ve ekran süresini azaltın. "
+    "Şikayetiniz sürerse Doktor'a Sor bölümünden bir doktorumuza danışabilirsiniz. "
+    "Bu şikayet ne zamandır var?"
+)
+
+
+def _split_reply(text, chunks):
+    words = text.split(" ")
+    size = max(1, len(words) // max(1, chunks))
+    return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+
+def make_handler(latency=0.0, chunks=10, chunk_delay=0.05, fail_status=None, reply_text=REPLY_TEXT):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            with self.server.count_lock:
+                self.server.request_count += 1
+
+            delay = latency() if callable(latency) else latency
+            if delay:
+                time.sleep(delay)
+
+            status = fail_status() if callable(fail_status) else fail_status
+            if status:
+                body = json.dumps({"error": {"code": status, "message": "fake failure"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            if ":streamGenerateContent" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in _split_reply(reply_text, chunks):
+                    event = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                    data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode()
+                    self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                    if chunk_delay:
+                        time.sleep(chunk_delay)
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            body = json.dumps({
+                "candidates": [{"content": {"parts": [{"text": reply_text}], "role": "model"}}]
+            }, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeGeminiHandler
+
+
+class _FakeGeminiServer(ThreadingHTTPServer):
+    # Varsayılan dinleme kuyruğu (5) eşzamanlı bağlantı patlamalarında reset'e yol açar
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # İstemci zaman aşımıyla koptuysa (takılma senaryoları) traceback basılmasın
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_fake_gemini(port=0, **handler_options):
+    # Arka planda çalışan sunucuyu ve taban adresini döndürür
+    server = _FakeGeminiServer(("127.0.0.1", port), make_handler(**handler_options))
+    server.daemon_threads = True
+    server.request_count = 0
+    # Eşzamanlı handler'lar sayacı kaybetmesin (upstream çağrı sayısı testlerde kesin olmalı)
+    server.count_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/v1beta/models/gemini-2.0-flash"
+    return server, base
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sahte Gemini sunucusu")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="İlk bayta kadar gecikme (sn)")
+    parser.add_argument("--chunks", type=int, default=10, help="Streaming parça sayısı")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="Parçalar arası gecikme (sn)")
+    parser.add_argument("--fail-status", type=int, default=None, help="Her isteğe bu HTTP kodunu döndür")
+    args = parser.parse_args()
+
+    server, base = start_fake_gemini(
+        args.port, latency=args.latency, chunks=args.chunks,
+        chunk_delay=args.chunk_delay, fail_status=args.fail_status
+    )
+    print(f"Sahte Gemini çalışıyor: GEMINI_API_BASE={base}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
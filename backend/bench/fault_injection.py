@@ -0,0 +1,247 @@
+# -----------------------
+# Gemini hata enjeksiyonu testi (tekrar deneme, devre kesici, hedging)
+# -----------------------
+# Uygulamayı thread'li werkzeug sunucusunda, davranışı çalışırken değiştirilebilen
+# sahte Gemini'ye karşı başlatır. İstekler açık döngüyle (--rate istek/sn, cevabı
+# beklemeden) POST /chat/<id>'e gönderilir; böylece kesintide worker doluluğu
+# (aynı anda süren istek sayısı = oran x gecikme) görünür.
+#   kesinti   : her çağrı 503. Devre kesici kapalı/açık karşılaştırılır: açıkken p99
+#               sınırlı, upstream'e giden çağrı az, süren istek sayısı düşük olmalı
+#   takılma   : Gemini hiç cevap vermez; deneme zaman aşımı + devre kesici sınırlar
+#   429       : çağrıların --flaky oranı 429; tekrar denemelerle neredeyse hepsi cevaplanmalı
+#   kuyruk    : çağrıların %5'i --slow sn sürer; hedging kapalı/açık p99 karşılaştırılır
+#   toparlanma: kesintiden sonra reset süresi geçince devre kapanmalı, cevaplar normale dönmeli
+# Süreler testin kısa sürmesi için küçültülür (deneme 1 sn, toplam 3 sn, reset 2 sn).
+# PostgreSQL gerekmez (bellek içi sohbet deposu, boş profil).
+# Kullanım: python bench/fault_injection.py --rate 20 --duration 10
+import argparse
+import datetime
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+TEST_ENV = {
+    "CHAT_STORE": "memory",
+    # Tek kullanıcı saniyede onlarca istek gönderir; hız sınırı burada ölçülen şey değil
+    "RATE_LIMIT": "off",
+    "GEMINI_ATTEMPT_TIMEOUT": "1",
+    "GEMINI_DEADLINE": "3",
+    "GEMINI_RETRY_ATTEMPTS": "3",
+    "GEMINI_RETRY_BASE_DELAY": "0.1",
+    "GEMINI_RETRY_MAX_DELAY": "0.5",
+    "GEMINI_BREAKER_FAILURES": "5",
+    "GEMINI_BREAKER_RESET": "2",
+}
+
+
+def check(label, ok, detail):
+    print(f"  [{'OK' if ok else 'HATA'}] {label}: {detail}")
+    return ok
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+class Fault:
+    # Sahte Gemini'nin anlık davranışı (handler her istekte okur)
+    def __init__(self):
+        self.status = None
+        self.status_ratio = 1.0
+        self.latency = 0.05
+        self.slow_ratio = 0.0
+        self.slow_latency = 0.0
+
+    def set(self, **values):
+        self.__init__()
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def fail_status(self):
+        return self.status if self.status and random.random() < self.status_ratio else None
+
+    def delay(self):
+        return self.slow_latency if random.random() < self.slow_ratio else self.latency
+
+
+class Load:
+    def __init__(self, base, token, rate, duration):
+        self.base = base
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rate = rate
+        self.duration = duration
+        self.chat_id = 0
+        self._lock = threading.Lock()
+        self.outstanding = 0
+
+    def _send(self, chat_id):
+        with self._lock:
+            self.outstanding += 1
+        start = time.perf_counter()
+        try:
+            # Mesajlar farklı: aynı prompt'lar single-flight ile birleşir, burada bağımsız çağrılar ölçülür
+            response = requests.post(f"{self.base}/chat/{chat_id}", json={"message": f"başım ağrıyor ({chat_id})"},
+                                     headers=self.headers, timeout=120)
+            return time.perf_counter() - start, response.status_code, response.headers.get("X-Fallback")
+        finally:
+            with self._lock:
+                self.outstanding -= 1
+
+    def run(self, gemini):
+        # Sabit aralıklı gönderim; her istek yeni sohbete (sohbet kilidi çakışmasın)
+        samples = []
+        futures = []
+        interval = 1 / self.rate
+        with ThreadPoolExecutor(max_workers=int(self.rate * 10) + 10) as pool:
+            start = time.perf_counter()
+            n = 0
+            while time.perf_counter() - start < self.duration:
+                with self._lock:
+                    self.chat_id += 1
+                    chat_id = self.chat_id
+                futures.append(pool.submit(self._send, chat_id))
+                samples.append((self.outstanding, gemini.in_flight))
+                n += 1
+                time.sleep(max(0.0, start + n * interval - time.perf_counter()))
+            results = [f.result() for f in futures]
+        latencies = [r[0] for r in results]
+        return {
+            "count": len(results),
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "fallback": sum(1 for r in results if r[2]),
+            "errors": sum(1 for r in results if r[1] != 200),
+            "outstanding_mean": sum(s[0] for s in samples) / len(samples),
+            "outstanding_max": max(s[0] for s in samples),
+            "gemini_in_flight_max": max(s[1] for s in samples),
+        }
+
+
+def describe(r):
+    return (f"{r['count']} istek, p50 {r['p50'] * 1000:.0f} ms, p99 {r['p99'] * 1000:.0f} ms, "
+            f"yedek cevap {r['fallback']}, süren istek ort. {r['outstanding_mean']:.1f} / en çok {r['outstanding_max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=20.0, help="istek/sn")
+    parser.add_argument("--duration", type=float, default=10.0, help="senaryo başına sn")
+    parser.add_argument("--flaky", type=float, default=0.3, help="429 oranı")
+    parser.add_argument("--slow", type=float, default=2.0, help="yavaş çağrı süresi (sn)")
+    parser.add_argument("--hedge-after", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for key, value in TEST_ENV.items():
+        os.environ.setdefault(key, value)
+    fault = Fault()
+    fake, base = start_fake_gemini(latency=fault.delay, fail_status=fault.fail_status)
+    os.environ["GEMINI_API_BASE"] = base
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ.setdefault("JWT_SECRET", "bench-secret-bench-secret-bench-secret")
+    import server  # noqa: E402
+    from profile_cache import build_profile_context  # noqa: E402
+    server.profile_cache.loader = lambda username: build_profile_context(None)
+    gemini = server.gemini
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    token = jwt.encode({
+        "username": "fault_user", "role": "user", "user_id": 1,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, server.JWT_SECRET, algorithm="HS256")
+    load = Load(f"http://127.0.0.1:{httpd.server_port}", token, args.rate, args.duration)
+    deadline = gemini.retry.deadline
+    threshold = gemini.breaker.failure_threshold
+    print(f"{args.rate:.0f} istek/sn x {args.duration:.0f} sn; deneme {gemini.retry.attempt_timeout} sn, "
+          f"toplam {deadline} sn, {gemini.retry.attempts} deneme, devre {threshold} hata / {gemini.breaker.reset_timeout} sn")
+    passed = True
+
+    def scenario(name, breaker=True, hedge_after=0.0, reset=True, **fault_values):
+        fault.set(**fault_values)
+        if reset:
+            gemini.breaker.reset()
+        gemini.breaker.failure_threshold = threshold if breaker else 10 ** 9
+        gemini.hedger.delay = hedge_after
+        before = fake.request_count
+        opened = gemini.breaker.stats()["opened"]
+        result = load.run(gemini)
+        result["upstream"] = fake.request_count - before
+        result["opened"] = gemini.breaker.stats()["opened"] - opened
+        print(f"- {name}: {describe(result)}, upstream çağrısı {result['upstream']}")
+        return result
+
+    healthy = scenario("sağlıklı", latency=0.05)
+    passed &= check("sağlıklı", healthy["errors"] == 0 and healthy["fallback"] == 0,
+                    f"hata {healthy['errors']}, yedek cevap {healthy['fallback']}")
+
+    # Kesinti: devre kesici olmadan her istek tüm deneme bütçesini harcar
+    no_breaker = scenario("kesinti, devre kesici yok", breaker=False, status=503)
+    outage = scenario("kesinti, devre kesici", status=503)
+    passed &= check("kesinti p99 sınırlı", outage["p99"] <= deadline + 0.5,
+                    f"p99 {outage['p99']:.2f} sn <= {deadline + 0.5} sn")
+    passed &= check("kesinti hızlı yanıt", outage["fallback"] == outage["count"] and outage["opened"] >= 1
+                    and outage["p50"] < 0.1, f"devre {outage['opened']} kez açıldı, p50 {outage['p50'] * 1000:.0f} ms")
+    passed &= check("kesinti upstream yükü", outage["upstream"] < no_breaker["upstream"] / 4,
+                    f"{no_breaker['upstream']} -> {outage['upstream']} çağrı")
+    passed &= check("kesinti worker doluluğu", outage["outstanding_mean"] < no_breaker["outstanding_mean"] / 4,
+                    f"süren istek ort. {no_breaker['outstanding_mean']:.1f} -> {outage['outstanding_mean']:.1f}")
+
+    stall = scenario("takılma", latency=60.0)
+    passed &= check("takılma p99 sınırlı", stall["p99"] <= deadline + 0.5 and stall["opened"] >= 1,
+                    f"p99 {stall['p99']:.2f} sn, devre {stall['opened']} kez açıldı")
+
+    flaky = scenario(f"%{args.flaky * 100:.0f} 429", status=429, status_ratio=args.flaky)
+    # Tekrar denemesiz çağrıların --flaky kadarı düşerdi
+    passed &= check("429 tekrar deneme", flaky["fallback"] < flaky["count"] * args.flaky / 3 and flaky["p99"] <= deadline,
+                    f"yedek cevap {flaky['fallback']}/{flaky['count']} (tekrar denemesiz ~{flaky['count'] * args.flaky:.0f}), "
+                    f"p99 {flaky['p99'] * 1000:.0f} ms")
+
+    tail = dict(latency=0.05, slow_ratio=0.05, slow_latency=args.slow)
+    plain = scenario("kuyruk gecikmesi, hedging yok", **tail)
+    hedged = scenario(f"kuyruk gecikmesi, hedging {args.hedge_after} sn", hedge_after=args.hedge_after, **tail)
+    hedge_stats = gemini.hedger.stats()
+    passed &= check("hedging p99", hedged["p99"] < plain["p99"] / 2,
+                    f"p99 {plain['p99'] * 1000:.0f} -> {hedged['p99'] * 1000:.0f} ms, "
+                    f"ek istek {hedge_stats['hedged']}, önce dönen ek istek {hedge_stats['hedge_won']}")
+    passed &= check("hedging ek yükü", hedged["upstream"] <= hedged["count"] * (1 + gemini.hedger.max_ratio) + 1,
+                    f"{hedged['upstream']} upstream çağrısı / {hedged['count']} istek")
+
+    # Devreyi aç, upstream düzelsin, reset süresi geçsin: ilk istek deneme çağrısı olur
+    fault.set(status=503)
+    gemini.breaker.reset()
+    gemini.hedger.delay = 0.0
+    for i in range(threshold):
+        load._send(10 ** 6 + i)
+    was_open = gemini.breaker.state == "open"
+    fault.set(latency=0.05)
+    time.sleep(gemini.breaker.reset_timeout + 0.2)
+    recovered = scenario("toparlanma", reset=False, latency=0.05)
+    # Half-open deneme çağrısı sürerken gelen birkaç istek hâlâ yedek cevap alabilir
+    passed &= check("toparlanma", was_open and recovered["fallback"] <= args.rate * 0.2 + 1
+                    and gemini.breaker.state == "closed",
+                    f"devre önce {'açık' if was_open else 'KAPALI'}, yedek cevap {recovered['fallback']}, "
+                    f"şimdi {gemini.breaker.state}")
+
+    print(f"  devre kesici: {gemini.breaker.stats()}")
+    httpd.shutdown()
+    fake.shutdown()
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+# -----------------------
+# Tekrarlanabilir yük testi ve benchmark düzeneği
+# -----------------------
+# Uygulamayı thread'li werkzeug sunucusunda, sahte Gemini'ye (gecikme/akış
+# ayarlı) karşı başlatır, sentetik veriyi tohumlar (bench/seed_data.py) ve
+# karışık bir iş yükü sürer. Sonuç route başına p50/p95/p99, istek/sn ve DB
+# sorgu sayılarıyla JSON olarak yazılır; iki çalıştırma --compare ile karşılaştırılır.
+#
+# Veritabanı (--db):
+#   env       .env'deki PostgreSQL (tohumlama --prefix kullanıcılarıyla sınırlı, --reset ile temizlenir)
+#   container docker ile geçici postgres:16 (şema + migration'lar kurulur, sonunda silinir)
+#   none      PostgreSQL yok: yalnızca DB gerektirmeyen roller (chat, pdf), bellek içi sohbet deposu
+#
+# Roller (--workload payları --clients'a dağıtır):
+#   chat          sohbet listesi -> mesajlar -> POST /chat (--stream-ratio oranında ?stream=1)
+#   pdf           POST /upload_pdf (tohumlanan tahlil PDF'leri)
+#   browse        profil, randevular, doktorlar, geçmiş
+#   patient_poll  eski frontend: 3 sn'de bir /my-questions + açık soru mesajları (ETag/since ile)
+#   doctor_poll   eski doktor paneli: 5 sn'de bir /doctor-questions
+#   doctor_reply  --reply-interval sn'de bir soruya cevap (yazma + olay yükü)
+#
+# DB sorguları süreç içindeki "db" aşama sayacından (metrics.py) okunur; ayrıca
+# yük sonrası her GET route'u tek başına çalıştırılıp istek başına sorgu sayısı ölçülür.
+# Aynı --seed ile tohumlama ve istemci davranışı (düşünme süreleri, seçimler) aynıdır.
+#
+# Kullanım:
+#   python bench/harness.py --db env --reset --scale medium --clients 100 --duration 60 --out bench/results/a.json
+#   python bench/harness.py --db none --workload chat --clients 20 --gemini-latency 0.5
+#   python bench/harness.py --compare bench/results/a.json bench/results/b.json --threshold 10
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import jwt
+import requests
+from werkzeug.serving import make_server
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+import seed_data  # noqa: E402
+
+WORKLOADS = {
+    "mixed": {"chat": 0.2, "pdf": 0.05, "browse": 0.15, "patient_poll": 0.45, "doctor_poll": 0.1,
+              "doctor_reply": 0.05},
+    "polling": {"patient_poll": 0.8, "doctor_poll": 0.15, "doctor_reply": 0.05},
+    "chat": {"chat": 1.0},
+    "pdf": {"pdf": 1.0},
+}
+DB_FREE_ROLES = {"chat", "pdf"}
+PATIENT_POLL_PERIOD = 3.0
+DOCTOR_POLL_PERIOD = 5.0
+
+
+# -----------------------
+# Ölçüm kaydı
+# -----------------------
+class Recorder:
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._latency = defaultdict(list)
+        self._ttfb = defaultdict(list)
+        self._status = defaultdict(lambda: defaultdict(int))
+
+    def record(self, label, status, seconds, ttfb=None):
+        if not self.active:
+            return
+        with self._lock:
+            self._latency[label].append(seconds)
+            self._status[label][str(status)] += 1
+            if ttfb is not None:
+                self._ttfb[label].append(ttfb)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._latency), dict(self._ttfb), {k: dict(v) for k, v in self._status.items()}
+
+
+def percentile(sorted_values, p):
+    # En yakın sıra yöntemi
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(values):
+    values = sorted(values)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None  # noqa: E731
+    return {
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1] if values else None),
+        "mean_ms": ms(sum(values) / len(values) if values else None),
+    }
+
+
+# -----------------------
+# Sanal kullanıcılar
+# -----------------------
+class Client:
+    def __init__(self, base, recorder, token, rng):
+        self.base = base
+        self.recorder = recorder
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.rng = rng
+        self.etags = {}
+        self.cursors = {}
+
+    def call(self, method, label, path, sync=False, stream=False, **kwargs):
+        # sync=True: frontend'in syncRequest'i gibi If-None-Match + ?since=
+        headers = {}
+        if sync:
+            if path in self.etags:
+                headers["If-None-Match"] = self.etags[path]
+            if path in self.cursors:
+                kwargs["params"] = {"since": self.cursors[path]}
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base + path, headers=headers, timeout=120,
+                                            stream=stream, **kwargs)
+            ttfb = time.perf_counter() - start if stream else None
+            response.content  # akış bitene kadar oku
+        except requests.RequestException:
+            self.recorder.record(label, "error", time.perf_counter() - start)
+            return None
+        self.recorder.record(label, response.status_code, time.perf_counter() - start, ttfb)
+        if sync and response.status_code == 200:
+            if response.headers.get("ETag"):
+                self.etags[path] = response.headers["ETag"]
+            if response.headers.get("X-Next-Cursor"):
+                self.cursors[path] = response.headers["X-Next-Cursor"]
+        return response
+
+    def think(self, stop, mean):
+        stop.wait(self.rng.expovariate(1 / mean) if mean > 0 else 0)
+
+
+def role_chat(client, ctx, stop):
+    response = client.call("POST", "POST /chats", "/chats")
+    chat_id = response.json()["chatId"] if response is not None and response.ok else 1
+    n = 0
+    while not stop.is_set():
+        client.call("GET", "GET /chats", "/chats", sync=True)
+        client.call("GET", "GET /chats/<id>/messages", f"/chats/{chat_id}/messages")
+        n += 1
+        message = {"json": {"message": f"{client.rng.choice(ctx['symptoms'])} şikayetim var ({n})"}}
+        if client.rng.random() < ctx["args"].stream_ratio:
+            client.call("POST", "POST /chat/<id>?stream=1", f"/chat/{chat_id}?stream=1", stream=True, **message)
+        else:
+            client.call("POST", "POST /chat/<id>", f"/chat/{chat_id}", **message)
+        client.think(stop, ctx["args"].think)
+
+
+def role_pdf(client, ctx, stop):
+    while not stop.is_set():
+        path = client.rng.choice(ctx["pdfs"])
+        with open(path, "rb") as f:
+            client.call("POST", "POST /upload_pdf", "/upload_pdf",
+                        files={"pdf": (os.path.basename(path), f, "application/pdf")})
+        client.think(stop, ctx["args"].think * 2)
+
+
+def role_browse(client, ctx, stop):
+    while not stop.is_set():
+        client.call("GET", "GET /profile", "/profile")
+        client.call("GET", "GET /appointments", "/appointments")
+        client.call("GET", "GET /doctors", "/doctors")
+        client.call("GET", "GET /history", "/history?limit=5&messages=10")
+        client.think(stop, ctx["args"].think)
+
+
+def _periodic(stop, rng, period, fn):
+    # İstemciler aynı anda başlamasın; sonra sabit aralık (frontend setInterval)
+    stop.wait(rng.uniform(0, period))
+    while not stop.is_set():
+        started = time.monotonic()
+        fn()
+        stop.wait(max(0.0, period - (time.monotonic() - started)))
+
+
+def role_patient_poll(client, ctx, stop):
+    question_id = ctx["question_of"].get(client.username)
+
+    def poll():
+        client.call("GET", "GET /my-questions", "/my-questions", sync=ctx["args"].etag)
+        if question_id:
+            client.call("GET", "GET /doctor-question/<id>/messages",
+                        f"/doctor-question/{question_id}/messages", sync=ctx["args"].etag)
+    _periodic(stop, client.rng, PATIENT_POLL_PERIOD, poll)
+
+
+def role_doctor_poll(client, ctx, stop):
+    _periodic(stop, client.rng, DOCTOR_POLL_PERIOD,
+              lambda: client.call("GET", "GET /doctor-questions", "/doctor-questions"))
+
+
+def role_doctor_reply(client, ctx, stop):
+    questions = ctx["questions_of_doctor"].get(client.username) or [None]
+    n = 0
+
+    def reply():
+        nonlocal n
+        n += 1
+        question_id = client.rng.choice(questions)
+        if question_id:
+            client.call("POST", "POST /doctor-question/<id>/messages", f"/doctor-question/{question_id}/messages",
+                        data={"message": f"bench cevap {n}"})
+    _periodic(stop, client.rng, ctx["args"].reply_interval, reply)
+
+
+ROLES = {
+    "chat": (role_chat, "user"),
+    "pdf": (role_pdf, "user"),
+    "browse": (role_browse, "user"),
+    "patient_poll": (role_patient_poll, "user"),
+    "doctor_poll": (role_doctor_poll, "doctor"),
+    "doctor_reply": (role_doctor_reply, "doctor"),
+}
+
+
+def assign_roles(shares, clients):
+    # Paylar tam sayıya yuvarlanır; pay > 0 olan her rol en az bir istemci alır
+    roles = sorted(shares)
+    counts = {role: max(1, round(shares[role] / sum(shares.values()) * clients)) for role in roles}
+    largest = max(roles, key=lambda r: shares[r])
+    counts[largest] = max(1, counts[largest] + clients - sum(counts.values()))
+    return [role for role in roles for _ in range(counts[role])]
+
+
+# -----------------------
+# Veritabanı
+# -----------------------
+def start_container(image):
+    name = f"chatdoc-bench-{os.getpid()}"
+    subprocess.run(["docker", "run", "-d", "--rm", "--name", name, "-e", "POSTGRES_PASSWORD=bench",
+                    "-e", "POSTGRES_DB=chatdoc_bench", "-p", "127.0.0.1::5432", image],
+                   check=True, capture_output=True)
+    port = subprocess.run(["docker", "port", name, "5432/tcp"], check=True, capture_output=True,
+                          text=True).stdout.strip().splitlines()[0].rsplit(":", 1)[1]
+    os.environ.update(POSTGRES_HOST="127.0.0.1", POSTGRES_PORT=port, POSTGRES_DB="chatdoc_bench",
+                      POSTGRES_USER="postgres", POSTGRES_PASSWORD="bench")
+    import psycopg2
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            psycopg2.connect(host="127.0.0.1", port=port, dbname="chatdoc_bench", user="postgres",
+                             password="bench").close()
+            return name
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                stop_container(name)
+                raise
+            time.sleep(0.5)
+
+
+def stop_container(name):
+    subprocess.run(["docker", "stop", name], capture_output=True)
+
+
+PG_COUNTERS = ("xact_commit", "xact_rollback", "tup_returned", "tup_fetched", "tup_inserted",
+               "tup_updated", "tup_deleted", "blks_read", "blks_hit")
+
+
+def pg_counters():
+    import db
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(PG_COUNTERS)} FROM pg_stat_database WHERE datname = current_database()")
+        return dict(zip(PG_COUNTERS, cursor.fetchone()))
+
+
+def db_queries():
+    import metrics
+    return metrics.stage_duration.count("db")
+
+
+def measure_route_queries(base, ctx, tokens, repeat):
+    # Her GET route'u tek başına: (sorgu farkı / tekrar) = istek başına sorgu
+    user, doctor = tokens["user"], tokens["doctor"]
+    question_id = ctx["question_of"].get(ctx["first_user"])
+    probes = [
+        ("GET /chats", "/chats", user),
+        ("GET /chats/<id>/messages", "/chats/1/messages", user),
+        ("GET /history", "/history?limit=5&messages=10", user),
+    ]
+    if ctx["db"]:
+        probes += [
+            ("GET /profile", "/profile", user),
+            ("GET /appointments", "/appointments", user),
+            ("GET /doctors", "/doctors", user),
+            ("GET /my-questions", "/my-questions", user),
+            ("GET /doctor-questions", "/doctor-questions", doctor),
+        ]
+        if question_id:
+            probes.append(("GET /doctor-question/<id>/messages", f"/doctor-question/{question_id}/messages", user))
+    result = {}
+    session = requests.Session()
+    for label, path, token in probes:
+        headers = {"Authorization": f"Bearer {token}"}
+        session.get(base + path, headers=headers, timeout=30)  # önbellekleri ısıt
+        before = db_queries()
+        for _ in range(repeat):
+            session.get(base + path, headers=headers, timeout=30)
+        result[label] = round((db_queries() - before) / repeat, 2)
+    return result
+
+
+# -----------------------
+# Çalıştırma
+# -----------------------
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=BENCH_DIR).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=BENCH_DIR).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except OSError:
+        return None
+
+
+def make_token(secret, username, role, user_id):
+    return jwt.encode({
+        "username": username, "role": role, "user_id": user_id,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=6)
+    }, secret, algorithm="HS256")
+
+
+def run(args):
+    container = None
+    if args.db == "container":
+        container = start_container(args.image)
+    if args.db == "none":
+        os.environ["CHAT_STORE"] = "memory"
+    else:
+        os.environ.setdefault("CHAT_STORE", "postgres")
+    fake, gemini_base = start_fake_gemini(latency=args.gemini_latency, chunks=args.gemini_chunks,
+                                          chunk_delay=args.gemini_chunk_delay)
+    os.environ["GEMINI_API_BASE"] = gemini_base
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ.setdefault("JWT_SECRET", "bench-secret-bench-secret-bench-secret")
+    # Kapalı döngü kullanıcılar sohbet/PDF sınırını aşar; kapasite ölçümünde 429 sayılmasın
+    os.environ.setdefault("RATE_LIMIT", "off")
+    import server  # noqa: E402  (env ayarlandıktan sonra)
+    from profile_cache import build_profile_context
+
+    try:
+        scale = seed_data.scale_from_args(args)
+        rng = random.Random(args.seed)
+        shares = WORKLOADS[args.workload]
+        if args.db == "none":
+            dropped = sorted(set(shares) - DB_FREE_ROLES)
+            shares = {r: s for r, s in shares.items() if r in DB_FREE_ROLES}
+            if dropped:
+                print(f"--db none: DB gerektiren roller çıkarıldı: {', '.join(dropped)}")
+            if not shares:
+                raise SystemExit("Bu iş yükünün DB'siz çalışabilen rolü yok")
+            server.profile_cache.loader = lambda username: build_profile_context(None)
+
+        start = time.perf_counter()
+        if args.db == "none":
+            seeded = {
+                "users": [(i + 1, f"{args.prefix}_user{i}") for i in range(scale["users"])],
+                "doctors": [(scale["users"] + i + 1, f"{args.prefix}_doctor{i}") for i in range(scale["doctors"])],
+                "questions": [],
+            }
+        else:
+            if args.db == "container" or args.create_schema:
+                seed_data.create_schema()
+            if args.reset:
+                seed_data.reset(args.prefix)
+            seeded = seed_data.seed_database(args.prefix, scale, rng)
+        seed_data.seed_chats(server.chat_store, [name for _, name in seeded["users"]], scale, rng)
+        pdfs = seed_data.make_pdfs(scale, args.seed)
+        print(f"Tohumlama: {scale['users']} kullanıcı, {scale['doctors']} doktor, {len(seeded['questions'])} soru, "
+              f"{len(pdfs)} PDF ({time.perf_counter() - start:.1f} sn)")
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # istek başına log satırı basılmasın
+        httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{httpd.server_port}"
+
+        ctx = {
+            "args": args,
+            "db": args.db != "none",
+            "pdfs": pdfs,
+            "symptoms": seed_data.SYMPTOMS,
+            "first_user": seeded["users"][0][1],
+            "question_of": {},
+            "questions_of_doctor": defaultdict(list),
+        }
+        doctor_names = dict(seeded["doctors"])
+        for question_id, username, doctor_id in seeded["questions"]:
+            ctx["question_of"].setdefault(username, question_id)
+            ctx["questions_of_doctor"][doctor_names[doctor_id]].append(question_id)
+
+        recorder = Recorder()
+        stop = threading.Event()
+        roles = assign_roles(shares, args.clients)
+        threads = []
+        for i, role in enumerate(roles):
+            fn, kind = ROLES[role]
+            pool = seeded["users"] if kind == "user" else seeded["doctors"]
+            user_id, username = pool[i % len(pool)]
+            client = Client(base, recorder, make_token(server.JWT_SECRET, username, kind, user_id),
+                            random.Random(args.seed * 100003 + i))
+            client.username = username
+            thread = threading.Thread(target=fn, args=(client, ctx, stop), daemon=True)
+            thread.start()
+            threads.append(thread)
+        print(f"{args.clients} istemci ({', '.join(f'{r} x{roles.count(r)}' for r in sorted(set(roles)))}), "
+              f"ısınma {args.warmup:.0f} sn, ölçüm {args.duration:.0f} sn")
+
+        time.sleep(args.warmup)
+        queries_before = db_queries()
+        gemini_before = fake.request_count
+        pg_before = pg_counters() if ctx["db"] else None
+        recorder.active = True
+        measure_start = time.perf_counter()
+        time.sleep(args.duration)
+        recorder.active = False
+        elapsed = time.perf_counter() - measure_start
+        queries = db_queries() - queries_before
+        gemini_requests = fake.request_count - gemini_before
+        pg_after = pg_counters() if ctx["db"] else None
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=130)
+
+        tokens = {
+            "user": make_token(server.JWT_SECRET, seeded["users"][0][1], "user", seeded["users"][0][0]),
+            "doctor": make_token(server.JWT_SECRET, seeded["doctors"][0][1], "doctor", seeded["doctors"][0][0]),
+        }
+        route_queries = measure_route_queries(base, ctx, tokens, args.probe_repeat)
+        httpd.shutdown()
+    finally:
+        fake.shutdown()
+        if container:
+            stop_container(container)
+
+    latencies, ttfbs, statuses = recorder.snapshot()
+    routes = {}
+    for label in sorted(latencies):
+        errors = sum(n for status, n in statuses[label].items() if status == "error" or status.startswith("5"))
+        routes[label] = {
+            "count": len(latencies[label]),
+            "errors": errors,
+            "rps": round(len(latencies[label]) / elapsed, 2),
+            **latency_summary(latencies[label]),
+            "status": statuses[label],
+        }
+        if label in ttfbs:
+            routes[label]["ttfb"] = latency_summary(ttfbs[label])
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "env": {k: os.getenv(k) for k in ("CHAT_STORE", "EVENT_BUS", "JOB_QUEUE", "CHAT_LOCK", "DB_MAX_CONN",
+                                              "RESPONSE_CACHE", "METRICS")},
+        },
+        "config": {
+            "db": args.db, "workload": args.workload, "roles": {r: roles.count(r) for r in sorted(set(roles))},
+            "clients": args.clients, "duration": args.duration, "warmup": args.warmup, "seed": args.seed,
+            "scale": scale, "think": args.think, "stream_ratio": args.stream_ratio, "etag": args.etag,
+            "gemini": {"latency": args.gemini_latency, "chunks": args.gemini_chunks,
+                       "chunk_delay": args.gemini_chunk_delay},
+        },
+        "totals": {
+            "requests": total,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "throughput_rps": round(total / elapsed, 2),
+            "db_queries": queries,
+            "db_queries_per_request": round(queries / total, 2) if total else None,
+            "gemini_requests": gemini_requests,
+        },
+        "routes": routes,
+        "route_queries": route_queries,
+        "postgres": {k: pg_after[k] - pg_before[k] for k in PG_COUNTERS} if pg_before else None,
+    }
+
+
+def print_report(result):
+    print(f"\n{'route':<38} {'adet':>7} {'hata':>5} {'istek/sn':>9} {'p50':>8} {'p95':>8} {'p99':>8}  sorgu/istek")
+    for label, r in result["routes"].items():
+        queries = result["route_queries"].get(label, "")
+        print(f"{label:<38} {r['count']:>7} {r['errors']:>5} {r['rps']:>9.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {queries}")
+        if "ttfb" in r:
+            print(f"{'  ilk bayt':<38} {'':>7} {'':>5} {'':>9} {r['ttfb']['p50_ms']:>8.1f} "
+                  f"{r['ttfb']['p95_ms']:>8.1f} {r['ttfb']['p99_ms']:>8.1f}")
+    t = result["totals"]
+    print(f"Toplam: {t['requests']} istek, {t['throughput_rps']} istek/sn, {t['errors']} hata, "
+          f"{t['db_queries']} DB sorgusu ({t['db_queries_per_request']}/istek), {t['gemini_requests']} Gemini çağrısı")
+    if result["postgres"]:
+        pg = result["postgres"]
+        print(f"PostgreSQL: {pg['xact_commit'] + pg['xact_rollback']} işlem, "
+              f"{pg['tup_fetched']} satır okundu, {pg['tup_inserted']} eklendi")
+
+
+# -----------------------
+# Karşılaştırma
+# -----------------------
+def compare(base_path, new_path, threshold):
+    # p95 veya istek/sn threshold %'den fazla kötüleşirse ya da istek başına
+    # sorgu artarsa gerileme sayılır; çıkış kodu 1
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"taban: {base['meta']['revision']} ({base['meta']['timestamp']})  "
+          f"yeni: {new['meta']['revision']} ({new['meta']['timestamp']})")
+    if base["config"] != new["config"]:
+        print("UYARI: yapılandırmalar farklı, sonuçlar doğrudan karşılaştırılamayabilir")
+
+    def change(old, value):
+        return (value - old) / old * 100 if old else 0.0
+
+    regressions = []
+    print(f"\n{'route':<38} {'p50 ms':>16} {'p95 ms':>24} {'p99 ms':>16} {'istek/sn':>23}")
+    for label in sorted(set(base["routes"]) | set(new["routes"])):
+        old, cur = base["routes"].get(label), new["routes"].get(label)
+        if not old or not cur:
+            print(f"{label:<38} {'yalnızca ' + ('yeni' if cur else 'taban') + ' çalıştırmada'}")
+            continue
+        p95 = change(old["p95_ms"], cur["p95_ms"])
+        rps = change(old["rps"], cur["rps"])
+        flag = ""
+        if p95 > threshold or rps < -threshold:
+            flag = "  <- GERİLEME"
+            regressions.append(label)
+        print(f"{label:<38} {old['p50_ms']:>7.1f}->{cur['p50_ms']:<7.1f} "
+              f"{old['p95_ms']:>7.1f}->{cur['p95_ms']:<7.1f}({p95:+5.0f}%) "
+              f"{old['p99_ms']:>7.1f}->{cur['p99_ms']:<7.1f} {old['rps']:>7.1f}->{cur['rps']:<7.1f}({rps:+4.0f}%){flag}")
+
+    for label in sorted(set(base["route_queries"]) & set(new["route_queries"])):
+        old, cur = base["route_queries"][label], new["route_queries"][label]
+        if cur > old:
+            print(f"{label}: istek başına sorgu {old} -> {cur}  <- GERİLEME")
+            regressions.append(f"{label} (sorgu)")
+    old_t, new_t = base["totals"], new["totals"]
+    print(f"\nToplam istek/sn {old_t['throughput_rps']} -> {new_t['throughput_rps']}, "
+          f"sorgu/istek {old_t['db_queries_per_request']} -> {new_t['db_queries_per_request']}")
+    print(f"{len(regressions)} gerileme" + (f": {', '.join(regressions)}" if regressions else ""))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compare", nargs=2, metavar=("TABAN", "YENI"))
+    parser.add_argument("--threshold", type=float, default=10.0, help="gerileme eşiği (%%)")
+    parser.add_argument("--db", choices=["env", "container", "none"], default="env")
+    parser.add_argument("--image", default="postgres:16")
+    parser.add_argument("--reset", action="store_true", help="önceki --prefix verisini sil")
+    parser.add_argument("--create-schema", action="store_true")
+    seed_data.add_scale_arguments(parser)
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--warmup", type=float, default=10.0)
+    parser.add_argument("--think", type=float, default=2.0, help="ortalama düşünme süresi (sn)")
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--reply-interval", type=float, default=10.0)
+    parser.add_argument("--no-etag", dest="etag", action="store_false", help="polling'de ETag/since gönderme")
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--gemini-chunks", type=int, default=10)
+    parser.add_argument("--gemini-chunk-delay", type=float, default=0.05)
+    parser.add_argument("--probe-repeat", type=int, default=20)
+    parser.add_argument("--out", default=None, help="JSON çıktı yolu (varsayılan bench/results/)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(args.compare[0], args.compare[1], args.threshold))
+
+    result = run(args)
+    print_report(result)
+    out = args.out or os.path.join(BENCH_DIR, "results",
+                                   f"harness-{args.workload}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Sonuç: {out}")
+
+
+if __name__ == "__main__":
+    main()
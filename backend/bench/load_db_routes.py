@@ -0,0 +1,55 @@
+# -----------------------
+# DB ağırlıklı route'lar için yük testi
+# -----------------------
+# .env'deki PostgreSQL'e bağlanır; /doctors ve /appointments GET isteklerini
+# farklı thread sayılarıyla gönderip istek/sn değerini raporlar.
+# Havuz boyutu DB_MAX_CONN ile ayarlanır (thread sayısından küçük olmamalı).
+# Kullanım: DB_MAX_CONN=32 python bench/load_db_routes.py --requests 2000 --threads 1 2 4 8 16 32
+import argparse
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--username", default="bench_user")
+    args = parser.parse_args()
+
+    token = jwt.encode({
+        "username": args.username,
+        "role": "user",
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, server.JWT_SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    app = server.create_app()
+    paths = ["/doctors", "/appointments"]
+
+    def hit(i):
+        # Flask test client thread-safe değil; her thread kendi client'ını kullanır
+        client = app.test_client()
+        response = client.get(paths[i % len(paths)], headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    hit(0)  # havuzu ısıt
+    print(f"{args.requests} istek, route'lar: {', '.join(paths)}")
+    for threads in args.threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(hit, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        print(f"  {threads:>3} thread: {args.requests / elapsed:8.1f} istek/sn")
+
+
+if __name__ == "__main__":
+    main()
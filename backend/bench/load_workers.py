@@ -0,0 +1,125 @@
+# -----------------------
+# Worker sayısına göre yük testi (gunicorn)
+# -----------------------
+# Her --workers değeri için gunicorn'u (gunicorn.conf.py, wsgi:app) ayrı portta
+# başlatır, /healthz hazır olunca --clients süreçten keep-alive bağlantılarla
+# --duration saniye istek gönderir, istek/sn ve p50/p99 gecikmeyi raporlar.
+# Varsayılan yol DB gerektirmez; --path /doctors --token ... ile DB'li route ölçülebilir.
+# CPU ağırlıklı yol için --path /healthz yerine kendi route'unuzu verin.
+# Kullanım: python bench/load_workers.py --workers 1 2 4 --clients 4 --duration 10
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(port, workers, threads, config="gunicorn.conf.py"):
+    env = {**os.environ, "RUN_MIGRATIONS": "0", "GUNICORN_ACCESS_LOG": ""}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", config, "--bind", f"127.0.0.1:{port}",
+         "--workers", str(workers), "--threads", str(threads), "wsgi:app"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/healthz", timeout=5).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(process.stderr.read().decode()[-2000:])
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn başlamadı")
+
+
+def client(url, headers, duration, threads, results):
+    # Süreç başına birkaç thread; her thread kendi keep-alive oturumu
+    from concurrent.futures import ThreadPoolExecutor
+
+    def loop(_):
+        session = requests.Session()
+        latencies = []
+        errors = 0
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, headers=headers, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results.put(list(pool.map(loop, range(threads))))
+
+
+def run_load(url, headers, clients, threads, duration):
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(url, headers, duration, threads, results))
+             for _ in range(clients)]
+    for p in procs:
+        p.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        for lat, err in results.get():
+            latencies.extend(lat)
+            errors += err
+    for p in procs:
+        p.join()
+    latencies.sort()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=8, help="worker başına gunicorn thread'i")
+    parser.add_argument("--clients", type=int, default=4, help="yük üreten süreç sayısı")
+    parser.add_argument("--client-threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", default="/healthz")
+    parser.add_argument("--token", default=None)
+    args = parser.parse_args()
+
+    # Ölçülen route'lar worker'lar arası durum paylaşmaz: bellek içi backend'lerle de başlasın
+    os.environ.setdefault("GUNICORN_ALLOW_LOCAL_STATE", "1")
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    print(f"{args.path}: {args.clients}x{args.client_threads} istemci, {args.duration:.0f} sn, "
+          f"worker başına {args.threads} thread")
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        process = start_gunicorn(port, workers, args.threads)
+        try:
+            latencies, errors = run_load(f"http://127.0.0.1:{port}{args.path}", headers,
+                                         args.clients, args.client_threads, args.duration)
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+        rps = len(latencies) / args.duration
+        baseline = baseline or rps
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"  {workers:>2} worker: {rps:8.1f} istek/sn ({rps / baseline:.1f}x)  "
+              f"p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  hata {errors}")
+
+
+if __name__ == "__main__":
+    main()
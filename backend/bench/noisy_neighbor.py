@@ -0,0 +1,168 @@
+# -----------------------
+# Gürültülü komşu testi (hız sınırı + adil Gemini slot kuyruğu)
+# -----------------------
+# Gemini eşzamanlılığı küçük (--slots) tutulur; --quiet kullanıcı kapalı döngüde
+# (cevap + kısa düşünme süresi) POST /chat/<id> gönderirken tek bir kullanıcı
+# --noisy thread ile her seferinde yeni sohbet açarak durmadan istek yağdırır.
+# Senaryolar (sessiz kullanıcıların p50/p95'i ölçülür):
+#   tek başına       : gürültülü kullanıcı yok (taban çizgisi)
+#   korumasız        : hız sınırı kapalı, slotlar geliş sırasıyla (FIFO)
+#   adil kuyruk      : hız sınırı kapalı, slotlar kullanıcılar arası adil (WFQ)
+#   sınır + adil     : kullanıcı başına token kovası + adil kuyruk
+# Korumalı senaryolarda sessiz kullanıcıların p95'i taban p95 + --bound-slack x gecikme
+# sınırının altında kalmalı; korumasızda aşılması testin duyarlılığını gösterir.
+# PostgreSQL gerekmez (bellek içi sohbet deposu, boş profil).
+# Kullanım: python bench/noisy_neighbor.py --quiet 5 --noisy 40 --duration 10
+import argparse
+import datetime
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import jwt
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+def check(label, ok, detail):
+    print(f"  [{'OK' if ok else 'HATA'}] {label}: {detail}")
+    return ok
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+class Client:
+    # Kapalı döngü: cevap gelince (düşünme süresi kadar bekleyip) yeni istek
+    def __init__(self, base, secret, username, think):
+        self.base = base
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = "Bearer " + jwt.encode({
+            "username": username, "role": "user", "user_id": abs(hash(username)) % 10 ** 6,
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        }, secret, algorithm="HS256")
+        self.username = username
+        self.think = think
+
+    def loop(self, stop, chat_ids, results):
+        rng = random.Random(self.username)
+        while not stop.is_set():
+            chat_id = next(chat_ids)
+            # Mesajlar farklı: aynı prompt'lar single-flight ile birleşirdi
+            started = time.perf_counter()
+            response = self.session.post(f"{self.base}/chat/{chat_id}",
+                                         json={"message": f"başım ağrıyor ({self.username} {chat_id})"}, timeout=120)
+            results.append((time.perf_counter() - started, response.status_code, response.headers.get("Retry-After")))
+            if self.think:
+                stop.wait(rng.uniform(self.think / 2, self.think * 1.5))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quiet", type=int, default=5, help="sessiz kullanıcı sayısı")
+    parser.add_argument("--noisy", type=int, default=40, help="gürültülü kullanıcının eşzamanlı thread'i")
+    parser.add_argument("--duration", type=float, default=10.0, help="senaryo başına sn")
+    parser.add_argument("--latency", type=float, default=0.2, help="Gemini gecikmesi (sn)")
+    parser.add_argument("--slots", type=int, default=4, help="GEMINI_MAX_CONCURRENCY")
+    parser.add_argument("--think", type=float, default=0.5, help="sessiz kullanıcı düşünme süresi (sn)")
+    parser.add_argument("--bound-slack", type=float, default=2.0,
+                        help="p95 sınırı = taban p95 + bu kadar Gemini gecikmesi")
+    args = parser.parse_args()
+
+    fake, base = start_fake_gemini(latency=args.latency)
+    os.environ.update({"GEMINI_API_BASE": base, "GEMINI_API_KEY": "bench",
+                       "GEMINI_MAX_CONCURRENCY": str(args.slots), "GEMINI_POOL_SIZE": str(args.noisy + args.quiet),
+                       "RATE_LIMIT": "memory"})
+    os.environ.setdefault("CHAT_STORE", "memory")
+    # Sessiz kullanıcılar (~düşünme süresi başına 1 istek) sınıra takılmasın
+    os.environ.setdefault("RATE_LIMIT_CHAT_PER_MIN", "120")
+    os.environ.setdefault("RATE_LIMIT_CHAT_BURST", "10")
+    os.environ.setdefault("JWT_SECRET", "bench-secret-bench-secret-bench-secret")
+    import server  # noqa: E402
+    from profile_cache import build_profile_context  # noqa: E402
+    server.profile_cache.loader = lambda username: build_profile_context(None)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+    httpd.socket.listen(256)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}"
+    limit = server.rate_limiter.limits["chat"]
+    print(f"{args.quiet} sessiz kullanıcı, gürültülü kullanıcı {args.noisy} thread; {args.slots} Gemini slotu, "
+          f"gecikme {args.latency} sn; sohbet sınırı {limit.per_minute:.0f}/dk, burst {limit.burst:.0f}")
+
+    chat_ids = iter(range(1, 10 ** 9))
+
+    def scenario(name, noisy, limited, fair):
+        # Her senaryoda yeni kullanıcı adları: önceki senaryonun kovaları etkilemesin
+        server.rate_limiter.enabled = limited
+        server.gemini.slots.fair = fair
+        stop = threading.Event()
+        quiet_results, noisy_results = [], []
+        threads = [threading.Thread(target=Client(url, server.JWT_SECRET, f"{name}_quiet{i}", args.think).loop,
+                                    args=(stop, chat_ids, quiet_results)) for i in range(args.quiet)]
+        if noisy:
+            noisy_client = Client(url, server.JWT_SECRET, f"{name}_noisy", 0)
+            threads += [threading.Thread(target=noisy_client.loop, args=(stop, chat_ids, noisy_results))
+                        for _ in range(args.noisy)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        quiet_ok = [r[0] for r in quiet_results if r[1] == 200]
+        result = {
+            "p50": percentile(quiet_ok, 50),
+            "p95": percentile(quiet_ok, 95),
+            "quiet": len(quiet_results),
+            "quiet_errors": len(quiet_results) - len(quiet_ok),
+            "noisy_ok": sum(1 for r in noisy_results if r[1] == 200),
+            "noisy_limited": sum(1 for r in noisy_results if r[1] == 429),
+            "retry_after": sum(1 for r in noisy_results if r[1] == 429 and r[2]),
+        }
+        print(f"- {name}: sessiz {result['quiet']} istek (hata {result['quiet_errors']}), "
+              f"p50 {result['p50'] * 1000:.0f} ms, p95 {result['p95'] * 1000:.0f} ms; "
+              f"gürültülü {result['noisy_ok']} cevap, {result['noisy_limited']} x 429")
+        return result
+
+    passed = True
+    alone = scenario("tek_basina", noisy=False, limited=True, fair=True)
+    bound = alone["p95"] + args.bound_slack * args.latency
+    unprotected = scenario("korumasiz", noisy=True, limited=False, fair=False)
+    fair_only = scenario("adil_kuyruk", noisy=True, limited=False, fair=True)
+    protected = scenario("sinir_adil", noisy=True, limited=True, fair=True)
+
+    passed &= check("korumasız sınırı aşıyor (testin duyarlılığı)", unprotected["p95"] > bound,
+                    f"p95 {unprotected['p95'] * 1000:.0f} ms > {bound * 1000:.0f} ms")
+    for label, r in (("adil kuyruk", fair_only), ("sınır + adil kuyruk", protected)):
+        passed &= check(f"{label} p95", r["p95"] <= bound and r["quiet_errors"] == 0,
+                        f"sessiz p95 {r['p95'] * 1000:.0f} ms <= {bound * 1000:.0f} ms "
+                        f"(taban {alone['p95'] * 1000:.0f} ms), hata {r['quiet_errors']}")
+    passed &= check("429 + Retry-After", protected["noisy_limited"] > 0
+                    and protected["retry_after"] == protected["noisy_limited"],
+                    f"{protected['noisy_limited']} x 429, {protected['retry_after']} tanesinde Retry-After")
+    # Gürültülü kullanıcı sınır içinde kalır: burst + dakikalık oran x süre
+    allowed = limit.burst + limit.per_minute / 60 * args.duration
+    passed &= check("gürültülü kullanıcı kotası", protected["noisy_ok"] <= allowed + 1,
+                    f"{protected['noisy_ok']} cevap <= {allowed:.0f}")
+    print(f"  slotlar: {server.gemini.slots.stats()}")
+    print(f"  hız sınırı: {server.rate_limiter.stats()['endpoints']}")
+
+    httpd.shutdown()
+    fake.shutdown()
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
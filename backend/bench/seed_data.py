@@ -0,0 +1,258 @@
+# -----------------------
+# Benchmark verisi: şema + sentetik kullanıcı/sohbet/soru/PDF
+# -----------------------
+# Tüm kayıtlar --prefix ile başlayan kullanıcı adlarına aittir; --reset önceki
+# tohumlamayı (sohbetler, sorular, mesajlar, randevular dahil) siler. Aynı --seed
+# ile aynı veri üretilir. Boş bir veritabanında --create-schema temel tabloları
+# (migration'lardan önce var olan users, doctor_questions, doctor_messages,
+# appointments) kodun kullandığı sütunlarla oluşturur, ardından migrate() çalışır.
+# Sohbetler chat_store üzerinden yazılır (CHAT_STORE=memory ise süreç içinde kalır).
+# Kullanım: python bench/seed_data.py --scale medium --reset [--create-schema]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from psycopg2.extras import execute_values
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db  # noqa: E402
+import migrations  # noqa: E402
+from bench_pdf_parser import make_synthetic_pdf  # noqa: E402
+
+# kullanıcı, doktor, kullanıcı başına sohbet, sohbet başına mesaj,
+# kullanıcı başına soru, soru başına mesaj, PDF sayısı, PDF sayfa sayısı
+SCALES = {
+    "small": dict(users=50, doctors=5, chats=3, chat_messages=20, questions=2, question_messages=4,
+                  pdfs=4, pdf_pages=2),
+    "medium": dict(users=500, doctors=25, chats=5, chat_messages=40, questions=3, question_messages=6,
+                   pdfs=8, pdf_pages=5),
+    "large": dict(users=5000, doctors=100, chats=8, chat_messages=60, questions=4, question_messages=8,
+                  pdfs=16, pdf_pages=20),
+}
+
+BASE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        firstname TEXT,
+        lastname TEXT,
+        gender TEXT,
+        role TEXT NOT NULL DEFAULT 'user',
+        specialization TEXT,
+        license_number TEXT,
+        age INTEGER,
+        height INTEGER,
+        weight INTEGER,
+        chronic TEXT,
+        avatar TEXT
+    );
+    CREATE TABLE IF NOT EXISTS doctor_questions (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id),
+        doctor_id INTEGER REFERENCES users(id),
+        subject TEXT,
+        message TEXT,
+        doctor_reply TEXT,
+        user_reply TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        user_deleted BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS doctor_messages (
+        id SERIAL PRIMARY KEY,
+        question_id INTEGER REFERENCES doctor_questions(id) ON DELETE CASCADE,
+        sender TEXT NOT NULL,
+        message TEXT,
+        file_url TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS appointments (
+        id SERIAL PRIMARY KEY,
+        username TEXT NOT NULL,
+        title TEXT NOT NULL,
+        datetime TIMESTAMP NOT NULL
+    );
+"""
+
+SPECIALIZATIONS = ["Dahiliye", "Kardiyoloji", "Endokrinoloji", "Nöroloji", "Dermatoloji"]
+SYMPTOMS = ["baş ağrısı", "halsizlik", "mide bulantısı", "öksürük", "sırt ağrısı", "uykusuzluk"]
+
+
+def create_schema():
+    with db.connection() as conn:
+        conn.cursor().execute(BASE_SCHEMA)
+    migrations.migrate()
+
+
+def reset(prefix):
+    pattern = f"{prefix}\\_%"
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE username LIKE %s", (pattern,))
+        ids = [row[0] for row in cursor.fetchall()]
+        if ids:
+            cursor.execute(
+                """
+                DELETE FROM doctor_messages WHERE question_id IN (
+                    SELECT id FROM doctor_questions WHERE user_id = ANY(%s) OR doctor_id = ANY(%s))
+                """,
+                (ids, ids)
+            )
+            cursor.execute("DELETE FROM doctor_questions WHERE user_id = ANY(%s) OR doctor_id = ANY(%s)", (ids, ids))
+        cursor.execute("DELETE FROM appointments WHERE username LIKE %s", (pattern,))
+        cursor.execute("DELETE FROM chat_messages WHERE username LIKE %s", (pattern,))
+        cursor.execute("DELETE FROM chats WHERE username LIKE %s", (pattern,))
+        cursor.execute("DELETE FROM users WHERE username LIKE %s", (pattern,))
+    return len(ids)
+
+
+def _insert_users(cursor, rows):
+    return [row[0] for row in execute_values(
+        cursor,
+        """
+        INSERT INTO users (username, password_hash, firstname, lastname, gender, role, specialization,
+                           license_number, age, height, weight, chronic)
+        VALUES %s RETURNING id
+        """,
+        rows, fetch=True
+    )]
+
+
+def seed_database(prefix, scale, rng):
+    # {"users": [(id, kullanıcı adı)], "doctors": [...], "questions": [(soru id, kullanıcı adı, doktor id)]}
+    password_hash = generate_password_hash("bench")
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        doctor_names = [f"{prefix}_doctor{i}" for i in range(scale["doctors"])]
+        doctor_ids = _insert_users(cursor, [
+            (name, password_hash, "Dr", str(i), rng.choice("EK"), "doctor",
+             SPECIALIZATIONS[i % len(SPECIALIZATIONS)], f"LIC{i:05d}", None, None, None, None)
+            for i, name in enumerate(doctor_names)
+        ])
+        user_names = [f"{prefix}_user{i}" for i in range(scale["users"])]
+        user_ids = _insert_users(cursor, [
+            (name, password_hash, "Test", str(i), rng.choice("EK"), "user", None, None,
+             rng.randint(18, 80), rng.randint(150, 195), rng.randint(45, 120),
+             rng.choice(["", "", "hipertansiyon", "diyabet", "astım"]))
+            for i, name in enumerate(user_names)
+        ])
+
+        questions = []
+        for user_id, username in zip(user_ids, user_names):
+            for q in range(scale["questions"]):
+                symptom = rng.choice(SYMPTOMS)
+                doctor_id = rng.choice(doctor_ids)
+                cursor.execute(
+                    """
+                    INSERT INTO doctor_questions (user_id, doctor_id, subject, status, first_user_message, created_at)
+                    VALUES (%s, %s, %s, %s, %s, NOW() - make_interval(mins => %s))
+                    RETURNING id
+                    """,
+                    (user_id, doctor_id, f"{symptom} hakkında", rng.choice(["pending", "answered"]),
+                     f"Birkaç gündür {symptom} var.", rng.randint(1, 60 * 24 * 30))
+                )
+                question_id = cursor.fetchone()[0]
+                message_rows = [
+                    (question_id, "user" if m % 2 == 0 else "doctor",
+                     f"Birkaç gündür {symptom} var." if m == 0 else f"bench mesaj {m}")
+                    for m in range(scale["question_messages"])
+                ]
+                message_ids = [row[0] for row in execute_values(
+                    cursor,
+                    "INSERT INTO doctor_messages (question_id, sender, message, created_at) VALUES %s RETURNING id",
+                    message_rows, template="(%s, %s, %s, NOW())", fetch=True
+                )]
+                doctor_replies = [r[2] for r in message_rows if r[1] == "doctor"]
+                cursor.execute(
+                    "UPDATE doctor_questions SET last_message_id=%s, last_doctor_reply=%s WHERE id=%s",
+                    (message_ids[-1], doctor_replies[-1] if doctor_replies else None, question_id)
+                )
+                questions.append((question_id, username, doctor_id))
+
+        execute_values(
+            cursor,
+            "INSERT INTO appointments (username, title, datetime) VALUES %s",
+            [(name, "Kontrol", f"2030-01-{1 + i % 28:02d}T10:00:00") for name in user_names for i in range(2)]
+        )
+    return {
+        "users": list(zip(user_ids, user_names)),
+        "doctors": list(zip(doctor_ids, doctor_names)),
+        "questions": questions,
+    }
+
+
+def seed_chats(chat_store, usernames, scale, rng):
+    # Her kullanıcıya scale["chats"] sohbet, her sohbete kullanıcı/bot sırasıyla mesaj
+    for username in usernames:
+        chat_ids = [chat_store.ensure_default_chat(username)]
+        while len(chat_ids) < scale["chats"]:
+            chat_ids.append(chat_store.create_chat(username))
+        for chat_id in chat_ids:
+            for m in range(scale["chat_messages"]):
+                if m % 2 == 0:
+                    chat_store.append(username, chat_id, "user", f"Son zamanlarda {rng.choice(SYMPTOMS)} yaşıyorum.")
+                else:
+                    chat_store.append(username, chat_id, "bot", "Bol su için ve dinlenin. Ne zamandır var?")
+
+
+def make_pdfs(scale, seed, directory=None):
+    directory = directory or tempfile.mkdtemp(prefix="chatdoc-bench-pdf-")
+    paths = []
+    for i in range(scale["pdfs"]):
+        path = os.path.join(directory, f"tahlil_{i}.pdf")
+        make_synthetic_pdf(path, scale["pdf_pages"], seed=seed + i)
+        paths.append(path)
+    return paths
+
+
+def resolve_scale(name, overrides):
+    scale = dict(SCALES[name])
+    scale.update({k: v for k, v in overrides.items() if v is not None})
+    return scale
+
+
+def add_scale_arguments(parser):
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for key in SCALES["small"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=int, default=None)
+    parser.add_argument("--prefix", default="bench_h", help="tohumlanan kullanıcı adı öneki")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def scale_from_args(args):
+    return resolve_scale(args.scale, {key: getattr(args, key) for key in SCALES["small"]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_scale_arguments(parser)
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--create-schema", action="store_true")
+    args = parser.parse_args()
+    scale = scale_from_args(args)
+    rng = random.Random(args.seed)
+
+    if args.create_schema:
+        create_schema()
+    if args.reset:
+        print(f"Silinen kullanıcı: {reset(args.prefix)}")
+    from chat_store import create_chat_store
+
+    start = time.perf_counter()
+    seeded = seed_database(args.prefix, scale, rng)
+    seed_chats(create_chat_store(os.getenv("CHAT_STORE", "postgres")),
+               [name for _, name in seeded["users"]], scale, rng)
+    print(f"{scale['users']} kullanıcı, {scale['doctors']} doktor, "
+          f"{len(seeded['questions'])} soru tohumlandı "
+          f"({time.perf_counter() - start:.1f} sn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# -----------------------
+# SSE (/events) kapasite testi (gunicorn.conf.py ile)
+# -----------------------
+# Uygulamayı dağıtımdaki ayarlarla (gunicorn.conf.py, gthread) tek worker'da başlatır,
+# worker'ın thread sayısından fazla EventSource bağlantısı açar ve bu sırada
+# /healthz isteklerinin gecikmesini ölçer. Senaryolar:
+#   sınırlı  : EVENT_MAX_SUBSCRIPTIONS varsayılan (GUNICORN_THREADS / 4)
+#              -> fazla bağlantılar hemen 503 + Retry-After, diğer istekler hızlı
+#   sınırsız : EVENT_MAX_SUBSCRIPTIONS çok büyük -> akışlar tüm thread'leri tutar,
+#              diğer istekler zaman aşımına düşer (testin duyarlılığı)
+#   ayrı havuz: gunicorn.events.conf.py (tek worker x --pool-threads) -> hedef panel
+#              sayısı (--pool-streams) 503 almadan bağlanır, /healthz yine hızlı
+# PostgreSQL gerekmez (EVENT_BUS/CHAT_STORE bellek içi, token'da user_id var).
+# Kullanım: python bench/sse_capacity.py --threads 32 --streams 64 --pool-streams 1000
+import argparse
+import datetime
+import os
+import sys
+import threading
+import time
+
+import jwt
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_workers import free_port, start_gunicorn  # noqa: E402
+
+SECRET = "bench-secret-bench-secret-bench-secret"
+
+
+def check(label, ok, detail):
+    print(f"  [{'OK' if ok else 'HATA'}] {label}: {detail}")
+    return ok
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def token(i):
+    return jwt.encode({
+        "username": f"sse_user{i}", "role": "user", "user_id": i + 1,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, SECRET, algorithm="HS256")
+
+
+def open_stream(url, i, results, streams):
+    # 200 ise "ready" olayına kadar okur ve bağlantıyı açık bırakır
+    try:
+        response = requests.get(f"{url}/events", params={"token": token(i)}, stream=True, timeout=(5, 60))
+    except requests.RequestException:
+        results.append(("error", None))
+        return
+    if response.status_code == 200:
+        lines = response.iter_lines()
+        while next(lines, b"") != b"event: ready":
+            pass
+        streams.append(response)
+    else:
+        response.close()
+    results.append((response.status_code, response.headers.get("Retry-After")))
+
+
+def scenario(name, args, max_subscriptions, streams_count=None, config="gunicorn.conf.py", threads=None):
+    # max_subscriptions None: sınırı config belirler (ayrı havuz)
+    streams_count = streams_count or args.streams
+    threads = threads or args.threads
+    os.environ.pop("EVENT_MAX_SUBSCRIPTIONS", None)
+    if max_subscriptions is not None:
+        os.environ["EVENT_MAX_SUBSCRIPTIONS"] = str(max_subscriptions)
+    os.environ.update({"GUNICORN_THREADS": str(threads), "EVENTS_THREADS": str(threads)})
+    port = free_port()
+    process = start_gunicorn(port, 1, threads, config)
+    url = f"http://127.0.0.1:{port}"
+    results, streams = [], []
+    try:
+        openers = [threading.Thread(target=open_stream, args=(url, i, results, streams), daemon=True)
+                   for i in range(streams_count)]
+        for opener in openers:
+            opener.start()
+        deadline = time.monotonic() + 30
+        for opener in openers:
+            opener.join(timeout=max(0.0, deadline - time.monotonic()))
+        latencies, failures = [], 0
+        for _ in range(args.probes):
+            started = time.perf_counter()
+            try:
+                ok = requests.get(f"{url}/healthz", timeout=args.probe_timeout).status_code == 200
+            except requests.RequestException:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            failures += not ok
+    finally:
+        for response in streams:
+            response.close()
+        process.terminate()
+        process.wait(timeout=60)
+    result = {
+        "open": sum(1 for status, _ in results if status == 200),
+        "rejected": sum(1 for status, _ in results if status == 503),
+        "retry_after": sum(1 for status, retry in results if status == 503 and retry),
+        "p95": percentile(latencies, 95),
+        "failures": failures,
+    }
+    print(f"- {name}: {streams_count} bağlantı -> {result['open']} açık akış, {result['rejected']} x 503; "
+          f"/healthz p95 {result['p95'] * 1000:.0f} ms, {failures}/{args.probes} başarısız")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32, help="GUNICORN_THREADS")
+    parser.add_argument("--streams", type=int, default=64, help="açılacak /events bağlantısı")
+    parser.add_argument("--probes", type=int, default=20, help="akışlar açıkken /healthz isteği")
+    parser.add_argument("--probe-timeout", type=float, default=2.0)
+    parser.add_argument("--pool-streams", type=int, default=1000, help="ayrı SSE havuzuna bağlanacak panel")
+    parser.add_argument("--pool-threads", type=int, default=1040, help="ayrı SSE havuzu EVENTS_THREADS")
+    args = parser.parse_args()
+
+    # Tek worker, bellek içi olay yolu: SSE havuzunun EVENT_BUS=postgres şartı burada gevşetilir
+    os.environ.update({"EVENT_BUS": "memory", "CHAT_STORE": "memory", "RATE_LIMIT": "off",
+                       "JWT_SECRET": SECRET, "GEMINI_API_KEY": "bench", "GUNICORN_ALLOW_LOCAL_STATE": "1"})
+    cap = max(1, args.threads // 4)
+    print(f"gunicorn.conf.py, 1 worker x {args.threads} thread; abonelik sınırı {cap}")
+    limited = scenario("sınırlı", args, cap)
+    unlimited = scenario("sınırsız", args, 10 ** 6)
+    pool = scenario("ayrı havuz", args, None, args.pool_streams, "gunicorn.events.conf.py", args.pool_threads)
+
+    passed = True
+    passed &= check("sınırsız thread'leri tüketiyor (testin duyarlılığı)", unlimited["failures"] > 0,
+                    f"{unlimited['failures']}/{args.probes} /healthz başarısız")
+    passed &= check("sınır kadar akış", limited["open"] == cap, f"{limited['open']} açık akış (sınır {cap})")
+    passed &= check("fazlası 503 + Retry-After",
+                    limited["rejected"] == args.streams - cap and limited["retry_after"] == limited["rejected"],
+                    f"{limited['rejected']} x 503, {limited['retry_after']} tanesinde Retry-After")
+    passed &= check("diğer istekler", limited["failures"] == 0 and limited["p95"] < args.probe_timeout / 2,
+                    f"/healthz p95 {limited['p95'] * 1000:.0f} ms, {limited['failures']} başarısız")
+    passed &= check("ayrı havuz hedef paneli taşıyor",
+                    pool["open"] == args.pool_streams and pool["rejected"] == 0,
+                    f"{pool['open']}/{args.pool_streams} açık akış, {pool['rejected']} x 503")
+    passed &= check("ayrı havuzda diğer istekler", pool["failures"] == 0 and pool["p95"] < args.probe_timeout / 2,
+                    f"/healthz p95 {pool['p95'] * 1000:.0f} ms, {pool['failures']} başarısız")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
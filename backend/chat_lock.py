@@ -0,0 +1,214 @@
+# -----------------------
+# Sohbet başına "bot cevaplıyor" kilidi
+# -----------------------
+# Aynı sohbete, önceki cevap bitmeden ikinci mesaj gönderilmesini engeller.
+# Kilit bir kiralamadır (lease): sahibi rastgele bir token ile tanınır, süresi
+# (CHAT_LOCK_LEASE) dolunca başkası alabilir. Böylece süreç çökse veya
+# release unutulsa bile sohbet sonsuza kadar kilitli kalmaz. Uzun akışlar renew() ile uzatır.
+# Backend CHAT_LOCK env değişkeniyle seçilir:
+#   "memory"   -> tek süreç (varsayılan)
+#   "postgres" -> chat_locks tablosu (migration 007), tüm worker'lar arasında geçerli
+# acquire(wait=...) > 0 ise kilit boşalana kadar beklenir (mesaj sıraya girer).
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import db
+
+# Gemini okuma zaman aşımından (60 sn) uzun olmalı
+CHAT_LOCK_LEASE = float(os.getenv("CHAT_LOCK_LEASE", "90"))
+# 0: meşgul sohbete gelen mesaj reddedilir (409); > 0: en fazla bu kadar sn sırada bekler
+CHAT_LOCK_WAIT = float(os.getenv("CHAT_LOCK_WAIT", "0"))
+
+Lease = namedtuple("Lease", "key token")
+
+
+def chat_lock_key(username, chat_id):
+    return f"{username}:{chat_id}"
+
+
+class _Stats:
+    def __init__(self):
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0
+        self.expired = 0
+        self.released = 0
+        self.lost = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self, **extra):
+        with self._lock:
+            return {
+                "acquired": self.acquired,
+                "rejected": self.rejected,
+                "waited": self.waited,
+                # Süresi dolmuş kilidin devralınması (sahibi release edemedi)
+                "expired": self.expired,
+                "released": self.released,
+                # Release anında kilit artık bu sahibin değildi (lease aşıldı)
+                "lost": self.lost,
+                **extra
+            }
+
+
+# -----------------------
+# Bellek içi backend
+# -----------------------
+class MemoryChatLock:
+    def __init__(self, lease=CHAT_LOCK_LEASE):
+        self.lease = lease
+        self._locks = {}  # key -> (token, expires_at)
+        self._cond = threading.Condition()
+        self._stats = _Stats()
+
+    def acquire(self, key, wait=0.0, lease=None):
+        # Lease veya (bekleme süresi dolarsa) None döner
+        lease = lease or self.lease
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        waited = False
+        with self._cond:
+            while True:
+                now = time.time()
+                held = self._locks.get(key)
+                if held is None or held[1] <= now:
+                    if held is not None:
+                        self._stats.incr("expired")
+                    self._locks[key] = (token, now + lease)
+                    self._stats.incr("acquired")
+                    if waited:
+                        self._stats.incr("waited")
+                    return Lease(key, token)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats.incr("rejected")
+                    return None
+                waited = True
+                self._cond.wait(min(remaining, held[1] - now))
+
+    def renew(self, lease, seconds=None):
+        with self._cond:
+            held = self._locks.get(lease.key)
+            if held is None or held[0] != lease.token:
+                return False
+            self._locks[lease.key] = (lease.token, time.time() + (seconds or self.lease))
+            return True
+
+    def release(self, lease):
+        # Yalnızca sahibi bırakabilir; tekrar çağrılması zararsız
+        with self._cond:
+            held = self._locks.get(lease.key)
+            if held is None or held[0] != lease.token:
+                return False
+            del self._locks[lease.key]
+            self._cond.notify_all()
+        self._stats.incr("released")
+        if held[1] <= time.time():
+            self._stats.incr("lost")
+        return True
+
+    def stats(self):
+        with self._cond:
+            held = len(self._locks)
+        return self._stats.as_dict(backend="memory", held=held)
+
+
+# -----------------------
+# PostgreSQL backend (worker'lar arası)
+# -----------------------
+# Kilit bir satırdır: INSERT, satır yoksa veya süresi dolmuşsa başarılı olur.
+# Advisory lock yerine tablo: akış sırasında DB bağlantısı tutulmaz (db.release_db)
+# ve kilit bağlantıdan bağımsız olarak süre ile sona erer.
+class PostgresChatLock:
+    def __init__(self, lease=CHAT_LOCK_LEASE, poll_interval=0.05, max_poll_interval=0.5):
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._stats = _Stats()
+
+    def _try_acquire(self, key, token, lease):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            # xmax <> 0: satır güncellendi, yani süresi dolmuş bir kilit devralındı
+            cursor.execute(
+                """
+                INSERT INTO chat_locks (lock_key, owner, expires_at)
+                VALUES (%s, %s, NOW() + make_interval(secs => %s))
+                ON CONFLICT (lock_key) DO UPDATE
+                    SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+                    WHERE chat_locks.expires_at <= NOW()
+                RETURNING xmax <> 0
+                """,
+                (key, token, lease)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        if row[0]:
+            self._stats.incr("expired")
+        return True
+
+    def acquire(self, key, wait=0.0, lease=None):
+        lease = lease or self.lease
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        interval = self.poll_interval
+        waited = False
+        while True:
+            if self._try_acquire(key, token, lease):
+                self._stats.incr("acquired")
+                if waited:
+                    self._stats.incr("waited")
+                return Lease(key, token)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats.incr("rejected")
+                return None
+            waited = True
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+
+    def renew(self, lease, seconds=None):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE chat_locks SET expires_at = NOW() + make_interval(secs => %s)
+                WHERE lock_key = %s AND owner = %s
+                """,
+                (seconds or self.lease, lease.key, lease.token)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, lease):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM chat_locks WHERE lock_key = %s AND owner = %s RETURNING expires_at <= NOW()",
+                (lease.key, lease.token)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        self._stats.incr("released")
+        if row[0]:
+            self._stats.incr("lost")
+        return True
+
+    def stats(self):
+        return self._stats.as_dict(backend="postgres")
+
+
+def create_chat_lock(kind):
+    if kind == "memory":
+        return MemoryChatLock()
+    if kind == "postgres":
+        return PostgresChatLock()
+    raise ValueError(f"Bilinmeyen CHAT_LOCK: {kind}")
@@ -0,0 +1,259 @@
+# -----------------------
+# Chat geçmişi deposu
+# -----------------------
+# { username: { chatId: [ {seq, sender, text}, ... ] } } semantiği korunur.
+# Backend CHAT_STORE env değişkeniyle seçilir: "memory" (varsayılan) | "postgres"
+# Sayfalama seq tabanlı cursor ile yapılır:
+#   before=<seq>  -> bu seq'ten önceki en yeni `limit` mesaj (artan sırada)
+#   after=<seq>   -> bu seq'ten sonraki ilk `limit` mesaj
+# Sohbet metadatası (başlık, son aktivite, mesaj sayısı) mesaj eklenirken
+# güncellenir; sidebar listesi mesaj gövdelerine dokunmaz.
+# Sohbet özeti (context_builder): (özet metni, özetin işlendiği son seq).
+import datetime
+import threading
+from abc import ABC, abstractmethod
+
+import db
+
+
+def make_chat_title(text):
+    # İlk satırı al, çok uzunsa kısalt
+    first_line = (text or "").strip().split("\n", 1)[0]
+    if not first_line:
+        return None
+    return first_line[:50] + ("..." if len(first_line) > 50 else "")
+
+
+def chat_summary(chat_id, title, last_activity, message_count):
+    return {
+        "chatId": chat_id,
+        "title": title or f"Sohbet {chat_id}",
+        "last_activity": last_activity.isoformat() if last_activity else None,
+        "message_count": message_count
+    }
+
+
+class ChatStore(ABC):
+    @abstractmethod
+    def create_chat(self, username):
+        ...
+
+    @abstractmethod
+    def ensure_default_chat(self, username):
+        ...
+
+    @abstractmethod
+    def list_chats(self, username, limit=100, after=0):
+        ...
+
+    @abstractmethod
+    def append(self, username, chat_id, sender, text):
+        ...
+
+    @abstractmethod
+    def get_messages(self, username, chat_id, limit=100, before=None, after=None):
+        ...
+
+    @abstractmethod
+    def get_summary(self, username, chat_id):
+        ...
+
+    @abstractmethod
+    def set_summary(self, username, chat_id, summary, summary_seq):
+        ...
+
+
+# -----------------------
+# Bellek içi backend (tek süreç, restart'ta kaybolur)
+# -----------------------
+class MemoryChatStore(ChatStore):
+    def __init__(self):
+        self._chats = {}
+        # _meta: { username: { chatId: {title, last_activity, message_count} } }
+        self._meta = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def _new_chat(self, username, chat_id):
+        self._chats.setdefault(username, {})[chat_id] = []
+        self._meta.setdefault(username, {})[chat_id] = {
+            "title": None, "last_activity": datetime.datetime.utcnow(), "message_count": 0
+        }
+        # Özet sidebar metadatasından ayrı tutulur (list_chats'e girmez)
+        self._summaries.setdefault(username, {})[chat_id] = (None, 0)
+
+    def create_chat(self, username):
+        with self._lock:
+            chat_id = max(self._chats.get(username, {}).keys(), default=0) + 1
+            self._new_chat(username, chat_id)
+            return chat_id
+
+    def ensure_default_chat(self, username):
+        with self._lock:
+            if not self._chats.get(username):
+                self._new_chat(username, 1)
+            return min(self._chats[username].keys())
+
+    def list_chats(self, username, limit=100, after=0):
+        with self._lock:
+            meta = self._meta.get(username, {})
+            chat_ids = sorted(cid for cid in meta if cid > after)[:limit]
+            return [chat_summary(cid, **meta[cid]) for cid in chat_ids]
+
+    def append(self, username, chat_id, sender, text):
+        with self._lock:
+            if chat_id not in self._chats.get(username, {}):
+                self._new_chat(username, chat_id)
+            messages = self._chats[username][chat_id]
+            # seq = liste indeksi + 1, böylece cursor doğrudan dilim sınırı olur
+            message = {"seq": len(messages) + 1, "sender": sender, "text": text}
+            messages.append(message)
+
+            meta = self._meta[username][chat_id]
+            meta["message_count"] = len(messages)
+            meta["last_activity"] = datetime.datetime.utcnow()
+            if meta["title"] is None and sender == "user":
+                meta["title"] = make_chat_title(text)
+            return message
+
+    def get_messages(self, username, chat_id, limit=100, before=None, after=None):
+        with self._lock:
+            messages = self._chats.get(username, {}).get(chat_id, [])
+            if after is not None:
+                return list(messages[after:after + limit])
+            end = len(messages) if before is None else max(0, min(before - 1, len(messages)))
+            return list(messages[max(0, end - limit):end])
+
+    def get_summary(self, username, chat_id):
+        with self._lock:
+            return self._summaries.get(username, {}).get(chat_id, (None, 0))
+
+    def set_summary(self, username, chat_id, summary, summary_seq):
+        with self._lock:
+            summaries = self._summaries.get(username, {})
+            if chat_id in summaries and summaries[chat_id][1] < summary_seq:
+                summaries[chat_id] = (summary, summary_seq)
+
+
+# -----------------------
+# PostgreSQL backend (append-only, worker'lar arası paylaşımlı)
+# -----------------------
+class PostgresChatStore(ChatStore):
+    def create_chat(self, username):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            # Aynı kullanıcı için eşzamanlı oluşturmalarda id çakışmasın
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (username,))
+            cursor.execute(
+                """
+                INSERT INTO chats (username, chat_id)
+                SELECT %s, COALESCE(MAX(chat_id), 0) + 1 FROM chats WHERE username=%s
+                RETURNING chat_id
+                """,
+                (username, username)
+            )
+            return cursor.fetchone()[0]
+
+    def ensure_default_chat(self, username):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MIN(chat_id) FROM chats WHERE username=%s", (username,))
+            chat_id = cursor.fetchone()[0]
+            if chat_id is not None:
+                return chat_id
+            cursor.execute(
+                "INSERT INTO chats (username, chat_id) VALUES (%s, 1) ON CONFLICT DO NOTHING",
+                (username,)
+            )
+            return 1
+
+    def list_chats(self, username, limit=100, after=0):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            # next_seq append-only tabloda mesaj sayısına eşittir
+            cursor.execute(
+                """
+                SELECT chat_id, title, last_activity, next_seq FROM chats
+                WHERE username=%s AND chat_id > %s
+                ORDER BY chat_id LIMIT %s
+                """,
+                (username, after, limit)
+            )
+            return [chat_summary(*row) for row in cursor.fetchall()]
+
+    def append(self, username, chat_id, sender, text):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            # Sohbet satırı seq sayacını tutar; satır kilidi seq'i sıralı yapar
+            cursor.execute(
+                """
+                INSERT INTO chats (username, chat_id, next_seq, title, last_activity)
+                VALUES (%s, %s, 1, %s, NOW())
+                ON CONFLICT (username, chat_id) DO UPDATE SET
+                    next_seq = chats.next_seq + 1,
+                    last_activity = NOW(),
+                    title = COALESCE(chats.title, EXCLUDED.title)
+                RETURNING next_seq
+                """,
+                (username, chat_id, make_chat_title(text) if sender == "user" else None)
+            )
+            seq = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO chat_messages (username, chat_id, seq, sender, text) VALUES (%s, %s, %s, %s, %s)",
+                (username, chat_id, seq, sender, text)
+            )
+            return {"seq": seq, "sender": sender, "text": text}
+
+    def get_messages(self, username, chat_id, limit=100, before=None, after=None):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            if after is not None:
+                cursor.execute(
+                    """
+                    SELECT seq, sender, text FROM chat_messages
+                    WHERE username=%s AND chat_id=%s AND seq > %s
+                    ORDER BY seq ASC LIMIT %s
+                    """,
+                    (username, chat_id, after, limit)
+                )
+                rows = cursor.fetchall()
+            else:
+                cursor.execute(
+                    """
+                    SELECT seq, sender, text FROM chat_messages
+                    WHERE username=%s AND chat_id=%s AND seq < %s
+                    ORDER BY seq DESC LIMIT %s
+                    """,
+                    (username, chat_id, before if before is not None else 2 ** 31 - 1, limit)
+                )
+                rows = cursor.fetchall()[::-1]
+            return [{"seq": r[0], "sender": r[1], "text": r[2]} for r in rows]
+
+    def get_summary(self, username, chat_id):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT summary, summary_seq FROM chats WHERE username=%s AND chat_id=%s",
+                (username, chat_id)
+            )
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else (None, 0)
+
+    def set_summary(self, username, chat_id, summary, summary_seq):
+        with db.connection() as conn:
+            # Eşzamanlı turlarda daha eski bir özet yenisinin üzerine yazılmasın
+            conn.cursor().execute(
+                """
+                UPDATE chats SET summary=%s, summary_seq=%s
+                WHERE username=%s AND chat_id=%s AND summary_seq < %s
+                """,
+                (summary, summary_seq, username, chat_id, summary_seq)
+            )
+
+
+def create_chat_store(kind):
+    if kind == "postgres":
+        return PostgresChatStore()
+    if kind == "memory":
+        return MemoryChatStore()
+    raise ValueError(f"Bilinmeyen CHAT_STORE: {kind}")
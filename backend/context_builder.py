@@ -0,0 +1,132 @@
+# -----------------------
+# Token bütçeli konuşma bağlamı
+# -----------------------
+# chat() prompt'undaki "Konuşma geçmişi" bölümünü üretir:
+#   - Son turlar olduğu gibi (en yeniden geriye, bütçe dolana kadar)
+#   - Pencereden düşen eski turlar sohbet başına tutulan özete eklenir
+#     (chat_store.get_summary / set_summary; özet hangi seq'e kadar işlendiğini bilir)
+#   - [PDF Analizi] mesajları referans dışı değer listesine indirgenir
+# Özet çıkarımsaldır (ek Gemini çağrısı yok): her eski turdan kısa bir satır.
+# Token sayısı yaklaşıktır (estimate_tokens); amaç prompt boyutunu sınırlamak.
+import os
+import re
+from collections import namedtuple
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_SUMMARY_BUDGET = int(os.getenv("CONTEXT_SUMMARY_BUDGET", "300"))
+CONTEXT_RECENT_MAX = int(os.getenv("CONTEXT_RECENT_MAX", "20"))
+# Özet ilk kez oluşturulurken en fazla bu kadar eski mesaj işlenir
+CONTEXT_FOLD_MAX = 200
+SUMMARY_LINE_CHARS = 120
+
+PDF_PREFIX = "[PDF Analizi]"
+PDF_UPLOAD_PREFIX = "[PDF dosyası yüklendi]"
+OUT_OF_RANGE_HEADER = "Referans dışı değerler bulundu:"
+
+# Türkçe gibi eklemeli dillerde BPE parçaları kısa: kelimeyi 4 karakterlik
+# parçalara böl, noktalama ayrı token
+_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+
+SUMMARY_HEADER = "Önceki konuşmanın özeti:\n{summary}\n\nSon mesajlar:\n"
+
+Context = namedtuple("Context", "history_text summary turns tokens")
+
+
+def estimate_tokens(text):
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def compact_pdf_analysis(text):
+    # format_pdf_reply çıktısından yalnızca referans dışı değerler
+    lines = text.split("\n")
+    values = []
+    for i, line in enumerate(lines):
+        if OUT_OF_RANGE_HEADER in line:
+            for item in lines[i + 1:]:
+                if not item.startswith("- "):
+                    break
+                values.append(item[2:].strip())
+            break
+    if values:
+        return f"{PDF_PREFIX} Referans dışı değerler: " + "; ".join(values)
+    return f"{PDF_PREFIX} Önemli değerler referans aralıklarında."
+
+
+def compact_text(message):
+    text = message["text"] or ""
+    if message["sender"] == "bot" and text.startswith(PDF_PREFIX):
+        return compact_pdf_analysis(text)
+    return text
+
+
+def summary_line(message):
+    text = " ".join(compact_text(message).split())
+    if not text.startswith(PDF_PREFIX):
+        # İlk cümle yeterli
+        text = _SENTENCE_RE.split(text, 1)[0]
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS].rstrip() + "..."
+    who = "Kullanıcı" if message["sender"] == "user" else "Asistan"
+    return f"- {who}: {text}"
+
+
+def fold_summary(summary, messages, budget):
+    lines = [line for line in (summary or "").split("\n") if line]
+    lines.extend(summary_line(m) for m in messages
+                 if not (m["sender"] == "user" and (m["text"] or "").startswith(PDF_UPLOAD_PREFIX)))
+    # Bütçe aşılırsa en eski satırlar atılır; tahlil (PDF) satırları en son gider
+    while lines and estimate_tokens("\n".join(lines)) > budget:
+        index = next((i for i, line in enumerate(lines) if PDF_PREFIX not in line), 0)
+        lines.pop(index)
+    return "\n".join(lines)
+
+
+def truncate_to_tokens(text, budget):
+    tokens = 0
+    for match in _TOKEN_RE.finditer(text):
+        tokens += 1
+        if tokens > budget:
+            return text[:match.start()].rstrip() + "..."
+    return text
+
+
+def build_context(store, username, chat_id, budget=CONTEXT_TOKEN_BUDGET,
+                  summary_budget=CONTEXT_SUMMARY_BUDGET, recent_max=CONTEXT_RECENT_MAX):
+    messages = store.get_messages(username, chat_id, limit=recent_max)
+    summary, summary_seq = store.get_summary(username, chat_id)
+
+    # Son turlar: en yeniden geriye, bütçe dolana kadar (en yeni mesaj her zaman).
+    # Geçmişin tamamı sığmıyorsa özete summary_budget ayrılır.
+    candidates = [f"{m['sender'].capitalize()}: {compact_text(m)}\n" for m in messages]
+    costs = [estimate_tokens(line) for line in candidates]
+    fits = not summary and (not messages or messages[0]["seq"] <= 1) and sum(costs) <= budget
+    verbatim_budget = budget if fits else budget - summary_budget - estimate_tokens(SUMMARY_HEADER)
+    lines, used = [], 0
+    for line, tokens in zip(reversed(candidates), reversed(costs)):
+        if lines and used + tokens > verbatim_budget:
+            break
+        if not lines and tokens > verbatim_budget:
+            line = truncate_to_tokens(line, verbatim_budget) + "\n"
+            tokens = verbatim_budget
+        lines.append(line)
+        used += tokens
+    lines.reverse()
+    kept = len(lines)
+
+    # Pencereden düşen ve henüz özete girmemiş mesajlar özete eklenir
+    dropped = [m for m in messages[:len(messages) - kept] if m["seq"] > summary_seq]
+    first_seq = messages[0]["seq"] if messages else 0
+    if first_seq - 1 > summary_seq:
+        gap = min(first_seq - 1 - summary_seq, CONTEXT_FOLD_MAX)
+        older = store.get_messages(username, chat_id, limit=gap, before=first_seq)
+        dropped = [m for m in older if m["seq"] > summary_seq] + dropped
+    if dropped:
+        summary = fold_summary(summary, dropped, summary_budget)
+        summary_seq = dropped[-1]["seq"]
+        store.set_summary(username, chat_id, summary, summary_seq)
+
+    history_text = "".join(lines)
+    if summary:
+        history_text = SUMMARY_HEADER.format(summary=summary) + history_text
+    return Context(history_text, summary, kept, estimate_tokens(history_text))
@@ -0,0 +1,132 @@
+# -----------------------
+# Tehlikeli ifade eşleştirici (Aho–Corasick)
+# -----------------------
+# İfadeler başlangıçta tek bir otomata derlenir; her mesaj tek geçişte taranır.
+# Metin ve ifadeler aynı Türkçe normalizasyondan geçer:
+#   - Türkçe küçük harf: "İ" -> "i", "I" -> "ı" (str.lower() "İ" -> "i̇" yapar)
+#   - Aksan katlama: ç/ğ/ı/ö/ş/ü -> c/g/i/o/s/u ("gogus agrisi" de eşleşir)
+#   - Ardışık boşluklar tek boşluk
+# İfadeler kelime başında eşleşir, sonu açıktır: Türkçe ekli biçimler de yakalanır
+#   "göğüs ağrısı" -> "göğüs ağrısım var", "kalp krizi" -> "kalp krizim oluyor"
+#   (ama "xgöğüs ağrısı" gibi kelime ortasındaki eşleşmeler değil)
+# Kısa ve katlanınca belirsizleşen ifadeler sonda $ ile tam kelime olarak eşleşir:
+#   "şok$" -> "şok", "ŞOK!" (ama katlanınca "sok" ile başlayan "sokak", "soktum" değil)
+# Eski listelerdeki sondaki * (kök işareti) artık varsayılan davranıştır ve yok sayılır.
+# Eşleşme konumları orijinal metindeki indekslerdir.
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+DangerMatch = namedtuple("DangerMatch", ["phrase", "start", "end"])
+
+_TURKISH_LOWER = {"İ": "i", "I": "ı"}
+_FOLD = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(ch):
+    lowered = _TURKISH_LOWER.get(ch) or ch.lower()
+    folded = unicodedata.normalize("NFD", lowered.translate(_FOLD))
+    return "".join(c for c in folded if not unicodedata.combining(c))
+
+
+def normalize(text):
+    # (normalize edilmiş metin, her karakterin orijinal indeksi) döndürür
+    chars = []
+    positions = []
+    prev_space = False
+    fold = _fold_char
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if prev_space or not chars:
+                continue
+            chars.append(" ")
+            positions.append(i)
+            prev_space = True
+            continue
+        prev_space = False
+        folded = fold(ch)
+        if len(folded) == 1:
+            chars.append(folded)
+            positions.append(i)
+            continue
+        for c in folded:
+            chars.append(c)
+            positions.append(i)
+    return "".join(chars), positions
+
+
+class PhraseMatcher:
+    def __init__(self, phrases):
+        # _goto[state]: {karakter: sonraki durum}, _out[state]: biten ifadeler
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self.phrases = []
+        for phrase in phrases:
+            whole_word = phrase.endswith("$")
+            phrase = phrase.rstrip("$*").strip()
+            key = normalize(phrase)[0].strip()
+            if key:
+                self._add(key, phrase, whole_word)
+        self._build()
+
+    def _add(self, key, phrase, whole_word=False):
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((phrase, len(key), whole_word))
+        self.phrases.append(phrase)
+
+    def _build(self):
+        # BFS ile failure linkleri; çıktı listeleri fail zinciriyle birleştirilir
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _scan(self, text):
+        normalized, positions = normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        last = len(normalized) - 1
+        state = 0
+        for i, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for phrase, length, whole_word in out[state]:
+                start = i - length + 1
+                # Kelime sınırı: öncesi (tam kelimede sonrası da) harf/rakam olmamalı
+                if start and normalized[start - 1].isalnum():
+                    continue
+                if whole_word and i < last and normalized[i + 1].isalnum():
+                    continue
+                yield DangerMatch(phrase, positions[start], positions[i] + 1)
+
+    def find_all(self, text):
+        return list(self._scan(text))
+
+    def search(self, text):
+        # İlk eşleşmede durur
+        return next(self._scan(text), None) is not None
+
+
+def load_phrases(path):
+    # Satır başına bir ifade (tam kelime için sonda $); boş satırlar ve # yorumları atlanır
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
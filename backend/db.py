@@ -0,0 +1,155 @@
+# -----------------------
+# PostgreSQL bağlantı havuzu
+# -----------------------
+# Her istek havuzdan kendi bağlantısını alır (flask.g), istek bitince
+# teardown'da havuza geri verilir. Kopmuş bağlantılar havuza dönmez, kapatılır.
+# ThreadedConnectionPool boşken beklemez (PoolError); havuz önünde bir semaphore
+# bağlantı boşalana kadar en fazla DB_CHECKOUT_TIMEOUT sn bekletir. Havuz boyutu
+# worker thread sayısından (GUNICORN_THREADS) + arka plan işleri payından türetilir.
+# Sorgu süreleri "db" aşaması olarak ölçülür (TimedCursor, bkz. metrics.py).
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+from flask import g, has_app_context
+from psycopg2 import extensions, pool
+
+from metrics import stage
+
+load_dotenv()
+
+DB_MIN_CONN = int(os.getenv("DB_MIN_CONN", "1"))
+# Her gthread thread'i bir istek bağlantısı + arka plan işleri / event bus dinleyicisi için pay
+DB_MAX_CONN = int(os.getenv("DB_MAX_CONN", str(int(os.getenv("GUNICORN_THREADS", "32")) + 8)))
+DB_CHECKOUT_TIMEOUT = float(os.getenv("DB_CHECKOUT_TIMEOUT", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# Havuzdaki bağlantı sayısı kadar; close_pool sonrası da aynı sayaç (dışarıdaki bağlantılar döner)
+_slots = threading.BoundedSemaphore(DB_MAX_CONN)
+
+
+class TimedCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        with stage("db"):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with stage("db"):
+            return super().executemany(query, vars_list)
+
+
+def get_pool():
+    # Havuz ilk kullanımda oluşturulur (import sırasında bağlantı açılmaz)
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(
+                    DB_MIN_CONN,
+                    DB_MAX_CONN,
+                    dbname=os.getenv("POSTGRES_DB"),
+                    user=os.getenv("POSTGRES_USER"),
+                    password=os.getenv("POSTGRES_PASSWORD"),
+                    host=os.getenv("POSTGRES_HOST"),
+                    port=os.getenv("POSTGRES_PORT"),
+                    cursor_factory=TimedCursor
+                )
+    return _pool
+
+
+def _checkout():
+    db_pool = get_pool()
+    if not _slots.acquire(timeout=DB_CHECKOUT_TIMEOUT):
+        raise pool.PoolError(f"{DB_CHECKOUT_TIMEOUT:g} sn içinde boş veritabanı bağlantısı bulunamadı")
+    try:
+        conn = db_pool.getconn()
+        if conn.closed:
+            # Sunucu tarafında kapanmış bağlantıyı at, yenisini al
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+    except BaseException:
+        _slots.release()
+        raise
+    return conn
+
+
+def _checkin(conn, close=False):
+    try:
+        get_pool().putconn(conn, close=close)
+    finally:
+        _slots.release()
+
+
+def get_db():
+    # İstek başına tek bağlantı
+    if "db_conn" not in g:
+        g.db_conn = _checkout()
+    return g.db_conn
+
+
+def release_db(exception=None):
+    conn = g.pop("db_conn", None)
+    if conn is None:
+        return
+    broken = bool(conn.closed) or isinstance(exception, (psycopg2.OperationalError, psycopg2.InterfaceError))
+    if not broken:
+        try:
+            # Commit edilmemiş işlem kalırsa bir sonraki isteğe taşınmasın
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    _checkin(conn, close=broken)
+
+
+def _idle_request_connection():
+    # İstek zaten bir bağlantı tutuyorsa ve açık işlemi yoksa o kullanılır (ikinci bağlantı
+    # alınmaz). Açık işlem varsa commit isteğin yarım kalmış işini de yazardı: ayrı bağlantı
+    if not has_app_context():
+        return None
+    conn = g.get("db_conn")
+    if conn is None or conn.closed or conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+        return None
+    return conn
+
+
+@contextmanager
+def connection():
+    # İstek dışı kullanım (streaming, arka plan işleri) için kısa ömürlü bağlantı
+    conn = _idle_request_connection()
+    if conn is not None:
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        return
+    conn = _checkout()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _checkin(conn, close=broken or bool(conn.closed))
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db)
@@ -0,0 +1,201 @@
+# -----------------------
+# Doktora Sor anlık bildirimleri (pub/sub)
+# -----------------------
+# Kanallar: "user:<id>" (soruyu soran) ve "doctor:<id>" (soruya bakan doktor).
+# Olaylar küçük tutulur (id + durum); istemci yalnızca değişen soruyu yeniden çeker.
+# Backend EVENT_BUS env değişkeniyle seçilir:
+#   "memory"   -> tek süreç içi pub/sub (varsayılan)
+#   "postgres" -> LISTEN/NOTIFY; her worker tek bir dinleyici bağlantısı açar ve
+#                 gelen bildirimleri kendi yerel abonelerine dağıtır.
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+
+import db
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_CHANNEL = "doctor_events"
+# NOTIFY payload sınırı 8000 bayt; olaylar bunun çok altında kalır
+NOTIFY_MAX_BYTES = 7900
+
+
+class Subscription:
+    def __init__(self, bus, channels, max_queue=EVENT_QUEUE_SIZE):
+        self.bus = bus
+        self.channels = tuple(channels)
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Kuyruk taşarsa istemciye "resync" gönderilir (tam liste yeniden çekilir)
+        self.lagged = False
+        self.closed = False
+        self._close_lock = threading.Lock()
+
+    def deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.lagged = True
+
+    def get(self, timeout=None):
+        # Olay yoksa timeout sonunda None döner (heartbeat için)
+        if self.lagged:
+            self.lagged = False
+            return {"type": "resync"}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        # Tekrar çağrılabilir (istek kapanışı ve akış generator'ı ayrı ayrı kapatır)
+        with self._close_lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.bus.unsubscribe(self)
+
+
+class MemoryEventBus:
+    def __init__(self):
+        self._subscribers = {}  # channel -> set(Subscription)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, channels):
+        sub = Subscription(self, channels)
+        with self._lock:
+            for channel in sub.channels:
+                self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for channel in sub.channels:
+                subs = self._subscribers.get(channel)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def publish(self, channels, event, conn=None):
+        self.published += 1
+        self._dispatch(channels, event)
+
+    def _dispatch(self, channels, event):
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._subscribers.get(channel, ()))
+        for sub in targets:
+            sub.deliver(event)
+
+    def broadcast(self, event):
+        # Tüm yerel abonelere (yeniden bağlanma / kapanış)
+        with self._lock:
+            targets = {s for subs in self._subscribers.values() for s in subs}
+        for sub in targets:
+            sub.deliver(event)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "channels": len(self._subscribers),
+                "subscriptions": len({s for subs in self._subscribers.values() for s in subs}),
+                "published": self.published
+            }
+
+
+class PostgresEventBus(MemoryEventBus):
+    # Yayın: pg_notify (commit ile birlikte tüm worker'lara gider)
+    # Dinleme: süreç başına tek LISTEN bağlantısı, yerel abonelere dağıtım
+    def __init__(self, reconnect_delay=2.0):
+        super().__init__()
+        self.reconnect_delay = reconnect_delay
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return super().subscribe(channels)
+
+    def publish(self, channels, event, conn=None):
+        payload = json.dumps({"channels": list(channels), "event": event}, ensure_ascii=False)
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            raise ValueError("Olay NOTIFY sınırını aşıyor")
+        self.published += 1
+        if conn is not None:
+            # İstek bağlantısı kullanılır; havuzdan ikinci bağlantı alınmaz
+            conn.cursor().execute("SELECT pg_notify(%s, %s)", (EVENT_CHANNEL, payload))
+            conn.commit()
+            return
+        with db.connection() as own_conn:
+            own_conn.cursor().execute("SELECT pg_notify(%s, %s)", (EVENT_CHANNEL, payload))
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen_forever, name="event-listener", daemon=True)
+                self._listener.start()
+
+    def _connect(self):
+        # Havuz dışı, autocommit bağlantı (LISTEN uzun ömürlüdür)
+        conn = psycopg2.connect(
+            dbname=os.getenv("POSTGRES_DB"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+            host=os.getenv("POSTGRES_HOST"),
+            port=os.getenv("POSTGRES_PORT")
+        )
+        conn.autocommit = True
+        conn.cursor().execute(f"LISTEN {EVENT_CHANNEL}")
+        return conn
+
+    def _listen_forever(self):
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                if connected_before:
+                    # Bağlantı koptuysa arada kaçan olaylar için abonelere resync
+                    self.broadcast({"type": "resync"})
+                connected_before = True
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            data = json.loads(notify.payload)
+                        except ValueError:
+                            continue
+                        self._dispatch(data["channels"], data["event"])
+            except psycopg2.Error as e:
+                print("Olay dinleyici hatası:", e)
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(self.reconnect_delay)
+
+    def stats(self):
+        return {**super().stats(), "backend": "postgres"}
+
+
+def question_channels(user_id, doctor_id):
+    return [f"user:{user_id}", f"doctor:{doctor_id}"]
+
+
+def create_event_bus(kind):
+    if kind == "memory":
+        return MemoryEventBus()
+    if kind == "postgres":
+        return PostgresEventBus()
+    raise ValueError(f"Bilinmeyen EVENT_BUS: {kind}")
@@ -0,0 +1,288 @@
+# -----------------------
+# Paylaşılan Gemini istemcisi
+# -----------------------
+# - Keep-alive bağlantı havuzu (requests.Session + HTTPAdapter)
+# - Bağlantı / okuma zaman aşımı
+# - Süreç geneli eşzamanlılık sınırı + süren çağrı sayacı (kapanışta wait_idle); slot
+#   doluyken bekleyenler kullanıcılar arası ağırlıklı adil sırayla slot alır (FairSlots)
+# - Tekrar deneme / devre kesici / hedging (resilience.py): kesintide UpstreamUnavailable
+# - Single-flight: aynı anda gelen birebir aynı (boşlukları normalize edilmiş) prompt'lar
+#   tek generate çağrısını paylaşır (aynı tahlil şablonu, aynı hazır soru)
+# - Async yol (agenerate): httpx.AsyncClient (HTTP/2), event loop başına tek istemci;
+#   senkron yolla aynı FairSlots, devre kesici ve deneme politikası (birleştirme ve hedging yok)
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+import metrics
+from metrics import upstream_call
+from resilience import (CircuitBreaker, FairSlots, Hedger, RetryPolicy, SingleFlight, UpstreamUnavailable,
+                        acall_with_retries, call_with_retries)
+
+load_dotenv()
+
+# Yerel sahte Gemini sunucusuyla test için taban adres env ile değiştirilebilir
+GEMINI_API_BASE = os.getenv(
+    "GEMINI_API_BASE",
+    "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash"
+)
+CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "60"))
+POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "32"))
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "64"))
+# 0: slotlar geliş sırasıyla (FIFO) verilir
+FAIR_QUEUE = os.getenv("GEMINI_FAIR_QUEUE", "1") == "1"
+# Deneme başına okuma zaman aşımı ve (bekleme dahil) toplam süre; CHAT_LOCK_LEASE'ten kısa olmalı
+ATTEMPT_TIMEOUT = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT", "20"))
+DEADLINE = float(os.getenv("GEMINI_DEADLINE", "45"))
+RETRY_ATTEMPTS = int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "4"))
+BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+# 0: kapalı; > 0: ilk deneme bu kadar sn'de dönmezse ikinci istek (yalnızca generate)
+HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", "0"))
+HEDGE_MAX_RATIO = float(os.getenv("GEMINI_HEDGE_MAX_RATIO", "0.1"))
+COALESCE = os.getenv("GEMINI_COALESCE", "1") == "1"
+# Deadline'ı olmayan deneme politikalarında (JOB_RETRY) birleştirilen çağrının en uzun ömrü (sn)
+COALESCE_TIMEOUT = float(os.getenv("GEMINI_COALESCE_TIMEOUT", "120"))
+
+retries_total = metrics.registry.counter(
+    "upstream_retries_total", "Geçici hata sonrası tekrar denemeler", ("upstream",))
+
+
+class GeminiError(Exception):
+    pass
+
+
+def _extract_text(data):
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        raise GeminiError(f"Beklenmeyen Gemini cevabı: {str(data)[:200]}")
+
+
+def prompt_key(prompt):
+    # Boşluk farkları (şablon girintisi, satır sonları) aynı prompt sayılır
+    return hashlib.sha256(" ".join(prompt.split()).encode()).hexdigest()
+
+
+def _iter_sse_texts(lines):
+    # streamGenerateContent?alt=sse her parçayı "data: {...}" satırı olarak yollar
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        chunk = json.loads(line[len("data:"):].strip())
+        for candidate in chunk.get("candidates", []):
+            for part in candidate.get("content", {}).get("parts", []):
+                if part.get("text"):
+                    yield part["text"]
+
+
+class GeminiClient:
+    def __init__(self, api_base=None, api_key=None, pool_size=POOL_SIZE,
+                 max_concurrency=MAX_CONCURRENCY, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, retry=None, breaker=None, hedger=None, coalesce=COALESCE,
+                 fair_queue=FAIR_QUEUE):
+        self.api_base = api_base or GEMINI_API_BASE
+        self.api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY")
+        self.api_url = f"{self.api_base}:generateContent"
+        self.stream_api_url = f"{self.api_base}:streamGenerateContent?alt=sse"
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrency = max_concurrency
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self.slots = FairSlots(max_concurrency, fair=fair_queue)
+        # Süren çağrı sayısı (kapanışta wait_idle ile beklenir)
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+        self.retry = retry or RetryPolicy(RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+                                          attempt_timeout=min(ATTEMPT_TIMEOUT, read_timeout), deadline=DEADLINE)
+        self.breaker = breaker or CircuitBreaker("gemini", BREAKER_FAILURES, BREAKER_RESET)
+        self.hedger = hedger or Hedger(HEDGE_AFTER, HEDGE_MAX_RATIO, max_workers=max_concurrency)
+        self.coalescer = SingleFlight("gemini", COALESCE_TIMEOUT) if coalesce else None
+
+        # AsyncClient bağlantıları oluşturulduğu event loop'a bağlıdır: loop başına bir istemci
+        self._async_clients = {}
+        self._async_lock = threading.Lock()
+
+    def _headers(self):
+        return {"Content-Type": "application/json", "X-goog-api-key": self.api_key}
+
+    @staticmethod
+    def _body(prompt):
+        return {"contents": [{"parts": [{"text": prompt}]}]}
+
+    @contextmanager
+    def _in_flight_call(self):
+        with self._idle:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._in_flight -= 1
+                if not self._in_flight:
+                    self._idle.notify_all()
+
+    @contextmanager
+    def _slot(self, timeout=None):
+        # Slot timeout sn içinde boşalmazsa UpstreamUnavailable (thread süresiz beklemez)
+        if not self.slots.acquire(timeout):
+            raise UpstreamUnavailable("Gemini eşzamanlılık sınırı dolu")
+        try:
+            with self._in_flight_call():
+                yield
+        finally:
+            self.slots.release()
+
+    @asynccontextmanager
+    async def _aslot(self, timeout=None):
+        # _slot'un async sürümü: aynı slotlar, bekleyen coroutine thread tutmaz
+        if not await self.slots.aacquire(timeout):
+            raise UpstreamUnavailable("Gemini eşzamanlılık sınırı dolu")
+        try:
+            with self._in_flight_call():
+                yield
+        finally:
+            self.slots.release()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def wait_idle(self, timeout):
+        # Süren çağrılar bitene kadar (en fazla timeout sn) bekler
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def _read_timeout(self, timeout):
+        return (self.timeout[0], timeout or self.timeout[1])
+
+    def _generate_once(self, prompt, timeout):
+        with self._slot(timeout), upstream_call("gemini"):
+            response = self._session.post(
+                self.api_url, headers=self._headers(), json=self._body(prompt),
+                timeout=self._read_timeout(timeout)
+            )
+            response.raise_for_status()
+            return _extract_text(response.json())
+
+    def _on_retry(self, name):
+        return lambda exc: retries_total.inc(name)
+
+    def generate(self, prompt, retry=None):
+        # Devre açıksa veya denemeler tükenirse UpstreamUnavailable. Aynı prompt ve aynı deneme
+        # politikasıyla süren bir çağrı varsa ona katılır (en çok politikanın deadline'ı kadar
+        # bekler); sohbet ve arka plan işi (JOB_RETRY) çağrıları birbirine katılmaz
+        policy = retry or self.retry
+
+        def attempt(timeout):
+            return self.hedger.call(self._generate_once, prompt, timeout)
+
+        def call():
+            return call_with_retries(attempt, policy, self.breaker, self._on_retry("gemini"))
+        if self.coalescer is None:
+            return call()
+        return self.coalescer.do((prompt_key(prompt), policy.key), call, timeout=policy.deadline)
+
+    def _open_stream(self, prompt, timeout):
+        # İlk parça gelene kadarki kısım bir denemedir (sonrasında tekrar denemek metni tekrarlardı)
+        stack = ExitStack()
+        try:
+            stack.enter_context(self._slot(timeout))
+            stack.enter_context(upstream_call("gemini_stream"))
+            response = stack.enter_context(self._session.post(
+                self.stream_api_url, headers=self._headers(), json=self._body(prompt),
+                timeout=self._read_timeout(timeout), stream=True
+            ))
+            response.raise_for_status()
+            # SSE her zaman UTF-8; charset gelmezse requests latin-1 varsayar
+            response.encoding = "utf-8"
+            texts = _iter_sse_texts(response.iter_lines(decode_unicode=True))
+            first = next(texts, None)
+        except BaseException as e:
+            stack.__exit__(type(e), e, e.__traceback__)
+            raise
+        return stack, first, texts
+
+    def stream(self, prompt, retry=None):
+        # Slot, başarılı denemenin akışı bitene kadar tutulur (beklemelerde tutulmaz)
+        stack, first, texts = call_with_retries(
+            lambda timeout: self._open_stream(prompt, timeout), retry or self.retry, self.breaker,
+            self._on_retry("gemini_stream"))
+        with stack:
+            if first is not None:
+                yield first
+            yield from texts
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "slots": self.slots.stats(),
+            "breaker": self.breaker.stats(),
+            "hedging": self.hedger.stats(),
+            "coalescing": self.coalescer.stats() if self.coalescer is not None else None,
+            "retry": {"attempts": self.retry.attempts, "attempt_timeout": self.retry.attempt_timeout,
+                      "deadline": self.retry.deadline}
+        }
+
+    # -----------------------
+    # Async yol
+    # -----------------------
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                # Kapanmış loop'ların istemcileri kapatılamaz; bırakılır (soketleri GC kapatır)
+                self._async_clients = {l: c for l, c in self._async_clients.items() if not l.is_closed()}
+                client = self._async_clients[loop] = httpx.AsyncClient(
+                    http2=True,
+                    timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                    limits=httpx.Limits(max_connections=self.max_concurrency,
+                                        max_keepalive_connections=self.max_concurrency),
+                )
+            return client
+
+    async def _agenerate_once(self, prompt, timeout):
+        client = self._async_client()
+        async with self._aslot(timeout):
+            with upstream_call("gemini"):
+                response = await client.post(
+                    self.api_url, headers=self._headers(), json=self._body(prompt),
+                    timeout=httpx.Timeout(timeout or self.timeout[1], connect=self.timeout[0])
+                )
+                response.raise_for_status()
+                return _extract_text(response.json())
+
+    async def agenerate(self, prompt, retry=None):
+        # generate'in coroutine sürümü: aynı slotlar, devre kesici ve deneme politikası
+        return await acall_with_retries(lambda timeout: self._agenerate_once(prompt, timeout),
+                                        retry or self.retry, self.breaker, self._on_retry("gemini"))
+
+    async def aclose(self):
+        # Çalışan loop'un istemcisini kapatır
+        with self._async_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        self._session.close()
+
+
+# Süreç geneli paylaşılan istemci
+client = GeminiClient()
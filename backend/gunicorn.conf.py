@@ -0,0 +1,72 @@
+# -----------------------
+# Gunicorn ayarları
+# -----------------------
+# Kullanım (backend/ içinde): gunicorn -c gunicorn.conf.py wsgi:app
+# gthread worker: SSE (/events, chat akışı) ve Gemini beklemeleri thread tutar,
+# CPU işleri (PDF çıkarma) zaten ayrı süreç havuzunda. Worker'lar arası durum
+# paylaşımı için CHAT_STORE, CHAT_LOCK, RATE_LIMIT, EVENT_BUS ve JOB_QUEUE postgres
+# olmalı; birden fazla worker'la bellek içi backend varsa master açılışta durur
+# (yalnızca yerel deneme / durumsuz ölçüm için GUNICORN_ALLOW_LOCAL_STATE=1).
+# /events abonelikleri burada thread'lerin dörtte biriyle sınırlı; çok sayıda panel için
+# ayrı SSE havuzu: gunicorn.events.conf.py
+# Ayarlar env ile: WEB_CONCURRENCY, GUNICORN_THREADS, BIND, ...
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+# Gemini okuma zaman aşımı (60 sn) + akış süresi
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# SIGTERM sonrası süren isteklerin bitmesi için süre
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Sızıntılara karşı worker'lar arada bir yenilenir (hepsi aynı anda değil)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+# fork öncesi bağlantı / thread açılmasın (psycopg2, requests.Session, fitz)
+preload_app = False
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+
+
+# Worker belleğinde tutulan durum: env -> (varsayılan, süreç içi değerler). Birden fazla
+# worker'da sohbet başka worker'da görünmez, kilit ve hız sınırı worker başına olur, olaylar
+# diğer worker'ların abonelerine gitmez, GET /jobs/<id> başka worker'da 404 döner.
+LOCAL_STATE_BACKENDS = {
+    "CHAT_STORE": ("memory", {"memory"}),
+    "CHAT_LOCK": ("memory", {"memory"}),
+    "RATE_LIMIT": ("memory", {"memory"}),
+    "EVENT_BUS": ("memory", {"memory"}),
+    "JOB_QUEUE": ("inprocess", {"inprocess"}),
+}
+
+
+def local_state_settings():
+    settings = {name: os.getenv(name, default) for name, (default, _) in LOCAL_STATE_BACKENDS.items()}
+    return [f"{name}={value}" for name, value in settings.items() if value in LOCAL_STATE_BACKENDS[name][1]]
+
+
+def on_starting(server):
+    local = local_state_settings()
+    if server.cfg.workers > 1 and local and os.getenv("GUNICORN_ALLOW_LOCAL_STATE") != "1":
+        raise RuntimeError(f"{server.cfg.workers} worker ile süreç içi durum tutarsız olur: {', '.join(local)}. "
+                           "Bunları postgres yapın veya WEB_CONCURRENCY=1 ile başlatın")
+    # Migration'lar master'da bir kez (worker'lar fork edilmeden önce)
+    if os.getenv("RUN_MIGRATIONS", "1") == "1":
+        import db
+        import migrations
+        migrations.migrate()
+        db.close_pool()
+
+
+def post_worker_init(worker):
+    # SIGTERM: önce draining (readyz 503, SSE kapanır), sonra gunicorn'un kendi handler'ı
+    from lifecycle import lifecycle
+    lifecycle.install_signal_handlers()
+
+
+def worker_exit(server, worker):
+    # İstekler bitti; arka plan işleri ve süren Gemini çağrıları beklenir
+    from lifecycle import lifecycle
+    lifecycle.drain()
@@ -0,0 +1,42 @@
+# -----------------------
+# Gunicorn ayarları: ayrı SSE (/events) havuzu
+# -----------------------
+# Her /events aboneliği bağlantı süresince bir gthread thread'i tutar. Ana havuzda
+# (gunicorn.conf.py) abonelikler worker thread'lerinin dörtte biriyle sınırlı; sınırı
+# aşan paneller 503 alıp polling'e düşer. Hedeflenen ~1000 eşzamanlı panel için /events
+# bu havuza yönlendirilir:
+#   gunicorn -c gunicorn.conf.py wsgi:app            (ana havuz, :5000)
+#   gunicorn -c gunicorn.events.conf.py wsgi:app     (SSE havuzu, :5001)
+#   proxy: /events -> :5001, geri kalan her şey -> :5000
+#          (nginx: proxy_buffering off; proxy_read_timeout > EVENT_HEARTBEAT)
+# Bu havuzdaki thread'ler neredeyse hep olay kuyruğunda bekler (CPU ve DB bağlantısı
+# tutmaz); abonelik sınırı thread sayısından yalnızca health/metrics için pay bırakacak
+# kadar düşüktür. Olaylar ana havuzun süreçlerinde yayınlandığı için EVENT_BUS=postgres
+# zorunlu; migration'lar ana havuzda çalışır.
+# Ayarlar env ile: EVENTS_BIND, EVENTS_WORKERS, EVENTS_THREADS, EVENTS_RESERVED_THREADS
+import os
+import runpy
+
+# Ortak ayarlar ve hook'lar (draining, worker_exit) ana config'ten
+globals().update({name: value for name, value in
+                  runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")).items()
+                  if not name.startswith("__")})
+
+bind = os.getenv("EVENTS_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("EVENTS_WORKERS", "2"))
+threads = int(os.getenv("EVENTS_THREADS", "640"))
+# gthread bu sayıda açık bağlantıda yeni bağlantı kabul etmez (varsayılan 1000): akışlar
+# thread'leri doldursa da health/metrics bağlantıları kabul edilebilmeli
+worker_connections = threads * 2
+# Abonelikler uzun ömürlü: periyodik worker yenilemesi tüm panelleri aynı anda yeniden bağlatırdı
+max_requests = 0
+max_requests_jitter = 0
+# Worker'lar fork edilmeden önce: server modülü sınırı import anında okur
+os.environ.setdefault("EVENT_MAX_SUBSCRIPTIONS",
+                      str(max(1, threads - int(os.getenv("EVENTS_RESERVED_THREADS", "16")))))
+
+
+def on_starting(server):
+    if os.getenv("EVENT_BUS", "memory") != "postgres" and os.getenv("GUNICORN_ALLOW_LOCAL_STATE") != "1":
+        raise RuntimeError("SSE havuzu olayları diğer süreçlerden alır: EVENT_BUS=postgres olmalı "
+                           "(yalnızca yerel deneme için GUNICORN_ALLOW_LOCAL_STATE=1)")
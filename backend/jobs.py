@@ -0,0 +1,261 @@
+# -----------------------
+# Arka plan iş kuyruğu
+# -----------------------
+# Süreç içi backend: sınırlı kuyruk + sabit sayıda worker thread. CPU ağırlıklı
+# adımlar (fitz çıkarma) run_in_process ile ayrı süreç havuzunda çalışır.
+# Kuyruk doluysa submit QueueFull yükseltir (çağıran 503 + Retry-After döner).
+# İş durumu: queued -> running -> done | failed, progress 0..1
+# Backend JOB_QUEUE env değişkeniyle seçilir:
+#   "inprocess" -> durum süreç belleğinde (tek worker; varsayılan)
+#   "postgres"  -> iş yine kabul eden süreçte çalışır (yüklenen dosya onun diskinde),
+#                  durum jobs tablosuna yazılır: GET /jobs/<id> hangi worker'a düşerse düşsün
+#                  işi görür
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import db
+from resilience import RetryPolicy
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_PROCESSES = int(os.getenv("JOB_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "3"))
+
+# Arka plan işlerindeki Gemini çağrıları için daha sabırlı deneme politikası
+# (toplam süre sınırı yok; bkz. resilience.py)
+JOB_RETRY = RetryPolicy(attempts=JOB_MAX_RETRIES + 1, base_delay=0.5, max_delay=8.0)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, owner, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Her durum / ilerleme değişikliğinde çağrılır (postgres backend satırı günceller)
+        self._on_change = on_change
+
+    def set_progress(self, stage, progress):
+        self.stage = stage
+        self.progress = progress
+        self.updated_at = time.time()
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def set_status(self, status, progress=None, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.set_progress(status, self.progress if progress is None else progress)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 2),
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class InProcessJobQueue:
+    def __init__(self, workers=JOB_WORKERS, processes=JOB_PROCESSES, max_queue=JOB_QUEUE_SIZE,
+                 result_ttl=JOB_RESULT_TTL):
+        self.workers = workers
+        self.processes = processes
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._process_pool = None
+        self._draining = False
+
+    def _ensure_started(self):
+        # Worker'lar ilk işte başlatılır (import sırasında thread açılmaz)
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit_in_process(self, fn, *args):
+        # fitz thread/fork güvenli değil: spawn bağlamı kullanılır. Future döner.
+        if self._process_pool is None:
+            with self._lock:
+                if self._process_pool is None:
+                    self._process_pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._process_pool.submit(fn, *args)
+
+    def run_in_process(self, fn, *args):
+        return self.submit_in_process(fn, *args).result()
+
+    def submit(self, owner, fn, *args):
+        # fn(job, *args) worker thread'inde çalışır; dönüş değeri job.result olur
+        if self._draining:
+            raise QueueFull()
+        self._ensure_started()
+        self._cleanup()
+        job = self._create(owner)
+        try:
+            self._queue.put_nowait((job, fn, args))
+        except queue.Full:
+            self._discard(job)
+            raise QueueFull()
+        return job
+
+    def _create(self, owner):
+        job = Job(owner)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def _discard(self, job):
+        with self._lock:
+            del self._jobs[job.id]
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _worker(self):
+        while True:
+            job, fn, args = self._queue.get()
+            try:
+                job.set_status("running", 0.05)
+                job.set_status("done", 1.0, result=fn(job, *args))
+            except Exception as e:
+                print("İş hatası:", job.id, e)
+                try:
+                    job.set_status("failed", error=str(e))
+                except Exception as save_error:
+                    print("İş durumu yazılamadı:", job.id, save_error)
+            finally:
+                self._queue.task_done()
+
+    def _cleanup(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values()
+                           if j.status in ("done", "failed") and j.updated_at < cutoff]:
+                del self._jobs[job_id]
+
+    def drain(self, timeout):
+        # Kapanış: yeni iş alınmaz, kuyruktaki ve çalışan işler timeout'a kadar beklenir.
+        # Hepsi bittiyse True.
+        self._draining = True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
+        done = self._queue.unfinished_tasks == 0
+        self.shutdown(wait=done)
+        return done
+
+    def shutdown(self, wait=True):
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+            self._process_pool = None
+
+
+# -----------------------
+# Durumu PostgreSQL'de tutulan kuyruk
+# -----------------------
+# Yürütme InProcessJobQueue ile aynı; yalnızca durum satırı paylaşılır. Sonuç küçük
+# bir JSON'dur (cevap metni + cache bilgisi). Worker süreci iş bitmeden ölürse satır
+# "running" kalır; JOB_STALE_AFTER sn güncellenmeyen iş get'te "failed" görünür.
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "900"))
+
+
+class PostgresJobQueue(InProcessJobQueue):
+    def _create(self, owner):
+        job = Job(owner, on_change=self._save)
+        with db.connection() as conn:
+            conn.cursor().execute(
+                "INSERT INTO jobs (id, owner, status, stage, progress) VALUES (%s, %s, %s, %s, %s)",
+                (job.id, job.owner, job.status, job.stage, job.progress)
+            )
+        return job
+
+    def _discard(self, job):
+        with db.connection() as conn:
+            conn.cursor().execute("DELETE FROM jobs WHERE id = %s", (job.id,))
+
+    def _save(self, job):
+        with db.connection() as conn:
+            conn.cursor().execute(
+                """
+                UPDATE jobs SET status = %s, stage = %s, progress = %s, result = %s::jsonb, error = %s,
+                    updated_at = NOW()
+                WHERE id = %s
+                """,
+                (job.status, job.stage, job.progress,
+                 json.dumps(job.result, ensure_ascii=False) if job.result is not None else None,
+                 job.error, job.id)
+            )
+
+    def get(self, job_id, owner=None):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT owner, status, stage, progress, result, error,
+                       status IN ('queued', 'running') AND updated_at < NOW() - make_interval(secs => %s)
+                FROM jobs WHERE id = %s
+                """,
+                (JOB_STALE_AFTER, job_id)
+            )
+            row = cursor.fetchone()
+        if row is None or (owner is not None and row[0] != owner):
+            return None
+        job = Job(row[0])
+        job.id = job_id
+        job.status, job.stage, job.progress, job.result, job.error, stale = row[1:]
+        if stale:
+            job.status = job.stage = "failed"
+            job.error = "İş yarıda kaldı (worker yeniden başlatıldı)"
+        return job
+
+    def _cleanup(self):
+        with db.connection() as conn:
+            conn.cursor().execute(
+                "DELETE FROM jobs WHERE updated_at < NOW() - make_interval(secs => %s)",
+                (max(self.result_ttl, JOB_STALE_AFTER),)
+            )
+
+
+def create_job_queue(kind):
+    if kind == "inprocess":
+        return InProcessJobQueue()
+    if kind == "postgres":
+        return PostgresJobQueue()
+    raise ValueError(f"Bilinmeyen JOB_QUEUE: {kind}")
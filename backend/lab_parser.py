@@ -0,0 +1,130 @@
+# -----------------------
+# Tahlil raporu ayrıştırıcı (sayfa sayfa)
+# -----------------------
+# PDF sayfaları tek tek okunur; satırlar derlenmiş regex ile ayrıştırılır.
+# Prompt metni bütçeye (karakter) ulaşınca toplanmayı bırakır, lab değerleri
+# ise tüm sayfalarda aranmaya devam eder. Bellekte aynı anda tek sayfa metni tutulur;
+# varsayılan olarak yalnızca referans dışı kayıtlar saklanır (keep_normal=False).
+import hashlib
+import os
+import re
+import tempfile
+from collections import namedtuple
+
+import fitz
+
+PROMPT_BUDGET = int(os.getenv("PDF_PROMPT_BUDGET", "3000"))
+COPY_CHUNK = 1024 * 1024
+
+LabResult = namedtuple("LabResult", ["test", "value", "unit", "ref_low", "ref_high", "flag", "ref"])
+ReportExtract = namedtuple("ReportExtract", ["prompt_text", "results", "page_count", "tested_count"])
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+# Örn: "Hemoglobin: 11.2 g/dL (Ref: 12-16)", "CRP: 7 mg/L (Ref: <5)"
+# Boşluklar [ \t] ile sınırlı: eşleşme satır sonunu aşamaz, sayfa metninde
+# finditer ile satır satır ilerler (Python tarafında satır döngüsü yok).
+LAB_LINE = re.compile(
+    r"(?P<test>[A-Za-zçğıöşüÇĞİÖŞÜ][A-Za-zçğıöşüÇĞİÖŞÜ ]*):[ \t]*"
+    r"(?P<value>" + _NUMBER + r")[ \t]*"
+    r"(?P<unit>[^\s(]*)[ \t]*"
+    r"\([ \t]*Ref[:\-]?[ \t]*"
+    r"(?P<ref>(?P<cmp>[<>])?[ \t]*(?P<low>" + _NUMBER + r")(?:[ \t]*[\-–][ \t]*(?P<high>" + _NUMBER + r"))?)"
+)
+
+
+def _to_float(text):
+    return float(text.replace(",", ".")) if "," in text else float(text)
+
+
+def parse_line(line):
+    match = LAB_LINE.search(line)
+    return _from_match(match) if match else None
+
+
+def _from_match(match):
+    test, value, unit, ref, cmp, low, high = match.group("test", "value", "unit", "ref", "cmp", "low", "high")
+    value = _to_float(value)
+    low = _to_float(low)
+
+    ref_low = ref_high = flag = None
+    if high is not None and cmp is None:
+        ref_low, ref_high = low, _to_float(high)
+        if value < ref_low:
+            flag = "düşük"
+        elif value > ref_high:
+            flag = "yüksek"
+    elif cmp == "<" and high is None:
+        ref_high = low
+        if value >= ref_high:
+            flag = "yüksek"
+    elif cmp == ">" and high is None:
+        ref_low = low
+        if value <= ref_low:
+            flag = "düşük"
+    else:
+        return None
+    return LabResult(test.strip(), value, unit, ref_low, ref_high, flag, ref.replace(" ", ""))
+
+
+def iter_lab_results(text):
+    for match in LAB_LINE.finditer(text):
+        result = _from_match(match)
+        if result:
+            yield result
+
+
+def extract_report(doc, prompt_budget=PROMPT_BUDGET, keep_normal=False):
+    prompt_parts = []
+    remaining = prompt_budget
+    results = []
+    page_count = 0
+    tested_count = 0
+    for page in doc:
+        page_count += 1
+        text = page.get_text()
+        if remaining > 0:
+            prompt_parts.append(text[:remaining])
+            remaining -= len(prompt_parts[-1])
+        for result in iter_lab_results(text):
+            tested_count += 1
+            if keep_normal or result.flag:
+                results.append(result)
+    return ReportExtract("".join(prompt_parts), results, page_count, tested_count)
+
+
+def extract_report_from_path(path, prompt_budget=PROMPT_BUDGET, keep_normal=False):
+    with fitz.open(path) as doc:
+        return extract_report(doc, prompt_budget, keep_normal)
+
+
+def extract_summary(path, prompt_budget=PROMPT_BUDGET):
+    # Süreç havuzunda çalıştırılabilir (sonuç pickle edilebilir dict)
+    report = extract_report_from_path(path, prompt_budget)
+    return {"prompt_text": report.prompt_text, "referans_disi": out_of_range(report.results)}
+
+
+def save_upload_to_temp(file_storage):
+    # Yüklemeyi belleğe almadan parça parça geçici dosyaya yazar; yazarken
+    # SHA-256 özeti de hesaplanır (önbellek anahtarı). (path, hexdigest) döndürür.
+    return save_stream_to_temp(file_storage.stream)
+
+
+def save_stream_to_temp(stream, suffix=".pdf"):
+    # Herhangi bir okunabilir akış için (örn. zip içindeki dosya)
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, "wb") as tmp:
+        while True:
+            chunk = stream.read(COPY_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp.write(chunk)
+    return path, digest.hexdigest()
+
+
+def out_of_range(results):
+    return [
+        f"{r.test} {r.flag} ({r.value} {r.unit}, ref: {r.ref})"
+        for r in results if r.flag
+    ]
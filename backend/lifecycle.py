@@ -0,0 +1,99 @@
+# -----------------------
+# Worker yaşam döngüsü (hazır olma + kapanış)
+# -----------------------
+# Gunicorn worker'ı SIGTERM aldığında (deploy, ölçek küçültme):
+#   1) draining bayrağı kalkar: /readyz 503 döner, SSE akışları "reconnect" ile
+#      kapanır (on_draining kancaları), yeni arka plan işi kabul edilmez
+#   2) gunicorn süren istekleri graceful_timeout'a kadar bitirir
+#   3) worker_exit kancasında drain(): arka plan işleri ve süren Gemini
+#      çağrıları DRAIN_TIMEOUT'a kadar beklenir (wait_for kancaları)
+# Geliştirme sunucusunda (python server.py) sinyal kancası kurulmaz.
+import os
+import signal
+import threading
+import time
+
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "25"))
+
+
+class Lifecycle:
+    def __init__(self):
+        self.started_at = time.time()
+        self._draining = threading.Event()
+        self._lock = threading.Lock()
+        self._on_draining = []  # fn(): hızlı bildirimler
+        self._waiters = []      # (isim, fn(timeout) -> bool)
+        self._ready_checks = []  # (isim, fn(): hata -> hazır değil)
+        self._drained = None
+
+    @property
+    def draining(self):
+        return self._draining.is_set()
+
+    def uptime(self):
+        return time.time() - self.started_at
+
+    def on_draining(self, fn):
+        self._on_draining.append(fn)
+
+    def wait_for(self, name, fn):
+        self._waiters.append((name, fn))
+
+    def add_ready_check(self, name, fn):
+        self._ready_checks.append((name, fn))
+
+    def readiness(self):
+        checks = {}
+        for name, fn in self._ready_checks:
+            try:
+                fn()
+                checks[name] = "ok"
+            except Exception as e:
+                checks[name] = f"hata: {e}"
+        ready = not self.draining and all(v == "ok" for v in checks.values())
+        return ready, checks
+
+    def start_draining(self):
+        with self._lock:
+            if self._draining.is_set():
+                return
+            self._draining.set()
+        for fn in self._on_draining:
+            try:
+                fn()
+            except Exception as e:
+                print("Kapanış kancası hatası:", e)
+
+    def drain(self, timeout=DRAIN_TIMEOUT):
+        # Bekleyicilere kalan süre paylaştırılır; {isim: tamamlandı mı} döner
+        self.start_draining()
+        with self._lock:
+            if self._drained is not None:
+                return self._drained
+            deadline = time.monotonic() + timeout
+            results = {}
+            for name, fn in self._waiters:
+                try:
+                    results[name] = bool(fn(max(0.0, deadline - time.monotonic())))
+                except Exception as e:
+                    print("Kapanış bekleme hatası:", name, e)
+                    results[name] = False
+            self._drained = results
+        print("Worker kapanışı:", results)
+        return results
+
+    def install_signal_handlers(self, signals=(signal.SIGTERM,)):
+        # Önceki (gunicorn) handler zincirlenir. Handler ana thread'i bloklamamalı:
+        # kancalar kilit aldığı için ayrı thread'de çalışır.
+        for signum in signals:
+            previous = signal.getsignal(signum)
+
+            def handler(sig, frame, previous=previous):
+                threading.Thread(target=self.start_draining, name="drain", daemon=True).start()
+                if callable(previous):
+                    previous(sig, frame)
+
+            signal.signal(signum, handler)
+
+
+lifecycle = Lifecycle()
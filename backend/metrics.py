@@ -0,0 +1,338 @@
+# -----------------------
+# Süre ölçümleri ve /metrics (Prometheus metin formatı)
+# -----------------------
+# Harici bağımlılık yok; her worker kendi sayaçlarını tutar (Prometheus her
+# worker'ı ayrı hedef olarak kazır ya da toplamı alır).
+#   chatdoc_http_request_duration_seconds{route,method,status}  route başına (handler süresi;
+#       akışlarda ilk bayta kadar)
+#   chatdoc_stage_duration_seconds{stage}   auth | db | prompt | pdf_extract | json
+#   chatdoc_upstream_duration_seconds{upstream}  + chatdoc_upstream_requests_total{upstream,outcome}
+#   Önbellek isabetleri ve anlık değerler kayıt anında değil, /metrics okunurken
+#   mevcut stats() fonksiyonlarından toplanır (add_collector): sıcak yolda maliyet yok.
+# Örnekli profil: METRICS_PROFILE_SAMPLE oranındaki istekler (ve METRICS_PROFILE_ALLOW=1
+# iken ?_profile=1 verilen tek istek) cProfile ile PROFILE_DIR'e .prof olarak yazılır;
+# pyinstrument kuruluysa METRICS_PROFILER=pyinstrument ile .html üretilir.
+import bisect
+import cProfile
+import os
+import random
+import threading
+import time
+from time import perf_counter
+
+import requests
+
+try:
+    import pyinstrument
+except ImportError:  # opsiyonel profil aracı
+    pyinstrument = None
+
+METRICS_ENABLED = os.getenv("METRICS", "1") == "1"
+METRICS_PREFIX = "chatdoc"
+METRICS_PROFILE_SAMPLE = float(os.getenv("METRICS_PROFILE_SAMPLE", "0"))
+METRICS_PROFILE_ALLOW = os.getenv("METRICS_PROFILE_ALLOW", "0") == "1"
+METRICS_PROFILER = os.getenv("METRICS_PROFILER", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "cache", "profiles"))
+
+# Saniye; 1 ms (JWT, önbellek) ile 60 sn (Gemini okuma zaman aşımı) arası
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label değerleri -> [bucket sayaçları, toplam, adet]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values):
+        # Gözlem sayısı (ör. bench/harness.py: stage="db" -> çalıştırılan sorgu sayısı)
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for values, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for values, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []  # fn() -> [(isim, tür, açıklama, {etiket: değer} | None, değer), ...]
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(f"{METRICS_PREFIX}_{name}", help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(f"{METRICS_PREFIX}_{name}", help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        declared = set()
+        for collector in self._collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                print("Metrik toplayıcı hatası:", e)
+                continue
+            for name, kind, help_text, labels, value in samples:
+                name = f"{METRICS_PREFIX}_{name}"
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                label_text = _format_labels(labels.keys(), labels.values()) if labels else ""
+                lines.append(f"{name}{label_text} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Route handler süresi (akışlarda ilk bayta kadar)",
+    ("route", "method", "status"))
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "İstek içi aşama süreleri", ("stage",))
+upstream_duration = registry.histogram(
+    "upstream_duration_seconds", "Upstream çağrı süresi (akışlarda tamamı)", ("upstream",))
+upstream_requests = registry.counter(
+    "upstream_requests_total", "Upstream çağrıları (outcome: ok | http_<kod> | timeout | connection | error)",
+    ("upstream", "outcome"))
+
+
+# -----------------------
+# Ölçüm yardımcıları
+# -----------------------
+class _Timer:
+    __slots__ = ("histogram", "label", "start")
+
+    def __init__(self, histogram, label):
+        self.histogram = histogram
+        self.label = label
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(perf_counter() - self.start, self.label)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    # with stage("db"): ...
+    return _Timer(stage_duration, name) if METRICS_ENABLED else _NULL_TIMER
+
+
+def observe_stage(name, seconds):
+    # with bloğuna sığmayan aşamalar için
+    if METRICS_ENABLED:
+        stage_duration.observe(seconds, name)
+
+
+def outcome_of(exc):
+    # requests, httpx ve soket hataları için ortak sınıflandırma
+    if exc is None:
+        return "ok"
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return f"http_{response.status_code}"
+    if isinstance(exc, (requests.Timeout, TimeoutError)) or "Timeout" in type(exc).__name__:
+        return "timeout"
+    if isinstance(exc, (requests.ConnectionError, ConnectionError)) or "Connect" in type(exc).__name__:
+        return "connection"
+    return "error"
+
+
+class _UpstreamTimer(_Timer):
+    __slots__ = ()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(perf_counter() - self.start, self.label)
+        # Akış istemci tarafından yarıda bırakıldıysa (GeneratorExit) hata sayılmaz
+        upstream_requests.inc(self.label, "ok" if exc_type is GeneratorExit else outcome_of(exc))
+        return False
+
+
+def upstream_call(name):
+    # with upstream_call("gemini"): ... -> süre + sonuç sayacı
+    return _UpstreamTimer(upstream_duration, name) if METRICS_ENABLED else _NULL_TIMER
+
+
+# -----------------------
+# Örnekli profil
+# -----------------------
+class _Profiler:
+    # Aynı anda tek profil (cProfile / sys.monitoring tek araç kabul eder)
+    def __init__(self):
+        self._busy = threading.Lock()
+        self.written = 0
+
+    def start(self):
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            if METRICS_PROFILER == "pyinstrument" and pyinstrument is not None:
+                profiler = pyinstrument.Profiler()
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            return profiler
+        except Exception as e:
+            print("Profil başlatılamadı:", e)
+            self._busy.release()
+            return None
+
+    def stop(self, profiler, label):
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{label}"
+            if pyinstrument is not None and isinstance(profiler, pyinstrument.Profiler):
+                profiler.stop()
+                path = os.path.join(PROFILE_DIR, f"{name}.html")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            else:
+                profiler.disable()
+                path = os.path.join(PROFILE_DIR, f"{name}.prof")
+                profiler.dump_stats(path)
+            self.written += 1
+            return path
+        finally:
+            self._busy.release()
+
+
+profiler = _Profiler()
+
+
+def _should_profile(request):
+    if METRICS_PROFILE_ALLOW and request.args.get("_profile") == "1":
+        return True
+    return METRICS_PROFILE_SAMPLE > 0 and random.random() < METRICS_PROFILE_SAMPLE
+
+
+# -----------------------
+# Flask entegrasyonu
+# -----------------------
+def init_app(app):
+    from flask import g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    if not METRICS_ENABLED:
+        return
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        # jsonify serileştirme süresi "json" aşaması olarak
+        def dumps(self, obj, **kwargs):
+            with stage("json"):
+                return super().dumps(obj, **kwargs)
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = perf_counter()
+        if _should_profile(request):
+            g.metrics_profiler = profiler.start()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule else "unmatched"
+            request_duration.observe(perf_counter() - start, rule, request.method, str(response.status_code))
+        active = g.pop("metrics_profiler", None)
+        if active is not None:
+            path = profiler.stop(active, (request.endpoint or "unmatched").replace(".", "_"))
+            if METRICS_PROFILE_ALLOW:
+                response.headers["X-Profile-File"] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def _discard_profiler(exception=None):
+        # after_request çalışmadıysa (işlenmemiş hata) profil kilidi bırakılsın
+        active = g.pop("metrics_profiler", None)
+        if active is not None:
+            profiler.stop(active, "error")
+
+
+def render():
+    return registry.render()
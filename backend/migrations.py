@@ -0,0 +1,188 @@
+# -----------------------
+# Şema migration'ları
+# -----------------------
+# Sıralı (isim, SQL) listesi; uygulananlar schema_migrations tablosuna yazılır.
+# Birden fazla worker aynı anda başlarsa advisory lock ile tek sefer çalışır.
+# Kullanım: python migrations.py
+import db
+
+MIGRATIONS = [
+    ("001_chat_store", """
+        CREATE TABLE IF NOT EXISTS chats (
+            username TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            next_seq INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (username, chat_id)
+        );
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id BIGSERIAL PRIMARY KEY,
+            username TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            sender TEXT NOT NULL,
+            text TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS chat_messages_username_chat_seq_idx
+            ON chat_messages (username, chat_id, seq);
+    """),
+    ("002_chat_metadata", """
+        ALTER TABLE chats ADD COLUMN IF NOT EXISTS title TEXT;
+        ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_activity TIMESTAMPTZ NOT NULL DEFAULT NOW();
+        UPDATE chats c SET
+            title = (
+                SELECT CASE WHEN length(split_part(btrim(m.text), E'\\n', 1)) > 50
+                            THEN left(split_part(btrim(m.text), E'\\n', 1), 50) || '...'
+                            ELSE split_part(btrim(m.text), E'\\n', 1) END
+                FROM chat_messages m
+                WHERE m.username = c.username AND m.chat_id = c.chat_id AND m.sender = 'user'
+                ORDER BY m.seq LIMIT 1
+            ),
+            last_activity = COALESCE((
+                SELECT MAX(m.created_at) FROM chat_messages m
+                WHERE m.username = c.username AND m.chat_id = c.chat_id
+            ), c.created_at);
+    """),
+    ("003_doctor_inbox", """
+        CREATE INDEX IF NOT EXISTS doctor_questions_doctor_created_idx
+            ON doctor_questions (doctor_id, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS doctor_messages_question_sender_created_idx
+            ON doctor_messages (question_id, sender, created_at);
+        ALTER TABLE doctor_questions ADD COLUMN IF NOT EXISTS first_user_message TEXT;
+        ALTER TABLE doctor_questions ADD COLUMN IF NOT EXISTS last_doctor_reply TEXT;
+        UPDATE doctor_questions q SET
+            first_user_message = (
+                SELECT m.message FROM doctor_messages m
+                WHERE m.question_id = q.id AND m.sender = 'user'
+                ORDER BY m.created_at ASC, m.id ASC LIMIT 1
+            ),
+            last_doctor_reply = (
+                SELECT m.message FROM doctor_messages m
+                WHERE m.question_id = q.id AND m.sender = 'doctor'
+                ORDER BY m.created_at DESC, m.id DESC LIMIT 1
+            );
+    """),
+    ("004_doctor_question_sync", """
+        ALTER TABLE doctor_questions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+        ALTER TABLE doctor_questions ADD COLUMN IF NOT EXISTS last_message_id INTEGER;
+        UPDATE doctor_questions q SET
+            last_message_id = (SELECT MAX(m.id) FROM doctor_messages m WHERE m.question_id = q.id),
+            updated_at = COALESCE(
+                (SELECT MAX(m.created_at) FROM doctor_messages m WHERE m.question_id = q.id),
+                q.created_at
+            );
+        CREATE INDEX IF NOT EXISTS doctor_questions_user_updated_idx
+            ON doctor_questions (user_id, updated_at);
+        CREATE INDEX IF NOT EXISTS doctor_messages_question_id_idx
+            ON doctor_messages (question_id, id);
+    """),
+    ("005_chat_summary", """
+        ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary TEXT;
+        ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary_seq INTEGER NOT NULL DEFAULT 0;
+    """),
+    ("006_upload_blobs", """
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            digest TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size BIGINT NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            released_at TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS upload_blobs_garbage_idx
+            ON upload_blobs (released_at) WHERE refcount = 0;
+    """),
+    ("007_chat_locks", """
+        CREATE UNLOGGED TABLE IF NOT EXISTS chat_locks (
+            lock_key TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL
+        );
+    """),
+    ("008_rate_limit_buckets", """
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+            bucket_key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL
+        );
+    """),
+    # Kullanıcı başına artan sürüm: doctor_questions'a her yazma (INSERT/UPDATE) trigger ile
+    # kullanıcının sayacını artırıp satıra yazar. Sayaç satırı commit'e kadar kilitli kaldığı
+    # için aynı kullanıcının sürümleri commit sırasıyla görünür (NOW() işlem başlangıcıdır,
+    # geç commit olan yazma eski bir zamanla görünüp delta sorgusunda kaçırılabiliyordu).
+    ("009_question_versions", """
+        CREATE TABLE IF NOT EXISTS question_versions (
+            user_id INTEGER PRIMARY KEY,
+            version BIGINT NOT NULL
+        );
+        ALTER TABLE doctor_questions ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+        UPDATE doctor_questions q SET version = v.version
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY updated_at, id) AS version
+            FROM doctor_questions
+        ) v
+        WHERE q.id = v.id;
+        INSERT INTO question_versions (user_id, version)
+            SELECT user_id, MAX(version) FROM doctor_questions WHERE user_id IS NOT NULL GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET version = EXCLUDED.version;
+        CREATE OR REPLACE FUNCTION doctor_questions_bump_version() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.user_id IS NOT NULL THEN
+                INSERT INTO question_versions AS v (user_id, version) VALUES (NEW.user_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET version = v.version + 1
+                RETURNING v.version INTO NEW.version;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS doctor_questions_version ON doctor_questions;
+        CREATE TRIGGER doctor_questions_version BEFORE INSERT OR UPDATE ON doctor_questions
+            FOR EACH ROW EXECUTE FUNCTION doctor_questions_bump_version();
+        CREATE INDEX IF NOT EXISTS doctor_questions_user_version_idx
+            ON doctor_questions (user_id, version);
+    """),
+    # JOB_QUEUE=postgres: arka plan iş durumu (iş kabul eden süreçte çalışır, durum paylaşılır)
+    ("010_jobs", """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+            result JSONB,
+            error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS jobs_updated_idx ON jobs (updated_at);
+    """),
+]
+
+MIGRATION_LOCK_ID = 7301001
+
+
+def migrate():
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        cursor.execute("SELECT name FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+        for name, sql in MIGRATIONS:
+            if name in applied:
+                continue
+            cursor.execute(sql)
+            cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            print("Migration uygulandı:", name)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,70 @@
+# -----------------------
+# PDF tahlil analizi
+# -----------------------
+# Çıkarma + referans dışı değerler + Gemini önerisi. Sonuç, PDF içeriğinin
+# özetiyle önbelleğe yazılır; aynı PDF tekrar yüklenince Gemini çağrılmaz.
+import os
+
+from gemini_client import client as gemini
+from lab_parser import PROMPT_BUDGET, extract_summary
+from metrics import stage
+from pdf_cache import create_pdf_cache, make_key
+
+# Prompt veya ayrıştırıcı değişince artırılmalı (eski önbellek girdileri kullanılmaz)
+PDF_ANALYSIS_VERSION = "1"
+AI_ERROR_REPLY = " AI analizi yapılamadı."
+
+pdf_cache = create_pdf_cache(os.getenv("PDF_CACHE", "disk"))
+
+
+def cache_key(digest):
+    return make_key(digest, f"{PDF_ANALYSIS_VERSION}:{gemini.api_base}:{PROMPT_BUDGET}")
+
+
+def build_pdf_prompt(text):
+    return f"""
+Sen bir sağlık asistanısın. Kullanıcının tahlil raporunu inceledin.
+Görevlerin:
+1. Genel durumu 1-2 cümle ile özetle.
+2. Referans dışı değerleri listele (eğer varsa).
+3. Her referans dışı değer için kısa ve basit öneriler ver.
+4. Referans dışı değer yoksa böyle devam etmesi için önerilerde bulun.
+Rapor metni:
+{text}
+
+Tahlil raporunda doktor var ise ona yönlendir yok ise Bizim Doktorlarımıza "Doktora'a Sor" Bölümünden danışabilirisiniz. benzeri bir ifade ekle.
+En sonda rapor sonucu ile ilgili öneri sorularda bulun.
+"""
+
+
+def analyze_pdf(pdf_path, digest, extract=extract_summary, generate=None):
+    # (analysis, cached) döndürür; PDF okunamazsa exception yükselir.
+    # extract/generate arka plan işlerinde süreç havuzu ve retry ile değiştirilir.
+    key = cache_key(digest)
+    cached = pdf_cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    # Süre fitz + regex taramasını (süreç havuzunda ise IPC dahil) kapsar
+    with stage("pdf_extract"):
+        extracted = extract(pdf_path)
+    analysis = {**extracted, "ai_reply": AI_ERROR_REPLY}
+    try:
+        analysis["ai_reply"] = (generate or gemini.generate)(build_pdf_prompt(analysis["prompt_text"]))
+    except Exception as e:
+        print("PDF analiz hatası:", e)
+        # Başarısız AI cevabı önbelleğe yazılmaz
+        return analysis, False
+
+    pdf_cache.put(key, analysis)
+    return analysis, False
+
+
+def format_pdf_reply(analysis):
+    bot_reply = "Genel değerlendirme yapılıyor..."
+    if analysis["referans_disi"]:
+        bot_reply += "\n\n Referans dışı değerler bulundu:\n- " + "\n- ".join(analysis["referans_disi"])
+    else:
+        bot_reply += "\n Önemli değerler referans aralıklarında."
+    bot_reply += f"\n\nAI Önerisi:\n{analysis['ai_reply']}"
+    return bot_reply
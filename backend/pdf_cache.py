@@ -0,0 +1,200 @@
+# -----------------------
+# PDF analiz önbelleği (içerik adresli)
+# -----------------------
+# Anahtar: PDF baytlarının SHA-256 özeti + prompt/model sürümü.
+# Değer: {"prompt_text", "referans_disi", "ai_reply"}
+# Backend PDF_CACHE env değişkeniyle seçilir: "disk" (varsayılan) | "memory" | "off"
+# Boyut (bayt) ve TTL ile eviction; hit/miss sayaçları stats() ile okunur.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(os.path.dirname(__file__), "cache", "pdf"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PDF_CACHE_TTL = int(os.getenv("PDF_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def make_key(digest, version=""):
+    return hashlib.sha256(f"{digest}:{version}".encode()).hexdigest() if version else digest
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self, **extra):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            **extra
+        }
+
+
+# -----------------------
+# Bellek içi LRU
+# -----------------------
+class MemoryPdfCache:
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES, ttl=PDF_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return entry[2]
+            if entry:
+                self._drop(key)
+            self._stats.misses += 1
+            return None
+
+    def put(self, key, value):
+        size = len(json.dumps(value, ensure_ascii=False).encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return self._stats.as_dict(backend="memory", entries=len(self._entries), bytes=self._bytes)
+
+
+# -----------------------
+# Disk backend (restart'tan sonra da geçerli)
+# -----------------------
+# Dosya düzeni: <dir>/<ilk 2 hex>/<key>.json ; erişim zamanı = mtime (LRU için)
+class DiskPdfCache:
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES, ttl=PDF_CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, st.st_mtime, st.st_size
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._stats.misses += 1
+            return None
+
+        with self._lock:
+            if entry.get("expires_at", 0) <= time.time():
+                self._remove(path)
+                self._stats.misses += 1
+                return None
+            self._stats.hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["value"]
+
+    def put(self, key, value):
+        data = json.dumps({"expires_at": time.time() + self.ttl, "value": value}, ensure_ascii=False).encode()
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            if os.path.exists(path):
+                self._remove(path)
+            # Atomik yer değiştirme: yarım yazılmış dosya okunmaz
+            os.replace(tmp_path, path)
+            self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        # Önce süresi dolanlar, sonra en uzun süredir erişilmeyenler
+        now = time.time()
+        entries = sorted(self._scan(), key=lambda e: e[1])
+        for path, mtime, size in entries:
+            if self._bytes <= self.max_bytes and mtime + self.ttl > now:
+                break
+            self._remove(path)
+            self._stats.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return self._stats.as_dict(backend="disk", bytes=self._bytes)
+
+
+class NullPdfCache:
+    def __init__(self):
+        self._stats = _Stats()
+
+    def get(self, key):
+        self._stats.misses += 1
+        return None
+
+    def put(self, key, value):
+        pass
+
+    def stats(self):
+        return self._stats.as_dict(backend="off")
+
+
+def create_pdf_cache(kind):
+    if kind == "disk":
+        return DiskPdfCache()
+    if kind == "memory":
+        return MemoryPdfCache()
+    if kind == "off":
+        return NullPdfCache()
+    raise ValueError(f"Bilinmeyen PDF_CACHE: {kind}")
@@ -0,0 +1,106 @@
+# -----------------------
+# chat() için profil bağlamı önbelleği
+# -----------------------
+# Her sohbet turunda users tablosu okunup BMI ve "extra_info" metni yeniden
+# hesaplanıyordu. Profil yalnızca /profile POST ile değişir: orada invalidate()
+# çağrılır. Diğer worker'lardaki kopyalar için TTL güvenlik ağıdır
+# (PROFILE_CACHE_TTL). Girdi sayısı PROFILE_CACHE_SIZE ile sınırlıdır (LRU).
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import db
+from response_cache import profile_bucket
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+
+ProfileContext = namedtuple("ProfileContext", "extra_info age bmi gender chronic bucket")
+
+
+def build_profile_context(row):
+    extra_info = ""
+    age = chronic = gender = bmi = None
+    if row:
+        age, height, weight, chronic, gender = row
+        if height and weight:
+            try:
+                height_m = float(height) / 100
+                bmi = float(weight) / (height_m ** 2)
+                if bmi >= 32.5:
+                    extra_info += "Kullanıcının fazla kilo durumu var. "
+                elif bmi >= 25:
+                    extra_info += "Kullanıcı biraz kilolu. "
+                elif bmi < 18.5:
+                    extra_info += "Kullanıcı zayıf. "
+            except (TypeError, ValueError, ZeroDivisionError):
+                bmi = None
+        if chronic:
+            extra_info += f"Kullanıcının kronik hastalıkları: {chronic}. "
+        if age:
+            extra_info += f"Kullanıcının yaşı: {age}. "
+        if gender:
+            extra_info += f"Cinsiyeti: {gender}."
+    return ProfileContext(extra_info, age, bmi, gender, chronic, profile_bucket(age, bmi, gender, chronic))
+
+
+def load_profile_context(username):
+    cursor = db.get_db().cursor()
+    cursor.execute("SELECT age, height, weight, chronic, gender FROM users WHERE username=%s", (username,))
+    return build_profile_context(cursor.fetchone())
+
+
+class ProfileCache:
+    def __init__(self, max_entries=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL, loader=load_profile_context):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.loader = loader
+        self._entries = OrderedDict()  # username -> (expires_at, ProfileContext)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Yükleme sürerken invalidate gelirse eski profil yazılmasın
+        self._generation = 0
+
+    def get(self, username):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        # DB sorgusu kilit dışında (yavaş sorgu diğer kullanıcıları bekletmesin)
+        context = self.loader(username)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[username] = (time.time() + self.ttl, context)
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, username):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(username, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                # Her isabet chat() içinde bir users sorgusu demek
+                "db_queries_saved": self.hits
+            }
+
+
+profile_cache = ProfileCache()
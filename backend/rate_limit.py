@@ -0,0 +1,195 @@
+# -----------------------
+# Model kullanan uçlar için kullanıcı başına hız sınırı
+# -----------------------
+# Her (uç, kullanıcı) çifti bir token kovasıdır: dakikada `per_minute` jeton dolar,
+# en fazla `burst` birikir, her istek `cost` jeton harcar. Jeton yoksa istek Gemini'ye
+# hiç ulaşmadan 429 + Retry-After (kovanın bir isteğe yetecek kadar dolma süresi) alır.
+# Sınır sohbet id'sinden bağımsızdır: yeni sohbet açmak (POST /chats) sınırı aşmaz.
+# Backend RATE_LIMIT env değişkeniyle seçilir:
+#   "memory"   -> tek süreç (varsayılan; her worker kendi kovasını tutar)
+#   "postgres" -> rate_limit_buckets tablosu (migration 008), tüm worker'lar arasında geçerli
+#   "off"      -> sınır yok
+# Sınırdan geçen istek, Gemini slot kuyruğu için kullanıcı olarak işaretlenir
+# (resilience.current_tenant, bkz. FairSlots).
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import g, jsonify, request
+
+import db
+from resilience import current_tenant
+
+Limit = namedtuple("Limit", "per_minute burst")
+
+
+def _limit(name, per_minute, burst):
+    return Limit(float(os.getenv(f"RATE_LIMIT_{name}_PER_MIN", per_minute)),
+                 float(os.getenv(f"RATE_LIMIT_{name}_BURST", burst)))
+
+
+RATE_LIMITS = {
+    "chat": _limit("CHAT", "20", "10"),
+    "pdf": _limit("PDF", "6", "3"),
+    "pdf_batch": _limit("PDF_BATCH", "2", "2"),
+}
+# Arka plan işlerinin (async PDF, toplu analiz) slot kuyruğundaki ağırlığı; etkileşimli istekler 1
+BACKGROUND_WEIGHT = float(os.getenv("RATE_LIMIT_BACKGROUND_WEIGHT", "0.5"))
+MEMORY_BUCKETS_MAX = 100000
+
+
+def _retry_after(tokens, cost, limit):
+    if limit.per_minute <= 0:
+        return 60.0
+    return max(0.0, (cost - tokens) * 60.0 / limit.per_minute)
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # uç -> {"allowed": n, "limited": n}
+
+    def incr(self, endpoint, result):
+        with self._lock:
+            counts = self._values.setdefault(endpoint, {"allowed": 0, "limited": 0})
+            counts[result] += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._values.items()}
+
+
+# -----------------------
+# Bellek içi backend
+# -----------------------
+class MemoryRateLimiter:
+    def __init__(self, limits=RATE_LIMITS):
+        self.limits = dict(limits)
+        self.enabled = True
+        self._buckets = {}  # (uç, kullanıcı) -> (jeton, son güncelleme)
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def _take(self, key, limit, cost):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * limit.per_minute / 60.0)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > MEMORY_BUCKETS_MAX:
+                self._prune(now)
+        return False, _retry_after(tokens, cost, limit)
+
+    def _prune(self, now):
+        # Dolmuş kovalar kaydı olmayanla aynıdır
+        full = [key for key, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self.limits[key[0]].per_minute / 60.0 >= self.limits[key[0]].burst]
+        for key in full:
+            del self._buckets[key]
+
+    def try_acquire(self, endpoint, username, cost=1):
+        # (izin, Retry-After sn)
+        limit = self.limits.get(endpoint)
+        if not self.enabled or limit is None:
+            return True, 0.0
+        allowed, retry_after = self._take((endpoint, username), limit, cost)
+        self._stats.incr(endpoint, "allowed" if allowed else "limited")
+        return allowed, retry_after
+
+    def stats(self):
+        with self._lock:
+            buckets = len(self._buckets)
+        return {"backend": "memory", "enabled": self.enabled, "buckets": buckets,
+                "limits": {k: v._asdict() for k, v in self.limits.items()}, "endpoints": self._stats.as_dict()}
+
+
+# -----------------------
+# PostgreSQL backend (worker'lar arası)
+# -----------------------
+# Dolum + harcama tek UPSERT ile atomik yapılır (satır kilidi); jeton yetmezse satır
+# güncellenmez ve RETURNING boş döner, Retry-After için kalan jeton ayrıca okunur.
+class PostgresRateLimiter(MemoryRateLimiter):
+    def _take(self, key, limit, cost):
+        bucket_key = f"{key[0]}:{key[1]}"
+        rate = limit.per_minute / 60.0
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+                VALUES (%(key)s, %(burst)s - %(cost)s, NOW())
+                ON CONFLICT (bucket_key) DO UPDATE
+                    SET tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * %(rate)s)
+                                 - %(cost)s,
+                        updated_at = NOW()
+                    WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * %(rate)s)
+                          >= %(cost)s
+                RETURNING tokens
+                """,
+                {"key": bucket_key, "burst": limit.burst, "cost": cost, "rate": rate}
+            )
+            if cursor.fetchone() is not None:
+                return True, 0.0
+            cursor.execute(
+                """
+                SELECT LEAST(%(burst)s, tokens + EXTRACT(EPOCH FROM NOW() - updated_at) * %(rate)s)
+                FROM rate_limit_buckets WHERE bucket_key = %(key)s
+                """,
+                {"key": bucket_key, "burst": limit.burst, "rate": rate}
+            )
+            row = cursor.fetchone()
+        return False, _retry_after(float(row[0]) if row else 0.0, cost, limit)
+
+    def stats(self):
+        return {"backend": "postgres", "enabled": self.enabled,
+                "limits": {k: v._asdict() for k, v in self.limits.items()}, "endpoints": self._stats.as_dict()}
+
+
+def create_rate_limiter(kind):
+    if kind == "memory":
+        return MemoryRateLimiter()
+    if kind == "postgres":
+        return PostgresRateLimiter()
+    if kind == "off":
+        limiter = MemoryRateLimiter()
+        limiter.enabled = False
+        return limiter
+    raise ValueError(f"Bilinmeyen RATE_LIMIT: {kind}")
+
+
+rate_limiter = create_rate_limiter(os.getenv("RATE_LIMIT", "memory"))
+
+
+# -----------------------
+# Flask entegrasyonu
+# -----------------------
+def rate_limited(endpoint, cost=1):
+    # @require_auth'tan sonra (g.username gerekli):
+    #   @api.route(...)
+    #   @require_auth
+    #   @rate_limited("chat")
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == "OPTIONS":
+                return view(*args, **kwargs)
+            allowed, retry_after = rate_limiter.try_acquire(endpoint, g.username, cost)
+            if not allowed:
+                response = jsonify({"error": "Çok fazla istek gönderdiniz, lütfen biraz sonra tekrar deneyin"})
+                response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+                return response, 429
+            # İstek bitince geri alınır (thread sonraki isteğe kullanıcıyı taşımasın); view
+            # döndükten sonra çalışan akış generator'ları kullanıcıyı kendileri bağlar
+            token = current_tenant.set((g.username, 1.0))
+            try:
+                return view(*args, **kwargs)
+            finally:
+                current_tenant.reset(token)
+        return wrapper
+    return decorator
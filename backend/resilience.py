@@ -0,0 +1,556 @@
+# -----------------------
+# Upstream dayanıklılık katmanı
+# -----------------------
+# Harici çağrılar (Gemini) için üç parça; gemini_client.py birlikte kullanır:
+#   RetryPolicy     deneme başına zaman aşımı + toplam süre sınırı (deadline) içinde,
+#                   yalnızca geçici hatalarda (429/5xx, zaman aşımı, bağlantı) tam
+#                   jitter'lı üstel bekleme ile tekrar dener; Retry-After'a uyar
+#   CircuitBreaker  art arda `failure_threshold` geçici hata -> devre açılır: çağrılar
+#                   upstream'e gitmeden UpstreamUnavailable alır (çağıran hazır güvenli
+#                   cevabı döner). `reset_timeout` sonra tek deneme çağrısı (half-open)
+#                   geçer; başarılıysa devre kapanır
+#   Hedger          deneme `delay` sn içinde dönmezse aynı isteği ikinci kez gönderir,
+#                   önce gelen başarılı sonucu alır (kuyruk gecikmesini kırpar). Ek yük
+#                   `max_ratio` ile sınırlı; delay <= 0 ise kapalı
+#   SingleFlight    aynı anahtarla eşzamanlı gelen çağrılar tek upstream çağrısını
+#                   paylaşır; bekleyenlerin hepsi aynı sonucu ya da hatanın kendi kopyasını alır
+#   FairSlots       eşzamanlılık slotları; doluyken bekleyenler geliş sırasıyla değil
+#                   kullanıcı başına ağırlıklı adil sırayla (WFQ) slot alır. Kullanıcı
+#                   `current_tenant` context değişkeninden okunur (bkz. rate_limit.py)
+# Async yol (GeminiClient.agenerate) aynı parçaları acall_with_retries ve
+# FairSlots.aacquire üzerinden kullanır; thread'li çağıranlarla aynı slotları paylaşır.
+# Devre açıkken ve bekleme sırasında Gemini eşzamanlılık slotu tutulmaz: kesinti
+# anında worker thread'leri zaman aşımı beklemek yerine hemen serbest kalır.
+import asyncio
+import contextvars
+import copy
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import httpx
+import requests
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    # Devre açık, eşzamanlılık sınırı dolu veya deneme/süre bütçesi tükendi
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CoalescedError(Exception):
+    # Lider hatası kopyalanamadığında bekleyenlere verilir (asıl hata __cause__'da)
+    pass
+
+
+def status_of(exc):
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc):
+    # requests, httpx ve soket hataları için ortak sınıflandırma (bkz. metrics.outcome_of)
+    status = status_of(exc)
+    if status:
+        return status in RETRYABLE_STATUS
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError,
+                        ConnectionError, TimeoutError)):
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connect" in name
+
+
+def retry_after_of(exc):
+    if exc is None:
+        return None
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# -----------------------
+# Tekrar deneme
+# -----------------------
+class RetryPolicy:
+    def __init__(self, attempts=3, base_delay=0.25, max_delay=4.0, attempt_timeout=None, deadline=None):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Tek denemenin okuma zaman aşımı / tüm denemeler + beklemeler için üst sınır (sn)
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+
+    @property
+    def key(self):
+        # Aynı değerli politikalar eşittir (SingleFlight anahtarı için)
+        return (self.attempts, self.base_delay, self.max_delay, self.attempt_timeout, self.deadline)
+
+    def delay(self, attempt, exc=None):
+        # Tam jitter: [0, min(max, base * 2^n)]; aynı anda düşen istemciler senkron tekrar denemesin
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = retry_after_of(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class _Counters:
+    def __init__(self, *names):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(names, 0)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._values[name] += n
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class _Attempts:
+    # call_with_retries / acall_with_retries ortak durumu: her tur için denemeye kalan süreyi verir, hatadan sonra
+    # beklenecek süreyi (ya da vazgeçmeyi) belirler
+    def __init__(self, policy, breaker=None, on_retry=None):
+        self.policy = policy
+        self.breaker = breaker
+        self.on_retry = on_retry
+        self.deadline = time.monotonic() + policy.deadline if policy.deadline else None
+        self.last_error = None
+        self.n = 0
+
+    def __iter__(self):
+        for n in range(self.policy.attempts):
+            self.n = n
+            if self.breaker is not None:
+                self.breaker.before_call()
+            timeout = self.policy.attempt_timeout
+            if self.deadline is not None:
+                remaining = self.deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining) if timeout else remaining
+            yield timeout
+
+    def succeeded(self):
+        if self.breaker is not None:
+            self.breaker.record(success=True)
+
+    def failed(self, exc):
+        # Beklenecek süre; None: vazgeç. Geçici olmayan hata olduğu gibi yükseltilir
+        if isinstance(exc, UpstreamUnavailable):
+            # Yerel sınır (eşzamanlılık slotu dolu): upstream'in sağlığı hakkında bilgi yok
+            if self.breaker is not None:
+                self.breaker.release()
+            raise exc
+        retryable = is_retryable(exc)
+        if self.breaker is not None:
+            # 4xx / beklenmeyen gövde upstream'in sağlığı hakkında bilgi vermez
+            self.breaker.record(success=not retryable)
+        if not retryable:
+            raise exc
+        self.last_error = exc
+        if self.n == self.policy.attempts - 1:
+            return None
+        delay = self.policy.delay(self.n, exc)
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            return None
+        if self.on_retry is not None:
+            self.on_retry(exc)
+        return delay
+
+    def exhausted(self):
+        error = UpstreamUnavailable(f"Upstream cevap vermedi: {self.last_error}", retry_after_of(self.last_error))
+        error.__cause__ = self.last_error
+        return error
+
+
+def call_with_retries(attempt, policy, breaker=None, on_retry=None):
+    # attempt(timeout) tek deneme yapar; timeout o denemeye kalan süredir (None: sınırsız)
+    attempts = _Attempts(policy, breaker, on_retry)
+    for timeout in attempts:
+        try:
+            result = attempt(timeout)
+        except Exception as e:
+            delay = attempts.failed(e)
+            if delay is None:
+                break
+            time.sleep(delay)
+            continue
+        attempts.succeeded()
+        return result
+    raise attempts.exhausted()
+
+
+async def acall_with_retries(attempt, policy, breaker=None, on_retry=None):
+    # call_with_retries'ın coroutine sürümü: attempt(timeout) awaitable döner, bekleme asyncio.sleep
+    attempts = _Attempts(policy, breaker, on_retry)
+    for timeout in attempts:
+        try:
+            result = await attempt(timeout)
+        except Exception as e:
+            delay = attempts.failed(e)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            continue
+        attempts.succeeded()
+        return result
+    raise attempts.exhausted()
+
+
+# -----------------------
+# Devre kesici
+# -----------------------
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._counters = _Counters("opened", "rejected", "probes")
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        # Devre açıksa UpstreamUnavailable; half-open'da aynı anda tek deneme çağrısı
+        with self._lock:
+            if self._state == "closed":
+                return
+            now = time.monotonic()
+            if self._state == "open" and now - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._counters.incr("probes")
+                return
+            retry_after = max(0.0, self.reset_timeout - (now - self._opened_at))
+        self._counters.incr("rejected")
+        raise UpstreamUnavailable(f"{self.name} devresi açık", retry_after)
+
+    def record(self, success):
+        with self._lock:
+            self._probe_in_flight = False
+            if success:
+                self._state = "closed"
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._state == "half_open" or (self._state == "closed" and self._failures >= self.failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._counters.incr("opened")
+
+    def release(self):
+        # Sonucu bilinmeyen deneme: half-open deneme hakkı geri verilir
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            state, failures = self._state, self._failures
+        return {"state": state, "consecutive_failures": failures, **self._counters.as_dict()}
+
+
+# -----------------------
+# Hedged istekler
+# -----------------------
+class Hedger:
+    def __init__(self, delay=0.0, max_ratio=0.1, max_workers=64):
+        self.delay = delay
+        self.max_ratio = max_ratio
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        # Token kovası: her çağrı max_ratio jeton ekler, her ikinci istek 1 jeton harcar
+        self._tokens = 1.0
+        self._lock = threading.Lock()
+        self._counters = _Counters("calls", "hedged", "hedge_won", "budget_exhausted")
+
+    @property
+    def enabled(self):
+        return self.delay > 0
+
+    def _take_token(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def call(self, fn, *args):
+        if not self.enabled:
+            return fn(*args)
+        self._counters.incr("calls")
+        with self._lock:
+            self._tokens = min(10.0, self._tokens + self.max_ratio)
+        # Çağıranın context'i (current_tenant) hedge thread'lerine taşınır
+        primary = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        try:
+            return primary.result(timeout=self.delay)
+        except FutureTimeout:
+            pass
+        if not self._take_token():
+            self._counters.incr("budget_exhausted")
+            return primary.result()
+        self._counters.incr("hedged")
+        backup = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        done, _ = wait((primary, backup), return_when=FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is not None:
+            # Önce biten hata verdiyse diğerini bekle
+            first = backup if first is primary else primary
+        if first is backup:
+            self._counters.incr("hedge_won")
+        # Kaybeden istek arka planda biter, sonucu atılır
+        return first.result()
+
+    def stats(self):
+        return {"delay": self.delay, "max_ratio": self.max_ratio, **self._counters.as_dict()}
+
+
+# -----------------------
+# Eşzamanlı aynı çağrıların birleştirilmesi (single-flight)
+# -----------------------
+class _Flight:
+    __slots__ = ("done", "result", "error", "expires_at")
+
+    def __init__(self, timeout):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires_at = time.monotonic() + timeout if timeout else None
+
+
+def _raise_copy(error):
+    # Her bekleyen kendi exception nesnesini alır: aynı nesneyi birçok thread'de yükseltmek
+    # __traceback__'ini karıştırır. Tip (ve response gibi alanlar) korunur, lider hatası __cause__'da
+    try:
+        own = copy.copy(error)
+    except Exception:
+        own = CoalescedError(f"Birleştirilen çağrı başarısız: {error!r}")
+    raise own from error
+
+
+class SingleFlight:
+    # Önbellek değildir: sonuç yalnızca çağrı sürerken gelenlerle paylaşılır, bitince anahtar silinir
+    def __init__(self, name, timeout=None):
+        self.name = name
+        # Varsayılan anahtar zaman aşımı (sn): bu süreyi aşan çağrıya yeni gelenler katılmaz,
+        # bekleyenler UpstreamUnavailable alır
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._counters = _Counters("calls", "leaders", "coalesced", "timeouts")
+
+    def do(self, key, fn, timeout=None):
+        # fn() anahtar için ilk gelen (lider) thread'de çalışır; timeout: bu çağıranın en çok
+        # bekleyeceği süre (lider için anahtarın ömrü)
+        timeout = timeout or self.timeout
+        self._counters.incr("calls")
+        now = time.monotonic()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.expires_at is not None and now >= flight.expires_at:
+                # Takılan çağrı sonraki istekleri de kilitlemesin
+                flight = None
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(timeout)
+
+        if not leader:
+            self._counters.incr("coalesced")
+            waits = [t for t in (timeout, flight.expires_at - now if flight.expires_at is not None else None)
+                     if t is not None]
+            if not flight.done.wait(max(0.0, min(waits)) if waits else None):
+                self._counters.incr("timeouts")
+                raise UpstreamUnavailable(f"{self.name}: birleştirilen çağrı zaman aşımına uğradı")
+            if flight.error is not None:
+                _raise_copy(flight.error)
+            return flight.result
+
+        self._counters.incr("leaders")
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        counters = self._counters.as_dict()
+        with self._lock:
+            in_flight = len(self._flights)
+        ratio = counters["coalesced"] / counters["calls"] if counters["calls"] else 0.0
+        return {"timeout": self.timeout, "in_flight_keys": in_flight, "coalesce_ratio": round(ratio, 4), **counters}
+
+
+# -----------------------
+# Kullanıcılar arası adil slot kuyruğu
+# -----------------------
+# (kullanıcı, ağırlık); istek thread'inde rate_limit.rate_limited, arka plan işlerinde
+# bind_tenant ile atanır. Atanmamışsa tüm çağrılar tek "-" kullanıcısı sayılır.
+current_tenant = contextvars.ContextVar("current_tenant", default=("-", 1.0))
+
+
+def bind_tenant(fn, tenant, weight=1.0):
+    # Başka thread'de (iş kuyruğu, toplu analiz havuzu) çalışacak fn'i kullanıcıya bağlar
+    def bound(*args, **kwargs):
+        token = current_tenant.set((tenant, weight))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            current_tenant.reset(token)
+    return bound
+
+
+class _Waiter:
+    # Thread'ler threading.Event, coroutine'ler loop'a bağlı Future üzerinde bekler
+    __slots__ = ("event", "loop", "future", "granted", "cancelled", "tenant", "tag", "start")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.cancelled = False
+
+    def wake(self):
+        if self.future is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class FairSlots:
+    # Start-time fair queueing: her bekleyen isteğe kullanıcısının sanal bitiş zamanı
+    # (max(sanal saat, kullanıcının son bitişi) + 1/ağırlık) etiket olarak verilir; boşalan
+    # slot en küçük etiketli bekleyene geçer. Tek kullanıcının yüz bekleyen isteği, yeni
+    # gelen başka bir kullanıcının önüne geçemez. fair=False: geliş sırası (FIFO)
+    # Senkron (acquire) ve async (aacquire) çağıranlar aynı slotları ve aynı sırayı paylaşır.
+    def __init__(self, capacity, fair=True):
+        self.capacity = capacity
+        self.fair = fair
+        self._lock = threading.Lock()
+        self._available = capacity
+        self._waiting = []  # heap: (etiket, sıra, kullanıcı, başlangıç etiketi, _Waiter)
+        self._finish = {}  # kullanıcı -> son sanal bitiş zamanı
+        self._virtual = 0.0
+        self._seq = itertools.count()
+        self._counters = _Counters("granted", "waited", "timeouts")
+
+    def _enter(self, waiter):
+        # Slot boşsa hemen alınır (None); yoksa waiter kuyruğa girer
+        tenant, weight = current_tenant.get()
+        with self._lock:
+            if self._available > 0 and not self._waiting:
+                self._available -= 1
+                self._counters.incr("granted")
+                return None
+            seq = next(self._seq)
+            if self.fair:
+                start = max(self._virtual, self._finish.get(tenant, 0.0))
+                tag = self._finish[tenant] = start + 1.0 / max(weight, 1e-6)
+            else:
+                start = tag = seq
+            waiter.tenant, waiter.tag, waiter.start = tenant, tag, start
+            heapq.heappush(self._waiting, (tag, seq, tenant, start, waiter))
+        self._counters.incr("waited")
+        return waiter
+
+    def _give_up(self, waiter):
+        # Bekleme bitti (zaman aşımı / iptal); o arada slot verildiyse True
+        with self._lock:
+            if waiter.granted:
+                return True
+            # Heap'ten tembel silinir (release atlar); kullanıcı sırası geri alınır
+            waiter.cancelled = True
+            if self.fair and self._finish.get(waiter.tenant) == waiter.tag:
+                self._finish[waiter.tenant] = waiter.start
+        self._counters.incr("timeouts")
+        return False
+
+    def acquire(self, timeout=None):
+        # Slot alınamazsa (timeout doldu) False
+        waiter = self._enter(_Waiter())
+        if waiter is None or waiter.event.wait(timeout):
+            return True
+        return self._give_up(waiter)
+
+    async def aacquire(self, timeout=None):
+        # acquire'ın coroutine sürümü: beklerken thread tutmaz
+        waiter = self._enter(_Waiter(asyncio.get_running_loop()))
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._give_up(waiter)
+        except asyncio.CancelledError:
+            # İptalle aynı anda verilen slot geri bırakılır
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiting:
+                _, _, _, start, waiter = heapq.heappop(self._waiting)
+                if waiter.cancelled:
+                    continue
+                if self.fair:
+                    # Sanal saat: hizmete giren isteğin başlangıç etiketi
+                    self._virtual = max(self._virtual, start)
+                    if len(self._finish) > 10000:
+                        # Sanal saatin gerisinde kalan kullanıcılar hiç kaydı olmayanla aynıdır
+                        self._finish = {t: f for t, f in self._finish.items() if f > self._virtual}
+                waiter.granted = True
+                self._counters.incr("granted")
+                waiter.wake()
+                return
+            self._available = min(self.capacity, self._available + 1)
+
+    def stats(self):
+        with self._lock:
+            waiting = [entry for entry in self._waiting if not entry[4].cancelled]
+            available = self._available
+        return {
+            "capacity": self.capacity,
+            "fair": self.fair,
+            "available": available,
+            "waiting": len(waiting),
+            "waiting_tenants": len({entry[2] for entry in waiting}),
+            **self._counters.as_dict()
+        }
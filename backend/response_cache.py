@@ -0,0 +1,209 @@
+# -----------------------
+# Sık sorulan sağlık soruları için cevap önbelleği (opsiyonel)
+# -----------------------
+# RESPONSE_CACHE=1 ile açılır. Anahtar: normalize edilmiş mesaj + kaba profil
+# grubu (BMI bandı, yaş bandı, cinsiyet, kronik hastalık var/yok).
+#   1) Birebir eşleşme (normalize metin)
+#   2) Yakın kopya: karakter 3-gram MinHash + LSH bantları, Jaccard >= eşik (varsayılan 0.85;
+#      "karın ağrısı" ~ "baş ağrısı" 0.74 civarında kalır, eşik bilerek yüksek)
+#      Benzerlik tek başına yetmez: tıbben farklı soruları ayıran farklar reddedilir
+#      (bkz. _same_question): sayılar ("günde 8 tablet" / "2 tablet"), eklenen ya da
+#      çıkarılan kelime, olumsuzluk ("yapmamalıyım" / "yapmalıyım", "değil", "şekersiz").
+#      Kabul edilen yakın kopyalar aynı kelime sayısında yazım farklarıdır.
+# Önbellek yalnızca AI cevabını tutar; tehlike uyarısı her istekte ayrıca eklenir.
+# LRU + TTL ile eviction; isabet oranı ve kazanılan süre stats() ile okunur.
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from danger import normalize
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.85"))
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_PUNCT = re.compile(r"[^\w ]+")
+# Katlanmış (aksansız) olumsuzluk kelimeleri ve ekleri: -ma/-me (yapmamalı), -maz/-mez,
+# -sız/-siz/-suz/-süz (şekersiz)
+_NEGATION_WORDS = {"degil", "yok", "hayir", "olmaz", "asla", "hic"}
+_NEGATIVE_AFFIXES = ("ma", "me", "mi", "mu", "siz", "suz")
+
+
+def normalize_message(text):
+    # Türkçe küçük harf + aksan katlama (danger.normalize), noktalama atılır
+    folded = normalize(text)[0]
+    return " ".join(_PUNCT.sub(" ", folded).split())
+
+
+def profile_bucket(age=None, bmi=None, gender=None, chronic=None):
+    try:
+        age_band = f"{int(age) // 10 * 10}s" if age else "-"
+    except (TypeError, ValueError):
+        age_band = "-"
+    if bmi is None:
+        bmi_band = "-"
+    elif bmi >= 32.5:
+        bmi_band = "obez"
+    elif bmi >= 25:
+        bmi_band = "kilolu"
+    elif bmi < 18.5:
+        bmi_band = "zayif"
+    else:
+        bmi_band = "normal"
+    return f"{bmi_band}|{age_band}|{(gender or '-').lower()}|{'kronik' if chronic else '-'}"
+
+
+def _shingles(text, k=3):
+    padded = f" {text} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+def _minhash(shingles):
+    hashes = [zlib.crc32(s.encode()) for s in shingles]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _negative_edit(a, b):
+    # İki kelimenin farklı olan orta kısmında (bir karakter taşmayla) olumsuzluk eki var mı
+    prefix = 0
+    while prefix < min(len(a), len(b)) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(a), len(b)) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    for word in (a, b):
+        fragment = word[max(0, prefix - 1):len(word) - suffix + 1]
+        if any(affix in fragment for affix in _NEGATIVE_AFFIXES):
+            return True
+    return False
+
+
+def _same_question(a, b):
+    # a, b: normalize edilmiş metinler. Yalnızca aynı kelime sayısında, sayıları ve
+    # olumsuzluk kelimeleri aynı, değişen kelimelerinde olumsuzluk eki oynamayan
+    # metinler aynı soru sayılır
+    a_tokens, b_tokens = a.split(), b.split()
+    if len(a_tokens) != len(b_tokens):
+        return False
+    for x, y in zip(a_tokens, b_tokens):
+        if x == y:
+            continue
+        if any(c.isdigit() for c in x + y) or x in _NEGATION_WORDS or y in _NEGATION_WORDS:
+            return False
+        if _negative_edit(x, y):
+            return False
+    return True
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 threshold=RESPONSE_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        # key (bucket, normalize metin) -> {reply, shingles, bands, expires_at}
+        self._entries = OrderedDict()
+        # (bucket, band no, band hash) -> set(key)
+        self._lsh = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._avg_upstream = 0.0
+
+    def get(self, message, bucket):
+        text = normalize_message(message)
+        key = (bucket, text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.saved_seconds += self._avg_upstream
+                return entry["reply"]
+
+        shingles = _shingles(text)
+        bands = self._bands(_minhash(shingles))
+        with self._lock:
+            best_key, best_score = None, 0.0
+            for i, band in enumerate(bands):
+                for candidate in self._lsh.get((bucket, i, band), ()):
+                    score = _jaccard(shingles, self._entries[candidate]["shingles"])
+                    if score > best_score and _same_question(text, candidate[1]):
+                        best_key, best_score = candidate, score
+            if best_key and best_score >= self.threshold and self._entries[best_key]["expires_at"] > now:
+                self._entries.move_to_end(best_key)
+                self.near_hits += 1
+                self.saved_seconds += self._avg_upstream
+                return self._entries[best_key]["reply"]
+            self.misses += 1
+            return None
+
+    def put(self, message, bucket, reply, upstream_seconds=None):
+        text = normalize_message(message)
+        key = (bucket, text)
+        shingles = _shingles(text)
+        bands = self._bands(_minhash(shingles))
+        with self._lock:
+            if upstream_seconds is not None:
+                # Kazanılan süre tahmini için upstream gecikmesinin hareketli ortalaması
+                self._avg_upstream = upstream_seconds if not self._avg_upstream \
+                    else 0.9 * self._avg_upstream + 0.1 * upstream_seconds
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "reply": reply, "shingles": shingles, "bands": bands,
+                "expires_at": time.time() + self.ttl
+            }
+            for i, band in enumerate(bands):
+                self._lsh.setdefault((bucket, i, band), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    @staticmethod
+    def _bands(signature):
+        return [hash(tuple(signature[i * ROWS:(i + 1) * ROWS])) for i in range(BANDS)]
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        for i, band in enumerate(entry["bands"]):
+            bucket_keys = self._lsh.get((key[0], i, band))
+            if bucket_keys:
+                bucket_keys.discard(key)
+                if not bucket_keys:
+                    del self._lsh[(key[0], i, band)]
+
+    def stats(self):
+        with self._lock:
+            total = self.exact_hits + self.near_hits + self.misses
+            return {
+                "enabled": RESPONSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.exact_hits + self.near_hits) / total, 4) if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3)
+            }
+
+
+response_cache = ResponseCache()
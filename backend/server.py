@@ -1,70 +1,110 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, current_app, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-import requests
 import os
+import json
+import time
+import threading
 import jwt
-from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 import datetime
-import psycopg2
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-import fitz
-import re
+from gemini_client import client as gemini
+import db
+from auth import cache_stats as auth_cache_stats, current_user_id, remember_user_id, require_auth
+from chat_store import create_chat_store
+import migrations
+from danger import PhraseMatcher, load_phrases
+from lab_parser import extract_summary, save_upload_to_temp
+from pdf_analysis import analyze_pdf, format_pdf_reply, pdf_cache
+from batch_analysis import BatchAnalyzer, BatchTooLarge, collect_batch_files, summarize
+from jobs import JOB_RETRY, QueueFull, create_job_queue
+from response_cache import RESPONSE_CACHE_ENABLED, response_cache
+from profile_cache import profile_cache
+from context_builder import build_context
+from events import create_event_bus, question_channels
+from uploads import IMAGE_EXTENSIONS, UPLOAD_FOLDER, InvalidImage, UploadStore, UploadTooLarge
+from lifecycle import lifecycle
+import metrics
+from chat_lock import CHAT_LOCK_LEASE, CHAT_LOCK_WAIT, chat_lock_key, create_chat_lock
+from resilience import UpstreamUnavailable, bind_tenant, current_tenant
+from rate_limit import BACKGROUND_WEIGHT, rate_limited, rate_limiter
+from functools import partial
 
 
 load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
 JWT_SECRET = os.getenv("JWT_SECRET")
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# PostgreSQL bağlantısı
-conn = psycopg2.connect(
-    dbname=os.getenv("POSTGRES_DB"),
-    user=os.getenv("POSTGRES_USER"),
-    password=os.getenv("POSTGRES_PASSWORD"),
-    host=os.getenv("POSTGRES_HOST"),
-    port=os.getenv("POSTGRES_PORT")
-)
-cursor = conn.cursor()
-
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-CORS(app)
-
-API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+# Route'lar blueprint üzerinde; uygulama create_app() ile kurulur (bkz. wsgi.py)
+api = Blueprint("api", __name__)
 
 # -----------------------
 # Kullanıcı chat durumları
 # -----------------------
-# chat_history: { username: { chatId: [ {sender, text}, ... ] } }
-chat_history = {}
-# waiting_for_bot key: (username, chatId)
-waiting_for_bot = {}
+# chat_store: { username: { chatId: [ {seq, sender, text}, ... ] } } (bkz. chat_store.py)
+chat_store = create_chat_store(os.getenv("CHAT_STORE", "memory"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "100"))
+CHAT_PAGE_MAX = 500
+# Arka plan işleri (async PDF analizi); birden fazla worker'da durum için JOB_QUEUE=postgres
+job_queue = create_job_queue(os.getenv("JOB_QUEUE", "inprocess"))
+# Doktora Sor anlık bildirimleri (memory | postgres LISTEN/NOTIFY)
+event_bus = create_event_bus(os.getenv("EVENT_BUS", "memory"))
+EVENT_HEARTBEAT = int(os.getenv("EVENT_HEARTBEAT", "15"))
+# Her SSE aboneliği bir gthread thread'ini bağlantı süresince tutar; worker başına sınır
+# (varsayılan thread'lerin dörtte biri) chat/yükleme route'larına thread bırakır.
+# Sınırdaki istemci 503 + Retry-After alır (frontend arada listeyi yenileyip yeniden bağlanır).
+# Yüzlerce eşzamanlı panel için /events ayrı SSE havuzuna yönlendirilir; orada sınır
+# thread sayısına göre ayarlanır (bkz. gunicorn.events.conf.py)
+EVENT_MAX_SUBSCRIPTIONS = int(os.getenv("EVENT_MAX_SUBSCRIPTIONS",
+                                        str(max(1, int(os.getenv("GUNICORN_THREADS", "32")) // 4))))
+EVENT_RETRY_AFTER = int(os.getenv("EVENT_RETRY_AFTER", "15"))
+event_slots = threading.BoundedSemaphore(EVENT_MAX_SUBSCRIPTIONS)
+events_rejected = metrics.registry.counter(
+    "event_subscriptions_rejected_total", "Abonelik sınırı dolu olduğu için reddedilen /events bağlantıları")
+# Yüklemeler: içerik adresli, referans sayılı (bkz. uploads.py)
+upload_store = UploadStore()
+# Sohbet başına "bot cevaplıyor" kilidi (lease + sahip token'ı, bkz. chat_lock.py)
+chat_lock = create_chat_lock(os.getenv("CHAT_LOCK", "memory"))
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def page_args(default_limit=CHAT_PAGE_SIZE, max_limit=CHAT_PAGE_MAX):
+    # ?limit=&before=&after= parametrelerini sınırlandırarak okur
+    limit = request.args.get("limit", default_limit, type=int)
+    limit = max(1, min(limit, max_limit))
+    return limit, request.args.get("before", type=int), request.args.get("after", type=int)
+
+
 # -----------------------
-# Yardımcı fonksiyon: Token doğrulama
+# Yardımcı fonksiyon: SSE olayı
 # -----------------------
-def verify_token(auth_header):
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None, jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        return payload, None, None
-    except ExpiredSignatureError:
-        return None, jsonify({"error": "Token süresi dolmuş"}), 401
-    except InvalidTokenError:
-        return None, jsonify({"error": "Geçersiz token"}), 401
-    except Exception as e:
-        print("JWT Hatası:", e)
-        return None, jsonify({"error": "Token doğrulama hatası"}), 401
+def sse_event(data, event=None):
+    payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
+
+# -----------------------
+# Yardımcı fonksiyon: Koşullu GET (ETag)
+# -----------------------
+def not_modified(etag):
+    # If-None-Match eşleşirse satırlar okunmadan/serileştirilmeden 304 döner
+    if etag not in request.if_none_match:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def with_etag(response, etag, cursor=None):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = str(cursor)
+    return response
+
 # -----------------------
 # Danger kelimeler
 # -----------------------
@@ -74,108 +114,146 @@ danger_words = [
     "felç", "baş dönmesi", "nöbet", "astım krizi",
     "şiddetli karın ağrısı", "kusma", "kan kusmak", "şiddetli kanama",
     "intihar", "kendime zarar", "zehirlen", "allergik şok", "anafilaksi",
-    "kırık", "yanık", "boğulma", "düşme", "şok", "bilinç kaybı",
-    "kırıldı", "yanığı", "boğuldu", "düştü", "şoku", "bilinci kapandı"
+    "kırık", "yanık", "boğulma", "düşme", "şok$", "bilinç kaybı",
+    "kırıldı", "yanığı", "boğuldu", "düştü", "şoku$", "bilinci kapandı"
 ]
+# İfadeler kelime başında eşleşir, ekli biçimler de yakalanır ("kalp krizi" -> "kalp krizim");
+# sonda $ olanlar yalnızca tam kelime ("şok$": katlanınca "sokak" ile karışmasın)
+# Klinik onaylı geniş liste dosyadan yüklenebilir (satır başına bir ifade)
+if os.getenv("DANGER_WORDS_FILE"):
+    danger_words = load_phrases(os.getenv("DANGER_WORDS_FILE"))
+# Başlangıçta bir kez derlenir (Aho–Corasick, Türkçe normalizasyon)
+danger_matcher = PhraseMatcher(danger_words)
 
 # -----------------------
 # PDF yükleme ve analiz
 # -----------------------
-@app.route("/upload_pdf", methods=["POST"])
+@api.route("/upload_pdf", methods=["POST"])
+@require_auth
+@rate_limited("pdf")
 def upload_pdf():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-
-    token = auth_header.split(" ")[1]
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except ExpiredSignatureError:
-        return jsonify({"error": "Token süresi dolmuş"}), 401
-    except InvalidTokenError:
-        return jsonify({"error": "Geçersiz token"}), 401
+    username = g.username
 
     if 'pdf' not in request.files:
         return jsonify({"error": "PDF dosyası bulunamadı"}), 400
 
     pdf_file = request.files['pdf']
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-
-    text = "".join([page.get_text() for page in doc])
-
-    genel_ozet = "Genel değerlendirme yapılıyor..."
+    # Yükleme diske parça parça yazılır (SHA-256 ile), PDF sayfa sayfa ayrıştırılır
+    pdf_path, digest = save_upload_to_temp(pdf_file)
 
-    # Regex ile test sonuçlarını yakala
-    pattern = r"([A-Za-zçğıöşüÇĞİÖŞÜ ]+):\s*([\d.,]+)\s*(\w+/?.*)\s*\(Ref[:\-]?\s*([<>]?\d+[\-–]?\d*)\)?"
-    matches = re.findall(pattern, text)
-    referans_disi = []
-    for test, value, unit, ref in matches:
+    # Async mod: iş kuyruğa alınır, durum GET /jobs/<id> ile izlenir
+    if request.args.get("async") == "1":
         try:
-            value_num = float(value.replace(",", "."))
-            if "-" in ref:
-                low, high = map(float, ref.split("-"))
-                if value_num < low:
-                    referans_disi.append(f"{test.strip()} düşük ({value_num} {unit}, ref: {ref})")
-                elif value_num > high:
-                    referans_disi.append(f"{test.strip()} yüksek ({value_num} {unit}, ref: {ref})")
-            elif "<" in ref:
-                limit = float(ref.replace("<", ""))
-                if value_num >= limit:
-                    referans_disi.append(f"{test.strip()} yüksek ({value_num} {unit}, ref: {ref})")
-            elif ">" in ref:
-                limit = float(ref.replace(">", ""))
-                if value_num <= limit:
-                    referans_disi.append(f"{test.strip()} düşük ({value_num} {unit}, ref: {ref})")
-        except:
-            continue
-
-    # AI ile analiz
-    prompt = f"""
-Sen bir sağlık asistanısın. Kullanıcının tahlil raporunu inceledin.
-Görevlerin:
-1. Genel durumu 1-2 cümle ile özetle.
-2. Referans dışı değerleri listele (eğer varsa).
-3. Her referans dışı değer için kısa ve basit öneriler ver.
-4. Referans dışı değer yoksa böyle devam etmesi için önerilerde bulun.
-Rapor metni:
-{text[:3000]}
-
-Tahlil raporunda doktor var ise ona yönlendir yok ise Bizim Doktorlarımıza "Doktora'a Sor" Bölümünden danışabilirisiniz. benzeri bir ifade ekle.
-En sonda rapor sonucu ile ilgili öneri sorularda bulun.
-"""
+            job = job_queue.submit(username, run_pdf_job, username, pdf_file.filename, pdf_path, digest)
+        except QueueFull:
+            os.remove(pdf_path)
+            response = jsonify({"error": "Sunucu yoğun, lütfen biraz sonra tekrar deneyin"})
+            response.headers["Retry-After"] = "10"
+            return response, 503
+        return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
     try:
-        response = requests.post(
-            API_URL,
-            headers={"Content-Type": "application/json", "X-goog-api-key": API_KEY},
-            json={"contents": [{"parts": [{"text": prompt}]}]}
-        )
-        response.raise_for_status()
-        ai_reply = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+        analysis, cached = analyze_pdf(pdf_path, digest)
     except Exception as e:
-        ai_reply = " AI analizi yapılamadı."
-        print("PDF analiz hatası:", e)
+        print("PDF okuma hatası:", e)
+        return jsonify({"error": "PDF okunamadı"}), 400
+    finally:
+        os.remove(pdf_path)
 
-    bot_reply = genel_ozet
-    if referans_disi:
-        bot_reply += "\n\n Referans dışı değerler bulundu:\n- " + "\n- ".join(referans_disi)
-    else:
-        bot_reply += "\n Önemli değerler referans aralıklarında."
-    bot_reply += f"\n\nAI Önerisi:\n{ai_reply}"
+    bot_reply = format_pdf_reply(analysis)
+    save_pdf_messages(username, pdf_file.filename, bot_reply)
+
+    response = jsonify({"reply": bot_reply})
+    response.headers["X-Cache"] = "HIT" if cached else "MISS"
+    return response
 
+
+# -----------------------
+# Toplu PDF analizi (N dosya veya zip, NDJSON akış)
+# -----------------------
+# Her satır bir JSON: {"type": "item", "index", "filename", "status", ...}
+# bittikçe gönderilir; son satır {"type": "summary", ...}. Dosya hatası tüm
+# isteği düşürmez. ?save=0 ile sonuçlar sohbete yazılmaz.
+@api.route("/upload_pdf/batch", methods=["POST"])
+@require_auth
+@rate_limited("pdf_batch")
+def upload_pdf_batch():
+    username = g.username
+    save = request.args.get("save", "1") != "0"
+
+    files = [f for f in request.files.getlist("pdf") if f.filename]
+    if not files:
+        return jsonify({"error": "PDF dosyası bulunamadı"}), 400
+    try:
+        items = collect_batch_files(files)
+    except BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+
+    # Analizler havuz thread'lerinde: Gemini slot kuyruğu için kullanıcıya bağlanır
+    analyzer = BatchAnalyzer(job_queue.submit_in_process,
+                             bind_tenant(partial(gemini.generate, retry=JOB_RETRY), username, BACKGROUND_WEIGHT),
+                             job_queue.processes)
+
+    def generate():
+        started = time.perf_counter()
+        results = []
+        for result in analyzer.run(items):
+            if save and result["status"] == "done":
+                save_pdf_messages(username, result["filename"], result["reply"])
+            results.append(result)
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps(summarize(results, started), ensure_ascii=False) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def save_pdf_messages(username, filename, bot_reply):
     # PDF mesajlarını varsayılan sohbet 1'e yaz
-    user_chats = chat_history.setdefault(username, {})
-    if not user_chats:
-        user_chats[1] = []
-    user_chats[1].append({"sender": "user", "text": f"[PDF dosyası yüklendi] {pdf_file.filename}"})
-    user_chats[1].append({"sender": "bot", "text": f"[PDF Analizi]\n{bot_reply}"})
+    chat_store.ensure_default_chat(username)
+    chat_store.append(username, 1, "user", f"[PDF dosyası yüklendi] {filename}")
+    chat_store.append(username, 1, "bot", f"[PDF Analizi]\n{bot_reply}")
+
+
+def run_pdf_job(job, username, filename, pdf_path, digest):
+    # Worker thread'inde: çıkarma süreç havuzunda, Gemini çağrısı sabırlı deneme politikasıyla
+    def extract(path):
+        job.set_progress("extracting", 0.2)
+        result = job_queue.run_in_process(extract_summary, path)
+        job.set_progress("analyzing", 0.6)
+        return result
+
+    try:
+        analysis, cached = analyze_pdf(pdf_path, digest, extract=extract,
+                                       generate=bind_tenant(partial(gemini.generate, retry=JOB_RETRY),
+                                                            username, BACKGROUND_WEIGHT))
+    finally:
+        os.remove(pdf_path)
+    job.set_progress("saving", 0.9)
+    bot_reply = format_pdf_reply(analysis)
+    save_pdf_messages(username, filename, bot_reply)
+    return {"reply": bot_reply, "cached": cached}
+
+
+# -----------------------
+# Arka plan iş durumu
+# -----------------------
+@api.route("/jobs/<job_id>", methods=["GET"])
+@require_auth
+def get_job(job_id):
+    job = job_queue.get(job_id, owner=g.username)
+    if not job:
+        return jsonify({"error": "İş bulunamadı"}), 404
+    return jsonify(job.to_dict())
 
-    return jsonify({"reply": bot_reply})
 
 # -----------------------
 # Register
 # -----------------------
-@app.route("/register", methods=["POST"])
+@api.route("/register", methods=["POST"])
 def register():
     data = request.json
     username = data.get("username")
@@ -191,6 +269,8 @@ def register():
         return jsonify({"error": "Kullanıcı adı ve şifre boş olamaz"}), 400
 
     # Kullanıcı adı kontrolü
+    conn = db.get_db()
+    cursor = conn.cursor()
     cursor.execute("SELECT * FROM users WHERE username=%s", (username,))
     if cursor.fetchone():
         return jsonify({"error": "Kullanıcı zaten var"}), 400
@@ -217,16 +297,13 @@ def register():
 
     conn.commit()
 
-    chat_history[username] = []
-    waiting_for_bot[username] = False
-
     return jsonify({"message": "Kayıt başarılı", "role": role})
 
 
 # -----------------------
 # Login
 # -----------------------
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
 def login():
     data = request.json
     username = data.get("username")
@@ -235,8 +312,10 @@ def login():
     if not username or not password:
         return jsonify({"error": "Kullanıcı adı ve şifre boş olamaz"}), 400
 
+    conn = db.get_db()
+    cursor = conn.cursor()
     # role + firstname + lastname bilgilerini çekiyoruz
-    cursor.execute("SELECT password_hash, role, firstname, lastname FROM users WHERE username=%s", (username,))
+    cursor.execute("SELECT password_hash, role, firstname, lastname, id FROM users WHERE username=%s", (username,))
     row = cursor.fetchone()
     if not row or not check_password_hash(row[0], password):
         return jsonify({"error": "Kullanıcı adı veya şifre hatalı"}), 401
@@ -244,21 +323,19 @@ def login():
     role = row[1]
     firstname = row[2]
     lastname = row[3]
+    user_id = row[4]
+    remember_user_id(username, user_id)
 
+    # user_id token'da: korumalı route'lar kullanıcı id'si için DB'ye gitmez
     token = jwt.encode({
         "username": username,
         "role": role,
+        "user_id": user_id,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=2)
     }, JWT_SECRET, algorithm="HS256")
 
     # Kullanıcının chat yapısını garanti et (dict) ve varsayılan sohbeti oluştur
-    user_chats = chat_history.setdefault(username, {})
-    if not user_chats:
-        user_chats[1] = []
-    # Eski bekleme anahtarlarını temizle
-    for key in list(waiting_for_bot.keys()):
-        if isinstance(key, tuple) and key[0] == username:
-            waiting_for_bot.pop(key, None)
+    chat_store.ensure_default_chat(username)
 
     return jsonify({
         "token": token,
@@ -270,21 +347,13 @@ def login():
 # -----------------------
 # Profile GET/POST
 # -----------------------
-@app.route("/profile", methods=["GET", "POST"])
+@api.route("/profile", methods=["GET", "POST"])
+@require_auth
 def profile():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except ExpiredSignatureError:
-        return jsonify({"error": "Token süresi dolmuş"}), 401
-    except InvalidTokenError:
-        return jsonify({"error": "Geçersiz token"}), 401
+    username = g.username
 
+    conn = db.get_db()
+    cursor = conn.cursor()
     if request.method == "GET":
         cursor.execute(
             "SELECT username, firstname, lastname, gender, age, height, weight, chronic, avatar FROM users WHERE username=%s",
@@ -294,8 +363,7 @@ def profile():
         if not row:
             return jsonify({"error": "Kullanıcı bulunamadı"}), 404
 
-        avatar_filename = row[8]
-        avatar_url = f"http://127.0.0.1:5000/uploads/{avatar_filename}" if avatar_filename else ""
+        avatar_url = upload_store.avatar_url(row[8])
 
         return jsonify({
             "username": row[0],
@@ -333,102 +401,83 @@ def profile():
         )
     )
     conn.commit()
+    profile_cache.invalidate(username)
     return jsonify({"message": "Profil güncellendi"})
 
 # -----------------------
 # Avatar yükleme
 # -----------------------
-@app.route("/profile/avatar", methods=["POST"])
+@api.route("/profile/avatar", methods=["POST"])
+@require_auth
 def upload_avatar():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
+    username = g.username
 
     if "avatar" not in request.files:
         return jsonify({"error": "Dosya yok"}), 400
 
     file = request.files["avatar"]
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(file_path)
+    if not file.filename or file.filename.rsplit(".", 1)[-1].lower() not in IMAGE_EXTENSIONS:
+        return jsonify({"error": "Yalnızca PNG veya JPEG yüklenebilir"}), 400
 
-    cursor.execute("UPDATE users SET avatar = %s WHERE username = %s", (filename, username))
+    conn = db.get_db()
+    cursor = conn.cursor()
+    # Küçük resim yükleme anında bir kez üretilir; eski avatarın referansı bırakılır
+    try:
+        avatar = upload_store.save(cursor, file, thumbnail=True)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except InvalidImage:
+        conn.rollback()
+        return jsonify({"error": "Resim okunamadı"}), 400
+    cursor.execute("SELECT avatar FROM users WHERE username = %s FOR UPDATE", (username,))
+    previous = cursor.fetchone()
+    cursor.execute("UPDATE users SET avatar = %s WHERE username = %s", (avatar, username))
+    if previous and previous[0] != avatar:
+        upload_store.release(cursor, previous[0])
     conn.commit()
+    upload_store.collect_garbage(conn)
 
-    return jsonify({"avatar": f"http://127.0.0.1:5000/uploads/{filename}"}), 200
+    return jsonify({"avatar": upload_store.avatar_url(avatar)}), 200
 
 # -----------------------
 # Upload klasöründen dosya serve
 # -----------------------
-@app.route("/uploads/<filename>")
+@api.route("/uploads/<path:filename>")
 def serve_uploads(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return upload_store.send(filename)
 
 
 # -----------------------
 # Kullanıcının chatleri (sidebar)
 # -----------------------
-@app.route("/chats", methods=["GET"])
+@api.route("/chats", methods=["GET"])
+@require_auth
 def get_chats():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
+    username = g.username
 
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
-
-    # Kullanıcının chatlerini al (dict beklenir)
-    user_chats = chat_history.get(username, {})
-    # Her sohbet için başlığı ilk kullanıcı mesajından türet
-    result = []
-    for cid in sorted(user_chats.keys()):
-        messages = user_chats.get(cid, [])
-        derived_title = None
-        for msg in messages:
-            if msg.get("sender") == "user" and msg.get("text"):
-                # İlk satırı al, çok uzunsa kısalt
-                first_line = msg["text"].strip().split("\n", 1)[0]
-                trimmed = first_line[:50]
-                derived_title = trimmed + ("..." if len(first_line) > 50 else "")
-                break
-        if not derived_title:
-            derived_title = f"Sohbet {cid}"
-        result.append({"chatId": cid, "title": derived_title})
+    # Başlık, son aktivite ve mesaj sayısı sohbet metadatasından gelir (mesajlar taranmaz)
+    limit = max(1, min(request.args.get("limit", CHAT_PAGE_SIZE, type=int), CHAT_PAGE_MAX))
+    after = request.args.get("after", 0, type=int)
+    chats = chat_store.list_chats(username, limit=limit, after=after)
 
-    return jsonify(result)
+    response = jsonify(chats)
+    if len(chats) == limit:
+        response.headers["X-Next-Cursor"] = str(chats[-1]["chatId"])
+    # Değişmeyen liste için 304 (If-None-Match); tarayıcı her seferinde doğrular
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 # -----------------------
 # Yeni chat oluştur
 # -----------------------
-@app.route("/chats", methods=["POST"])
+@api.route("/chats", methods=["POST"])
+@require_auth
 def create_chat():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
+    username = g.username
 
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
-
-    user_chats = chat_history.setdefault(username, {})
-    new_chat_id = max(user_chats.keys(), default=0) + 1
-    user_chats[new_chat_id] = []
-    waiting_for_bot[(username, new_chat_id)] = False
+    new_chat_id = chat_store.create_chat(username)
 
     return jsonify({"chatId": new_chat_id, "title": f"Sohbet {new_chat_id}"})
 
@@ -436,97 +485,100 @@ def create_chat():
 # -----------------------
 # Chat mesajlarını getir
 # -----------------------
-@app.route("/chats/<int:chat_id>/messages", methods=["GET"])
+@api.route("/chats/<int:chat_id>/messages", methods=["GET"])
+@require_auth
 def get_chat_messages(chat_id):
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
+    username = g.username
 
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
-
-    messages = chat_history.get(username, {}).get(chat_id, [])
-    return jsonify(messages)
+    # Varsayılan: en yeni sayfa; daha eskisi için ?before=<X-Next-Cursor>
+    limit, before, after = page_args()
+    messages = chat_store.get_messages(username, chat_id, limit=limit, before=before, after=after)
+    response = jsonify(messages)
+    if after is None and messages and messages[0]["seq"] > 1:
+        response.headers["X-Next-Cursor"] = str(messages[0]["seq"])
+    elif after is not None and len(messages) == limit:
+        response.headers["X-Next-Cursor"] = str(messages[-1]["seq"])
+    return response
 
 
 # -----------------------
 # Chat endpoint (mesaj gönderme + AI cevap)
 # -----------------------
-@app.route("/chat/<int:chatid>", methods=["POST", "OPTIONS"])
+# Gemini'ye ulaşılamıyorsa (devre açık / denemeler ve süre bütçesi tükendi) dönen
+# hazır cevap: istek zaman aşımını beklemeden biter, kullanıcı acil durumda yönlendirilir
+UNAVAILABLE_REPLY = (
+    "⚠️ Asistan şu anda yanıt veremiyor, lütfen birkaç dakika sonra tekrar deneyin. "
+    "Göğüs ağrısı, nefes darlığı, bayılma gibi acil bir durumunuz varsa hemen 112'yi arayın; "
+    "acil olmayan sorularınızı Doktor'a Sor bölümünden bir doktorumuza iletebilirsiniz."
+)
+
+@api.route("/chat/<int:chatid>", methods=["POST", "OPTIONS"])
+@require_auth
+@rate_limited("chat")
 def chat(chatid):
     # OPTIONS isteği için CORS
     if request.method == "OPTIONS":
-        response = app.make_response("")
+        response = current_app.make_response("")
         response.headers["Access-Control-Allow-Origin"] = "*"
         response.headers["Access-Control-Allow-Methods"] = "POST, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
         return response, 200
 
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except ExpiredSignatureError:
-        return jsonify({"error": "Token süresi dolmuş"}), 401
-    except InvalidTokenError:
-        return jsonify({"error": "Geçersiz token"}), 401
-
-    # Chat ID bazlı mesaj bekleme kontrolü
-    if waiting_for_bot.get((username, chatid), False):
-        return jsonify({"error": "Bot cevabı gelmeden yeni mesaj gönderemezsiniz"}), 400
+    username = g.username
 
     data = request.json
     user_message = data.get("message", "").strip()
     if not user_message:
         return jsonify({"error": "Mesaj boş olamaz"}), 400
 
-    user_chats = chat_history.setdefault(username, {})
-    user_chat = user_chats.setdefault(chatid, [])
-    user_chat.append({"sender": "user", "text": user_message})
+    # Chat ID bazlı mesaj bekleme kontrolü: kilit her durumda bırakılır (hata dahil);
+    # akışta kilit generator'a devredilir. Sahip çökerse lease süresi sonunda düşer.
+    lease = chat_lock.acquire(chat_lock_key(username, chatid), wait=CHAT_LOCK_WAIT)
+    if lease is None:
+        response = jsonify({"error": "Bot cevabı gelmeden yeni mesaj gönderemezsiniz"})
+        response.headers["Retry-After"] = "2"
+        return response, 409
+    try:
+        response = answer_chat(username, chatid, user_message, lease)
+    except BaseException:
+        chat_lock.release(lease)
+        raise
+    if response.is_streamed:
+        # Generator hiç çalışmadan kapanırsa (istemci koptu) da bırakılsın
+        response.call_on_close(lambda: chat_lock.release(lease))
+    else:
+        chat_lock.release(lease)
+    return response
 
-    waiting_for_bot[(username, chatid)] = True
 
-    # Profil ve ekstra info
-    cursor.execute("SELECT age, height, weight, chronic, gender FROM users WHERE username=%s", (username,))
-    row = cursor.fetchone()
-    extra_info = ""
-    if row:
-        age, height, weight, chronic, gender = row
-        if height and weight:
-            try:
-                height_m = float(height) / 100
-                bmi = float(weight) / (height_m ** 2)
-                if bmi >= 32.5:
-                    extra_info += "Kullanıcının fazla kilo durumu var. "    
-                elif bmi >= 25:
-                    extra_info += "Kullanıcı biraz kilolu. "
-                elif bmi < 18.5:
-                    extra_info += "Kullanıcı zayıf. "
-            except:
-                pass
-        if chronic:
-            extra_info += f"Kullanıcının kronik hastalıkları: {chronic}. "
-        if age:
-            extra_info += f"Kullanıcının yaşı: {age}. "  
-        if gender:
-            extra_info += f"Cinsiyeti: {gender}."
+def answer_chat(username, chatid, user_message, lease):
+    chat_store.append(username, chatid, "user", user_message)
+
+    # Prompt hazırlığı (profil + geçmiş + prompt metni) "prompt" aşaması olarak ölçülür
+    prompt_started = time.perf_counter()
+
+    # Profil ve ekstra info (önbellekten; /profile POST geçersiz kılar)
+    profile_context = profile_cache.get(username)
+    extra_info = profile_context.extra_info
 
     # Tehlikeli kelime kontrolü
-    is_danger = any(word in user_message.lower() for word in danger_words)
+    danger_matches = danger_matcher.find_all(user_message)
+    is_danger = bool(danger_matches)
+    if is_danger:
+        print("Tehlikeli ifade:", [m.phrase for m in danger_matches])
     bot_reply = ""
     if is_danger:
         bot_reply += "⚠️ Bu ciddi bir durum olabilir. Lütfen 112'yi arayın veya en yakın acile gidin.\n\n"
 
     # AI cevabı
-    history_text = "".join([f"{m['sender'].capitalize()}: {m['text']}\n" for m in user_chat[-10:]])
+    # Token bütçeli geçmiş: son turlar + eski turların özeti (bkz. context_builder.py)
+    context = build_context(chat_store, username, chatid)
+    history_text = context.history_text
+
+    # Cevap önbelleği (opsiyonel): yalnızca geçmişi olmayan bağımsız sorular
+    cache_bucket = profile_context.bucket
+    use_cache = RESPONSE_CACHE_ENABLED and context.turns == 1 and not context.summary
+    cached_reply = response_cache.get(user_message, cache_bucket) if use_cache else None
     prompt = f"""
     Sen bir güvenli, kısa ve pratik sağlık asistanısın. Aşağıdaki girdileri kullanarak açık, kullanıcı dostu ve eyleme geçirilebilir bir yanıt üret:
 
@@ -552,43 +604,103 @@ def chat(chatid):
 
     Çıktı sadece düz metin olmalı; kod, JSON veya uzun literatür alıntısı ekleme.
     """
-
-    try:
-        response = requests.post(
-            API_URL,
-            headers={"Content-Type": "application/json", "X-goog-api-key": API_KEY},
-            json={"contents": [{"parts": [{"text": prompt}]}]}
+    metrics.observe_stage("prompt", time.perf_counter() - prompt_started)
+
+    # Streaming modu: ?stream=1 veya Accept: text/event-stream
+    if request.args.get("stream") == "1" or "text/event-stream" in request.headers.get("Accept", ""):
+        # Akış süresince DB bağlantısını tutma
+        db.release_db()
+        # Generator view döndükten sonra çalışır (rate_limited context'i geri almış olur);
+        # Gemini slot kuyruğu için kullanıcı akış boyunca yeniden bağlanır
+        tenant = current_tenant.get()
+
+        def generate():
+            parts = []
+            tenant_token = current_tenant.set(tenant)
+            try:
+                if bot_reply:
+                    yield sse_event({"text": bot_reply}, "banner")
+                if cached_reply:
+                    parts.append(cached_reply)
+                    yield sse_event({"text": cached_reply})
+                else:
+                    started = time.perf_counter()
+                    renew_at = time.monotonic() + CHAT_LOCK_LEASE / 3
+                    for text in gemini.stream(prompt):
+                        parts.append(text)
+                        yield sse_event({"text": text})
+                        if time.monotonic() > renew_at:
+                            chat_lock.renew(lease)
+                            renew_at = time.monotonic() + CHAT_LOCK_LEASE / 3
+                    if use_cache and parts:
+                        response_cache.put(user_message, cache_bucket, "".join(parts),
+                                           time.perf_counter() - started)
+            except UpstreamUnavailable as e:
+                print("Gemini kullanılamıyor (stream):", e)
+                if not parts:
+                    parts.append(UNAVAILABLE_REPLY)
+                    yield sse_event({"text": parts[0]}, "fallback")
+            except Exception as e:
+                print("API Hatası (stream):", e)
+                if not parts:
+                    parts.append("⚠️ Bot cevabı alınamadı.")
+                    yield sse_event({"text": parts[0]})
+            finally:
+                current_tenant.reset(tenant_token)
+                # Bağlantı koparsa da geçmiş yazılır ve bekleme kilidi kalkar
+                full_reply = bot_reply + "".join(parts)
+                try:
+                    chat_store.append(username, chatid, "bot", full_reply)
+                finally:
+                    chat_lock.release(lease)
+            yield sse_event({"reply": full_reply}, "done")
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
-        response.raise_for_status()
-        ai_reply = response.json()["candidates"][0]["content"]["parts"][0]["text"]
-    except Exception as e:
-        ai_reply = "⚠️ Bot cevabı alınamadı."
-        print("API Hatası:", e)
 
+    fallback = None
+    if cached_reply:
+        ai_reply = cached_reply
+    else:
+        # Gemini beklenirken (deadline + tekrar denemeler) DB bağlantısını tutma; sonraki
+        # chat_store yazımları db.connection() ile kısa ömürlü bağlantı alır
+        db.release_db()
+        try:
+            started = time.perf_counter()
+            ai_reply = gemini.generate(prompt)
+            if use_cache:
+                response_cache.put(user_message, cache_bucket, ai_reply, time.perf_counter() - started)
+        except UpstreamUnavailable as e:
+            ai_reply, fallback = UNAVAILABLE_REPLY, "unavailable"
+            print("Gemini kullanılamıyor:", e)
+        except Exception as e:
+            ai_reply, fallback = "⚠️ Bot cevabı alınamadı.", "error"
+            print("API Hatası:", e)
+
+    # Tehlike uyarısı önbellekten gelen cevaba da eklenir
     bot_reply += ai_reply
-    user_chat.append({"sender": "bot", "text": bot_reply})
-
-    waiting_for_bot[(username, chatid)] = False
+    chat_store.append(username, chatid, "bot", bot_reply)
 
-    return jsonify({"reply": bot_reply})
+    response = jsonify({"reply": bot_reply})
+    response.headers["X-Cache"] = "HIT" if cached_reply else "MISS"
+    if fallback:
+        response.headers["X-Fallback"] = fallback
+    return response
 
 
 # -----------------------
 # Appointments GET/POST/DELETE
 # -----------------------
-@app.route("/appointments", methods=["GET", "POST"])
+@api.route("/appointments", methods=["GET", "POST"])
+@require_auth
 def appointments():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
+    username = g.username
 
+    conn = db.get_db()
+    cursor = conn.cursor()
     if request.method == "GET":
         cursor.execute("SELECT id, title, datetime FROM appointments WHERE username=%s ORDER BY datetime", (username,))
         rows = cursor.fetchall()
@@ -613,19 +725,13 @@ def appointments():
 
     return jsonify({"id": appointment_id, "title": title, "datetime": dt.isoformat(), "message": "Randevu eklendi"})
 
-@app.route("/appointments/<int:appt_id>", methods=["DELETE"])
+@api.route("/appointments/<int:appt_id>", methods=["DELETE"])
+@require_auth
 def delete_appointment(appt_id):
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
+    username = g.username
 
+    conn = db.get_db()
+    cursor = conn.cursor()
     cursor.execute("DELETE FROM appointments WHERE id=%s AND username=%s RETURNING id", (appt_id, username))
     deleted = cursor.fetchone()
     conn.commit()
@@ -638,43 +744,36 @@ def delete_appointment(appt_id):
 # -----------------------
 # Chat history
 # -----------------------
-@app.route("/history", methods=["GET"])
+@api.route("/history", methods=["GET"])
+@require_auth
 def history():
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
+    username = g.username
 
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except ExpiredSignatureError:
-        return jsonify({"error": "Token süresi dolmuş"}), 401
-    except InvalidTokenError:
-        return jsonify({"error": "Geçersiz token"}), 401
+    # Sınırlı okuma: sayfa başına en fazla `limit` sohbet, sohbet başına son `messages` mesaj
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    per_chat = max(1, min(request.args.get("messages", 20, type=int), CHAT_PAGE_MAX))
+    after = request.args.get("after", 0, type=int)
 
-    return jsonify(chat_history.get(username, []))
+    chats = chat_store.list_chats(username, limit=limit + 1, after=after)
+    page = [c["chatId"] for c in chats[:limit]]
+    response = jsonify({cid: chat_store.get_messages(username, cid, limit=per_chat) for cid in page})
+    if len(chats) > limit:
+        response.headers["X-Next-Cursor"] = str(page[-1])
+    return response
 
 # -----------------------
 # Doktora soru sorma (kullanıcı yeni soru)
 # -----------------------
-@app.route("/doctor-questions", methods=["GET", "POST"])
+@api.route("/doctor-questions", methods=["GET", "POST"])
+@require_auth
 def doctor_questions():
-    payload, error_response, status = verify_token(request.headers.get("Authorization"))
-    if error_response:
-        return error_response, status
-
+    conn = db.get_db()
     cursor = conn.cursor()
 
     if request.method == "POST":
-        user_id = payload.get("user_id")
-        username = payload.get("username")
+        user_id = current_user_id()
         if not user_id:
-            cursor.execute("SELECT id FROM users WHERE username=%s", (username,))
-            row = cursor.fetchone()
-            if not row:
-                return jsonify({"error": "Kullanıcı bulunamadı"}), 404
-            user_id = row[0]
+            return jsonify({"error": "Kullanıcı bulunamadı"}), 404
 
         if request.content_type.startswith("multipart/form-data"):
             subject = request.form.get("subject")
@@ -690,60 +789,72 @@ def doctor_questions():
 
         file_url = None
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            file_url = f"http://127.0.0.1:5000/uploads/{filename}"
+            try:
+                file_url = upload_store.url(upload_store.save(cursor, file))
+            except UploadTooLarge as e:
+                return jsonify({"error": str(e)}), 413
 
         # question insert
         cursor.execute(
             """
-            INSERT INTO doctor_questions (user_id, doctor_id, subject, status, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
+            INSERT INTO doctor_questions (user_id, doctor_id, subject, status, first_user_message, created_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
             RETURNING id
             """,
-            (user_id, doctor_id, subject, "pending")
+            (user_id, doctor_id, subject, "pending", message)
         )
         question_id = cursor.fetchone()[0]
 
         # first message insert
         cursor.execute(
-            "INSERT INTO doctor_messages (question_id, sender, message, file_url, created_at) VALUES (%s, %s, %s, %s, NOW())",
+            "INSERT INTO doctor_messages (question_id, sender, message, file_url, created_at) VALUES (%s, %s, %s, %s, NOW()) RETURNING id",
             (question_id, "user", message, file_url)
         )
+        cursor.execute(
+            "UPDATE doctor_questions SET last_message_id=%s WHERE id=%s",
+            (cursor.fetchone()[0], question_id)
+        )
 
         conn.commit()
+        event_bus.publish(
+            question_channels(user_id, doctor_id),
+            {"type": "question", "question_id": question_id, "status": "pending"},
+            conn
+        )
         return jsonify({"message": "Soru oluşturuldu", "question_id": question_id}), 201
 
     elif request.method == "GET":
-        if payload.get("role") != "doctor":
+        if g.role != "doctor":
             return jsonify({"error": "Yetkisiz"}), 403
 
-        # Token içinde user_id yoksa DB’den al
-        doctor_id = payload.get("user_id")
+        doctor_id = current_user_id()
         if not doctor_id:
-            cursor.execute("SELECT id FROM users WHERE username=%s", (payload.get("username"),))
-            row = cursor.fetchone()
-            if not row:
-                return jsonify({"error": "Kullanıcı bulunamadı"}), 404
-            doctor_id = row[0]
-
-        print("Doctor ID:", doctor_id)  # debug
+            return jsonify({"error": "Kullanıcı bulunamadı"}), 404
 
-        cursor.execute("""
+        # İlk kullanıcı mesajı / son doktor cevabı add_message'ın güncellediği
+        # sütunlardan okunur (soru başına alt sorgu yok). Keyset sayfalama:
+        # ?before=<X-Next-Cursor> (created_at, id) sırasında devam eder.
+        limit, before, _ = page_args()
+        keyset = ""
+        params = [doctor_id]
+        if before is not None:
+            keyset = "AND (q.created_at, q.id) < (SELECT created_at, id FROM doctor_questions WHERE id = %s)"
+            params.append(before)
+        cursor.execute(f"""
             SELECT 
                 q.id,
                 q.subject,
                 u.username AS user_name,
                 u.gender,
                 q.status,
-                (SELECT message FROM doctor_messages WHERE question_id=q.id AND sender='user' ORDER BY created_at ASC LIMIT 1) AS user_message,
-                (SELECT message FROM doctor_messages WHERE question_id=q.id AND sender='doctor' ORDER BY created_at DESC LIMIT 1) AS doctor_reply
+                q.first_user_message AS user_message,
+                q.last_doctor_reply AS doctor_reply
             FROM doctor_questions q
             JOIN users u ON q.user_id = u.id
-            WHERE q.doctor_id = %s
-            ORDER BY q.created_at DESC
-        """, (doctor_id,))
+            WHERE q.doctor_id = %s {keyset}
+            ORDER BY q.created_at DESC, q.id DESC
+            LIMIT %s
+        """, (*params, limit))
 
         questions = cursor.fetchall()
         result = [
@@ -757,40 +868,56 @@ def doctor_questions():
                 "doctor_reply": q[6]
             } for q in questions
         ]
-        return jsonify(result)
+        response = jsonify(result)
+        if len(questions) == limit:
+            response.headers["X-Next-Cursor"] = str(questions[-1][0])
+        return response
 
 
 # -----------------------
 # Doktor veya kullanıcı cevabı
 # -----------------------
-@app.route("/doctor-question/<int:question_id>/messages", methods=["POST"])
+@api.route("/doctor-question/<int:question_id>/messages", methods=["POST"])
+@require_auth
 def add_message(question_id):
-    payload, error_response, status = verify_token(request.headers.get("Authorization"))
-    if error_response:
-        return error_response, status
-
-    role = payload.get("role", "user")
-    sender = "doctor" if role == "doctor" else "user"
+    sender = "doctor" if g.role == "doctor" else "user"
 
     message = request.form.get("message", "")
     file = request.files.get("file")
     file_url = None
 
+    conn = db.get_db()
+    cursor = conn.cursor()
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        file_url = f"http://127.0.0.1:5000/uploads/{filename}"
-
+        try:
+            file_url = upload_store.url(upload_store.save(cursor, file))
+        except UploadTooLarge as e:
+            return jsonify({"error": str(e)}), 413
     cursor.execute(
-        "INSERT INTO doctor_messages (question_id, sender, message, file_url, created_at) VALUES (%s, %s, %s, %s, NOW())",
+        "INSERT INTO doctor_messages (question_id, sender, message, file_url, created_at) VALUES (%s, %s, %s, %s, NOW()) RETURNING id",
         (question_id, sender, message, file_url)
     )
+    message_id = cursor.fetchone()[0]
 
     status_update = "answered" if sender == "doctor" else "pending"
-    cursor.execute("UPDATE doctor_questions SET status=%s WHERE id=%s", (status_update, question_id))
+    # Doktor gelen kutusu için özet sütunlar (bkz. migration 003_doctor_inbox)
+    summary = "last_doctor_reply = %s" if sender == "doctor" else "first_user_message = COALESCE(first_user_message, %s)"
+    cursor.execute(
+        f"""
+        UPDATE doctor_questions SET status=%s, {summary}, last_message_id=%s, updated_at=NOW()
+        WHERE id=%s RETURNING user_id, doctor_id
+        """,
+        (status_update, message, message_id, question_id)
+    )
+    owners = cursor.fetchone()
 
     conn.commit()
+    if owners:
+        event_bus.publish(
+            question_channels(*owners),
+            {"type": "message", "question_id": question_id, "sender": sender, "status": status_update},
+            conn
+        )
     return jsonify({"message": "Mesaj eklendi", "file_url": file_url}), 201
 
 
@@ -798,23 +925,27 @@ def add_message(question_id):
 # -----------------------
 # Doktor soruyu kapatma
 # -----------------------
-@app.route("/doctor-questions/<int:question_id>/close", methods=["POST"])
+@api.route("/doctor-questions/<int:question_id>/close", methods=["POST"])
+@require_auth
 def close_doctor_question(question_id):
-    payload, error_response, status = verify_token(request.headers.get("Authorization"))
-    if error_response:
-        return error_response, status
-
-    if payload.get("role") != "doctor":
+    if g.role != "doctor":
         return jsonify({"error": "Yetkisiz işlem"}), 403
 
+    conn = db.get_db()
+    cursor = conn.cursor()
     cursor.execute(
-        "UPDATE doctor_questions SET status='closed' WHERE id=%s RETURNING id",
+        "UPDATE doctor_questions SET status='closed', updated_at=NOW() WHERE id=%s RETURNING user_id, doctor_id",
         (question_id,)
     )
     updated = cursor.fetchone()
     conn.commit()
 
     if updated:
+        event_bus.publish(
+            question_channels(*updated),
+            {"type": "status", "question_id": question_id, "status": "closed"},
+            conn
+        )
         return jsonify({"message": "Soru kapatıldı", "question_id": question_id, "status": "closed"}), 200
     else:
         return jsonify({"error": "Soru bulunamadı"}), 404
@@ -823,23 +954,27 @@ def close_doctor_question(question_id):
 # -----------------------
 # Doktor paneli: tüm sorular
 # -----------------------
-@app.route("/doctor-question/<int:question_id>/messages", methods=["GET"])
+@api.route("/doctor-question/<int:question_id>/messages", methods=["GET"])
+@require_auth
 def get_messages(question_id):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        return jsonify({"error": "Token gerekli"}), 401
-
-    token = auth_header.split(" ")[1]
-    try:
-        jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-    except Exception as e:
-        print("JWT Hatası:", e)
-        return jsonify({"error": "Geçersiz token"}), 401
-
+    conn = db.get_db()
     cursor = conn.cursor()
+    # Sürüm: sorunun son mesaj id'si (add_message günceller); değişmediyse 304
+    cursor.execute("SELECT last_message_id FROM doctor_questions WHERE id=%s", (question_id,))
+    row = cursor.fetchone()
+    last_message_id = row[0] if row else None
+    etag = f"q{question_id}-m{last_message_id}"
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    # ?since=<X-Next-Cursor>: yalnızca bu id'den sonraki mesajlar
+    since = request.args.get("since", type=int)
+    if since is not None and last_message_id is not None and since >= last_message_id:
+        return with_etag(jsonify([]), etag, since)
     cursor.execute(
-        "SELECT id, sender, message, file_url, created_at FROM doctor_messages WHERE question_id=%s ORDER BY created_at ASC",
-        (question_id,)
+        "SELECT id, sender, message, file_url, created_at FROM doctor_messages WHERE question_id=%s AND id > %s ORDER BY id ASC",
+        (question_id, since or 0)
     )
     messages = cursor.fetchall()
 
@@ -854,39 +989,54 @@ def get_messages(question_id):
         for m in messages
     ]
 
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, messages[-1][0] if messages else since or 0)
 
 
 # -----------------------
 # Kullanıcı paneli: kendi soruları
 # -----------------------
-@app.route("/my-questions", methods=["GET"])
+@api.route("/my-questions", methods=["GET"])
+@require_auth
 def get_my_questions():
-    payload, error_response, status = verify_token(request.headers.get("Authorization"))
-    if error_response:
-        return error_response, status
-
-    username = payload.get("username")
-    if not username:
-        return jsonify({"error": "Token içinde username yok"}), 401
-
-    cursor.execute("SELECT id FROM users WHERE username=%s", (username,))
-    row = cursor.fetchone()
-    if not row:
+    user_id = current_user_id()
+    if not user_id:
         return jsonify({"error": "Kullanıcı bulunamadı"}), 404
-    user_id = row[0]
 
+    conn = db.get_db()
+    cursor = conn.cursor()
+
+    # Sürüm: kullanıcının sorularındaki en büyük version (migration 009). Her yazma
+    # (yeni soru, mesaj, kapatma, silme) trigger ile kullanıcı sayacını artırır ve
+    # sürümler commit sırasıyla görünür; tamsayı karşılaştırma hassasiyet kaybetmez.
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM doctor_questions WHERE user_id = %s", (user_id,))
+    version = cursor.fetchone()[0]
+    etag = f"u{user_id}-v{version}"
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    # ?since=<X-Next-Cursor>: yalnızca sonra değişen sorular (silinenler "deleted": true).
+    # Bilinen sürümden büyük imleç (ör. eski zaman damgası imleçleri) tam listeyle yenilenir.
+    since = request.args.get("since", type=int)
+    if since is not None and since > version:
+        since = 0
+    if since is None:
+        delta = "AND q.user_deleted = FALSE"
+        params = (user_id,)
+    else:
+        delta = "AND q.version > %s"
+        params = (user_id, since)
     cursor.execute(
-        """
+        f"""
         SELECT 
             q.id, q.subject, q.message, q.doctor_reply, q.user_reply, q.status, q.created_at,
-            d.id AS doctor_id, d.firstname, d.lastname, d.specialization
+            d.id AS doctor_id, d.firstname, d.lastname, d.specialization, q.user_deleted
         FROM doctor_questions q
         LEFT JOIN users d ON q.doctor_id = d.id
-        WHERE q.user_id = %s AND q.user_deleted = FALSE
+        WHERE q.user_id = %s {delta}
         ORDER BY q.created_at DESC
         """,
-        (user_id,)
+        params
     )
     questions = cursor.fetchall()
 
@@ -905,33 +1055,25 @@ def get_my_questions():
                 "firstname": q[8],
                 "lastname": q[9],
                 "specialization": q[10]
-            } if q[7] else None
+            } if q[7] else None,
+            **({"deleted": q[11]} if since is not None else {})
         })
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, version)
 
 
-@app.route("/my-questions/<int:question_id>", methods=["DELETE"])
+@api.route("/my-questions/<int:question_id>", methods=["DELETE"])
+@require_auth
 def delete_my_question(question_id):
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Token eksik"}), 401
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        username = decoded["username"]
-    except:
-        return jsonify({"error": "Geçersiz token"}), 401
-
-    cursor.execute("SELECT id FROM users WHERE username=%s", (username,))
-    row = cursor.fetchone()
-    if not row:
+    user_id = current_user_id()
+    if not user_id:
         return jsonify({"error": "Kullanıcı bulunamadı"}), 404
-    user_id = row[0]
+
+    conn = db.get_db()
+    cursor = conn.cursor()
 
     # Hard delete yerine soft delete
     cursor.execute(
-        "UPDATE doctor_questions SET user_deleted = TRUE WHERE id=%s AND user_id=%s RETURNING id",
+        "UPDATE doctor_questions SET user_deleted = TRUE, updated_at = NOW() WHERE id=%s AND user_id=%s RETURNING id",
         (question_id, user_id)
     )
     updated = cursor.fetchone()
@@ -944,11 +1086,69 @@ def delete_my_question(question_id):
 
 
 
+# -----------------------
+# Doktora Sor anlık bildirimleri (SSE)
+# -----------------------
+# EventSource header gönderemediği için token ?token= ile de kabul edilir
+# (require_auth(allow_query_token=True)).
+# Polling yerine: istemci açılışta listeyi bir kez çeker, sonra yalnızca
+# olay gelen soruyu yeniden çeker. Akış boyunca DB bağlantısı tutulmaz.
+@api.route("/events", methods=["GET"])
+@require_auth(allow_query_token=True)
+def doctor_events():
+    user_id = current_user_id()
+    if not user_id:
+        return jsonify({"error": "Kullanıcı bulunamadı"}), 404
+    channel = f"doctor:{user_id}" if g.role == "doctor" else f"user:{user_id}"
+    db.release_db()
+
+    if not event_slots.acquire(blocking=False):
+        events_rejected.inc()
+        response = jsonify({"error": "Anlık bildirim bağlantı sınırı dolu"})
+        response.headers["Retry-After"] = str(EVENT_RETRY_AFTER)
+        return response, 503
+    try:
+        subscription = event_bus.subscribe([channel])
+    except BaseException:
+        event_slots.release()
+        raise
+
+    def generate():
+        try:
+            yield sse_event({"channel": channel}, "ready")
+            while True:
+                event = subscription.get(timeout=EVENT_HEARTBEAT)
+                if lifecycle.draining:
+                    # Worker kapanıyor: EventSource başka worker'a yeniden bağlanır
+                    yield sse_event({}, "reconnect")
+                    return
+                if event is None:
+                    # Proxy'lerin boş bağlantıyı kapatmaması için yorum satırı
+                    yield ": ping\n\n"
+                else:
+                    yield sse_event(event, event["type"])
+        finally:
+            subscription.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Akış bitince veya generator hiç çalışmadan istemci koparsa da abonelik ve slot bırakılır
+    def close_stream():
+        subscription.close()
+        event_slots.release()
+    response.call_on_close(close_stream)
+    return response
+
+
 # -----------------------
 # doktor seçme
 # -----------------------
-@app.route("/doctors", methods=["GET"])
+@api.route("/doctors", methods=["GET"])
 def get_doctors():
+    conn = db.get_db()
     cursor = conn.cursor()
     cursor.execute("SELECT id, firstname, lastname, specialization FROM users WHERE role='doctor'")
     doctors = cursor.fetchall()
@@ -966,7 +1166,154 @@ def get_doctors():
 
 
 # -----------------------
-# Flask app çalıştır
+# Prometheus metrikleri
+# -----------------------
+# Route / aşama / upstream histogramları metrics.py'de kaydedilir; önbellek ve
+# anlık değerler burada, /metrics okunurken mevcut stats() çağrılarından toplanır.
+def collect_app_metrics():
+    samples = []
+    caches = {
+        "pdf": pdf_cache.stats(),
+        "profile": profile_cache.stats(),
+        "token": auth_cache_stats()["tokens"],
+        "user_id": auth_cache_stats()["user_ids"],
+    }
+    for name, stats in caches.items():
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            samples.append(("cache_requests_total", "counter", "Önbellek istekleri",
+                            {"cache": name, "result": result}, stats[key]))
+    samples.append(("pdf_cache_bytes", "gauge", "PDF önbelleğinin boyutu", None, caches["pdf"].get("bytes", 0)))
+    response_stats = response_cache.stats()
+    for result, key in (("hit", "exact_hits"), ("near_hit", "near_hits"), ("miss", "misses")):
+        samples.append(("cache_requests_total", "counter", "Önbellek istekleri",
+                        {"cache": "response", "result": result}, response_stats[key]))
+    samples.append(("response_cache_saved_seconds_total", "counter", "Önbellekten dönen cevapların kazandırdığı süre",
+                    None, response_stats["saved_seconds"]))
+    gemini_stats = gemini.stats()
+    breaker, hedging = gemini_stats["breaker"], gemini_stats["hedging"]
+    samples += [
+        ("gemini_in_flight", "gauge", "Süren Gemini çağrıları", None, gemini.in_flight),
+        ("gemini_breaker_open", "gauge", "Gemini devre kesicisi açık mı (half-open: 0.5)", None,
+         {"closed": 0, "half_open": 0.5, "open": 1}[breaker["state"]]),
+        ("gemini_breaker_opened_total", "counter", "Devrenin açıldığı sayı", None, breaker["opened"]),
+        ("gemini_breaker_rejected_total", "counter", "Devre açıkken reddedilen çağrılar", None, breaker["rejected"]),
+        ("gemini_hedged_total", "counter", "Gönderilen ikinci (hedge) istekler", None, hedging["hedged"]),
+        ("gemini_hedge_won_total", "counter", "İkinci isteğin önce döndüğü çağrılar", None, hedging["hedge_won"]),
+    ]
+    coalescing = gemini_stats["coalescing"]
+    if coalescing is not None:
+        # Birleştirme oranı: gemini_coalesced_total / gemini_generate_calls_total
+        samples += [
+            ("gemini_generate_calls_total", "counter", "generate çağrıları (birleştirme öncesi)", None,
+             coalescing["calls"]),
+            ("gemini_coalesced_total", "counter", "Süren aynı prompt'lu çağrının sonucunu paylaşan çağrılar",
+             None, coalescing["coalesced"]),
+            ("gemini_coalesce_timeouts_total", "counter", "Birleştirilen çağrıyı beklerken zaman aşımı", None,
+             coalescing["timeouts"]),
+        ]
+    slots = gemini_stats["slots"]
+    samples += [
+        ("gemini_slot_waiting", "gauge", "Gemini slotu bekleyen çağrılar", None, slots["waiting"]),
+        ("gemini_slot_waiting_tenants", "gauge", "Gemini slotu bekleyen kullanıcılar", None, slots["waiting_tenants"]),
+        ("gemini_slot_timeouts_total", "counter", "Slot beklerken zaman aşımı", None, slots["timeouts"]),
+    ]
+    for endpoint, counts in rate_limiter.stats()["endpoints"].items():
+        for result, value in counts.items():
+            samples.append(("rate_limit_requests_total", "counter", "Hız sınırı kararları (allowed | limited)",
+                            {"endpoint": endpoint, "result": result}, value))
+    uploads = upload_store.stats()
+    for result in ("stored", "deduplicated", "rejected"):
+        samples.append(("uploads_total", "counter", "Yüklenen dosyalar (stored | deduplicated | rejected)",
+                        {"result": result}, uploads[result]))
+    samples += [
+        ("uploads_bytes_saved_total", "counter", "Tekilleştirmeyle yazılmayan bayt", None, uploads["bytes_saved"]),
+        ("uploads_thumbnails_total", "counter", "Üretilen küçük resimler", None, uploads["thumbnails"]),
+        ("uploads_collected_total", "counter", "Referansı kalmayıp silinen dosyalar", None, uploads["collected"]),
+        ("uploads_discarded_total", "counter", "İşlemi commit edilmediği için silinen yeni dosyalar", None,
+         uploads["discarded"]),
+    ]
+    locks = chat_lock.stats()
+    for result in ("acquired", "rejected", "waited", "expired", "released", "lost"):
+        samples.append(("chat_lock_total", "counter", "Sohbet kilidi olayları", {"result": result}, locks[result]))
+    if "held" in locks:
+        # Yalnızca bellek içi backend (postgres'te tablo sorgusu gerekirdi)
+        samples.append(("chat_locks_held", "gauge", "Tutulan sohbet kilitleri", None, locks["held"]))
+    events = event_bus.stats()
+    samples += [
+        ("jobs_pending", "gauge", "Kuyruktaki arka plan işleri", None, job_queue.pending()),
+        ("event_subscriptions", "gauge", "Açık SSE abonelikleri", None, events["subscriptions"]),
+        ("events_published_total", "counter", "Yayınlanan anlık bildirimler", None, events["published"]),
+        ("draining", "gauge", "Worker kapanıyor mu", None, int(lifecycle.draining)),
+        ("profiles_written_total", "counter", "Yazılan örnekli profiller", None, metrics.profiler.written),
+    ]
+    return samples
+
+
+metrics.registry.add_collector(collect_app_metrics)
+
+
+@api.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# -----------------------
+# Sağlık / hazır olma (load balancer, gunicorn)
+# -----------------------
+# /healthz: süreç ayakta mı (bağımlılık kontrolü yok)
+# /readyz : trafik alabilir mi; kapanış başladıysa veya DB'ye ulaşılamıyorsa 503
+@api.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok", "pid": os.getpid(), "uptime": round(lifecycle.uptime(), 1)})
+
+
+@api.route("/readyz", methods=["GET"])
+def readyz():
+    ready, checks = lifecycle.readiness()
+    body = {
+        "status": "ready" if ready else ("draining" if lifecycle.draining else "unavailable"),
+        "checks": checks,
+        "gemini_in_flight": gemini.in_flight,
+        "jobs_pending": job_queue.pending()
+    }
+    return jsonify(body), 200 if ready else 503
+
+
+def check_database():
+    with db.connection() as conn:
+        conn.cursor().execute("SELECT 1")
+
+
+lifecycle.add_ready_check("database", check_database)
+# Kapanışta: SSE akışları kapatılır (istemci başka worker'a bağlanır), sonra
+# arka plan işleri ve süren Gemini çağrıları DRAIN_TIMEOUT'a kadar beklenir
+lifecycle.on_draining(lambda: event_bus.broadcast({"type": "reconnect"}))
+lifecycle.wait_for("jobs", job_queue.drain)
+lifecycle.wait_for("gemini", gemini.wait_idle)
+
+
+# -----------------------
+# Uygulama fabrikası
+# -----------------------
+def create_app():
+    # Worker başına kaynaklar (DB havuzu, Gemini oturumu, iş kuyruğu süreçleri,
+    # event bus dinleyicisi) ilk kullanımda açılır: import/fork sırasında bağlantı yok
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    CORS(app, expose_headers=["X-Next-Cursor", "X-Cache", "X-Fallback", "ETag", "Retry-After"])
+    # PostgreSQL bağlantı havuzu: istek başına bağlantı (db.get_db)
+    db.init_app(app)
+    # Commit edilmeyen yüklemelerin dosyaları (bkz. uploads.py)
+    app.teardown_appcontext(upload_store.discard_uncommitted)
+    # Route süreleri, JSON serileştirme, örnekli profil (bkz. metrics.py)
+    metrics.init_app(app)
+    app.register_blueprint(api)
+    return app
+
+
+# -----------------------
+# Flask app çalıştır (geliştirme; üretim: gunicorn -c gunicorn.conf.py wsgi:app)
 # -----------------------
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    migrations.migrate()
+    create_app().run(debug=os.getenv("FLASK_DEBUG") == "1", port=int(os.getenv("PORT", "5000")), threaded=True)
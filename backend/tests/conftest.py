@@ -0,0 +1,114 @@
+# -----------------------
+# Ortak test düzeni (pytest)
+# -----------------------
+# bench/ altındaki eşzamanlılık senaryolarının kısa, kendini doğrulayan sürümleri.
+# PostgreSQL gerekmez: sohbet deposu / kilit / olay yolu bellek içi, profil boş döner,
+# Gemini yerine bench/fake_gemini.py çalışır. Sahte sunucunun gecikmesi ve hata kodu
+# testlerde `fault` fixture'ı ile ayarlanır (sabit değer veya çağrılabilir).
+# server modülü ayarlarını import anında okuduğu için env burada, import'tan önce yazılır.
+# Kullanım (backend/ içinde): python -m pytest tests -q
+import datetime
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+from werkzeug.serving import make_server
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "bench"))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+JWT_SECRET = "test-secret-test-secret-test-secret"
+
+
+class Fault:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latency = 0.0
+        self.status = None
+
+    def current(self, name):
+        value = getattr(self, name)
+        return value() if callable(value) else value
+
+
+FAULT = Fault()
+FAKE, FAKE_BASE = start_fake_gemini(latency=lambda: FAULT.current("latency"), chunk_delay=0,
+                                    fail_status=lambda: FAULT.current("status"))
+
+os.environ.update({
+    "GEMINI_API_BASE": FAKE_BASE, "GEMINI_API_KEY": "test", "JWT_SECRET": JWT_SECRET,
+    "CHAT_STORE": "memory", "CHAT_LOCK": "memory", "EVENT_BUS": "memory", "JOB_QUEUE": "inprocess",
+    "RATE_LIMIT": "off", "PDF_CACHE": "off", "RESPONSE_CACHE": "0",
+})
+
+
+@pytest.fixture(autouse=True)
+def fault():
+    yield FAULT
+    FAULT.reset()
+
+
+@pytest.fixture
+def fake():
+    return FAKE
+
+
+@pytest.fixture(scope="session")
+def server():
+    import server as app_module
+    from profile_cache import build_profile_context
+    app_module.profile_cache.loader = lambda username: build_profile_context(None)
+    return app_module
+
+
+@pytest.fixture(scope="session")
+def base_url(server):
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    httpd = make_server("127.0.0.1", 0, server.create_app(), threaded=True)
+    httpd.socket.listen(128)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def make_headers(username, user_id=1):
+    token = jwt.encode({
+        "username": username, "role": "user", "user_id": user_id,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, JWT_SECRET, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def run_together(fn, args_list):
+    # Tüm çağrılar Barrier'da buluşup aynı anda başlar; (sonuç | exception) listesi döner
+    barrier = threading.Barrier(len(args_list))
+
+    def call(args):
+        barrier.wait()
+        try:
+            return fn(*args)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(args_list)) as pool:
+        return list(pool.map(call, args_list))
+
+
+@pytest.fixture
+def auth():
+    # auth("kullanici", user_id) -> Authorization header'ı
+    return make_headers
+
+
+@pytest.fixture
+def together():
+    return run_together
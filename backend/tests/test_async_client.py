@@ -0,0 +1,160 @@
+# Async Gemini yolu (bkz. bench/bench_gemini_client.py): senkron yolla aynı slotlar,
+# devre kesici ve deneme politikası
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+from gemini_client import GeminiClient
+from resilience import CircuitBreaker, FairSlots, RetryPolicy, UpstreamUnavailable, current_tenant
+
+
+def make_client(**options):
+    options.setdefault("retry", RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.05,
+                                            attempt_timeout=2, deadline=5))
+    options.setdefault("max_concurrency", 4)
+    return GeminiClient(api_base=os.environ["GEMINI_API_BASE"], api_key="test", pool_size=8,
+                        coalesce=False, **options)
+
+
+def first_calls(*values):
+    remaining = list(values)
+    return lambda: remaining.pop(0) if remaining else None
+
+
+def test_agenerate_respects_slot_capacity(fake, fault):
+    fault.latency = 0.1
+    client = make_client()
+    peak = []
+
+    async def run():
+        async def watch():
+            while True:
+                peak.append(client.in_flight)
+                await asyncio.sleep(0.01)
+        watcher = asyncio.create_task(watch())
+        results = await asyncio.gather(*(client.agenerate(f"async soru {i}") for i in range(12)))
+        watcher.cancel()
+        await client.aclose()
+        return results
+    before = fake.request_count
+    results = asyncio.run(run())
+    assert all(isinstance(r, str) for r in results)
+    assert fake.request_count - before == 12
+    assert max(peak) == 4
+    assert client.slots.stats()["available"] == 4
+
+
+def test_agenerate_waits_for_slots_held_by_threads(fake):
+    client = make_client(max_concurrency=1, retry=RetryPolicy(attempts=1, attempt_timeout=0.2, deadline=5))
+    assert client.slots.acquire()
+    before = fake.request_count
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(client.agenerate("slot dolu"))
+    assert fake.request_count == before
+
+    async def run():
+        task = asyncio.create_task(client.agenerate("slot boşalınca"))
+        await asyncio.sleep(0.05)
+        client.slots.release()  # thread'in tuttuğu slot loop'taki bekleyeni uyandırır
+        return await task
+    client.retry = RetryPolicy(attempts=1, attempt_timeout=2, deadline=5)
+    assert asyncio.run(run())
+    assert client.slots.stats()["available"] == 1
+
+
+def test_async_waiters_keep_fair_order():
+    slots = FairSlots(1)
+    assert slots.acquire()
+    order = []
+
+    async def use_slot(tenant):
+        current_tenant.set((tenant, 1.0))  # her task kendi context kopyasında
+        assert await slots.aacquire(timeout=5)
+        order.append(tenant)
+        slots.release()
+
+    async def run():
+        tasks = []
+        for i, tenant in enumerate(["noisy"] * 5 + ["quiet"]):
+            tasks.append(asyncio.create_task(use_slot(tenant)))
+            while slots.stats()["waiting"] < i + 1:
+                await asyncio.sleep(0.001)
+        threading.Thread(target=slots.release).start()
+        await asyncio.gather(*tasks)
+    asyncio.run(run())
+    assert order.index("quiet") <= 1
+
+
+def test_cancelled_waiter_does_not_keep_slot():
+    slots = FairSlots(1)
+    assert slots.acquire()
+
+    async def run():
+        task = asyncio.create_task(slots.aacquire(timeout=5))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(run())
+    slots.release()
+    assert slots.stats()["available"] == 1 and slots.stats()["waiting"] == 0
+    assert slots.acquire(timeout=0)
+
+
+def test_agenerate_retries_transient_errors(fake, fault):
+    fault.status = first_calls(429, 503)
+    before = fake.request_count
+    assert asyncio.run(make_client().agenerate("tekrar dene"))
+    assert fake.request_count - before == 3
+
+
+def test_agenerate_client_errors_are_not_retried(fake, fault):
+    fault.status = 400
+    before = fake.request_count
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(make_client().agenerate("geçersiz istek"))
+    assert fake.request_count - before == 1
+
+
+def test_breaker_is_shared_with_sync_path(fake, fault):
+    fault.status = 503
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.3)
+    client = make_client(retry=RetryPolicy(attempts=1, deadline=5), breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            client.generate("devre")
+    assert breaker.state == "open"
+    before = fake.request_count
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(client.agenerate("devre"))
+    assert fake.request_count == before
+
+    fault.status = None
+    time.sleep(0.35)
+    assert asyncio.run(client.agenerate("devre"))
+    assert breaker.state == "closed"
+
+
+def test_one_async_client_per_event_loop():
+    client = make_client()
+
+    async def clients():
+        first = client._async_client()
+        await client.agenerate("bağlantı")
+        return first, client._async_client()
+    first, second = asyncio.run(clients())
+    assert first is second
+    # Yeni loop yeni istemci alır; kapanmış loop'un istemcisi bırakılır
+    third, _ = asyncio.run(clients())
+    assert third is not first
+    assert len(client._async_clients) == 1
+
+    async def close():
+        client._async_client()
+        await client.aclose()
+    asyncio.run(close())
+    assert len(client._async_clients) == 0
@@ -0,0 +1,61 @@
+# Sohbet kilidi (bkz. bench/chat_lock_concurrency.py): aynı sohbete paralel mesajlar
+import pytest
+import requests
+
+SENDS = 8
+
+
+@pytest.fixture
+def chat(server, base_url, auth, request):
+    # Her test kendi kullanıcısıyla (geçmiş ve kilit anahtarı ayrı)
+    username = f"lock_{request.node.name}"
+    server.chat_store.ensure_default_chat(username)
+    headers = auth(username)
+
+    def send(message, stream=False):
+        url = f"{base_url}/chat/1" + ("?stream=1" if stream else "")
+        response = requests.post(url, json={"message": message}, headers=headers, timeout=60)
+        response.content  # akış bitene kadar oku
+        return response.status_code
+
+    def transcript():
+        return server.chat_store.get_messages(username, 1, limit=100000)
+    send.transcript = transcript
+    send.username = username
+    return send
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_parallel_messages_rejected_while_locked(server, chat, fault, together, monkeypatch, stream):
+    fault.latency = 0.3
+    monkeypatch.setattr(server, "CHAT_LOCK_WAIT", 0)
+    codes = together(lambda i: chat(f"mesaj {i}", stream), [(i,) for i in range(SENDS)])
+    assert codes.count(200) == 1
+    assert codes.count(409) == SENDS - 1
+    assert [m["sender"] for m in chat.transcript()] == ["user", "bot"]
+
+
+def test_parallel_messages_serialized_when_waiting(server, chat, fault, together, monkeypatch):
+    fault.latency = 0.05
+    monkeypatch.setattr(server, "CHAT_LOCK_WAIT", 30)
+    codes = together(lambda i: chat(f"sıralı {i}"), [(i,) for i in range(SENDS)])
+    assert codes == [200] * SENDS
+    assert [m["sender"] for m in chat.transcript()] == ["user", "bot"] * SENDS
+
+
+def test_failed_request_releases_lock(server, chat, monkeypatch):
+    # Eski waiting_for_bot hata sonrası sohbeti kalıcı kilitliyordu
+    monkeypatch.setattr(server, "CHAT_LOCK_WAIT", 0)
+    loader = server.profile_cache.loader
+    calls = []
+
+    def failing_loader(username):
+        calls.append(username)
+        if len(calls) == 1:
+            raise RuntimeError("profil sorgusu başarısız (enjekte)")
+        return loader(username)
+    server.profile_cache.invalidate(chat.username)
+    monkeypatch.setattr(server.profile_cache, "loader", failing_loader)
+    assert chat("hata") == 500
+    server.profile_cache.invalidate(chat.username)
+    assert chat("sonra") == 200
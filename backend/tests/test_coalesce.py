@@ -0,0 +1,93 @@
+# Aynı prompt birleştirme (bkz. bench/bench_coalesce.py)
+import os
+import time
+
+import requests
+
+from gemini_client import GeminiClient
+from resilience import RetryPolicy, SingleFlight, UpstreamUnavailable
+
+N = 10
+PROMPT = "Tahlil raporu:\n    Hemoglobin 11.2 g/dL (12-16)\n    Ferritin 8 ng/mL (15-150)\n"
+VARIANT = "  Tahlil raporu: Hemoglobin 11.2 g/dL (12-16)\n\n Ferritin 8 ng/mL (15-150)"
+
+
+def make_client():
+    return GeminiClient(api_base=os.environ["GEMINI_API_BASE"], api_key="test", max_concurrency=N, pool_size=N)
+
+
+def upstream_calls(fake, fn):
+    before = fake.request_count
+    results = fn()
+    return results, fake.request_count - before
+
+
+def test_identical_prompts_share_one_call(fake, fault, together):
+    fault.latency = 0.3
+    client = make_client()
+    results, calls = upstream_calls(fake, lambda: together(client.generate,
+                                                           [(PROMPT if i % 2 else VARIANT,) for i in range(N)]))
+    assert calls == 1
+    assert all(isinstance(r, str) for r in results) and len(set(results)) == 1
+
+
+def test_different_prompts_are_not_coalesced(fake, fault, together):
+    fault.latency = 0.1
+    client = make_client()
+    _, calls = upstream_calls(fake, lambda: together(client.generate, [(f"{PROMPT} #{i}",) for i in range(N)]))
+    assert calls == N
+
+
+def test_each_waiter_gets_its_own_error(fake, fault, together):
+    fault.latency = 0.3
+    fault.status = 400
+    client = make_client()
+    errors, calls = upstream_calls(fake, lambda: together(client.generate, [(PROMPT,)] * N))
+    assert calls == 1
+    assert all(isinstance(e, requests.HTTPError) and e.response.status_code == 400 for e in errors)
+    assert len({id(e) for e in errors}) == N
+    # Bekleyenlerin kopyası liderin hatasına bağlı
+    leaders = [e for e in errors if e.__cause__ is None]
+    assert len(leaders) == 1 and all(e.__cause__ is leaders[0] for e in errors if e is not leaders[0])
+
+
+def test_retry_policies_do_not_share_calls(fake, fault, together):
+    fault.latency = 0.3
+    client = make_client()
+    job = RetryPolicy(attempts=3, base_delay=0.5, max_delay=8.0)
+    results, calls = upstream_calls(fake, lambda: together(lambda policy: client.generate(PROMPT, retry=policy),
+                                                           [(None if i % 2 else job,) for i in range(N)]))
+    assert calls == 2
+    assert all(isinstance(r, str) for r in results)
+
+
+def test_waiter_gives_up_after_its_own_timeout(together):
+    flight = SingleFlight("test")
+    started = []
+
+    def slow():
+        started.append(time.perf_counter())
+        time.sleep(0.6)
+        return "lider"
+
+    def call(i):
+        if i:
+            time.sleep(0.05)  # lider önce başlasın
+        return flight.do("anahtar", slow, timeout=5 if i == 0 else 0.1)
+    results = together(call, [(i,) for i in range(N)])
+    assert results[0] == "lider" and len(started) == 1
+    assert all(isinstance(r, UpstreamUnavailable) for r in results[1:])
+    assert flight.stats()["timeouts"] == N - 1
+
+
+def test_app_requests_coalesce(server, base_url, auth, fake, fault, together):
+    fault.latency = 0.3
+    headers = [auth(f"coalesce_{i}", 100 + i) for i in range(N)]
+
+    def ask(i):
+        return requests.post(f"{base_url}/chat/1", json={"message": "Kansızlık için ne yemeliyim?"},
+                             headers=headers[i], timeout=60)
+    responses, calls = upstream_calls(fake, lambda: together(ask, [(i,) for i in range(N)]))
+    assert [r.status_code for r in responses] == [200] * N
+    assert calls == 1
+    assert len({r.json()["reply"] for r in responses}) == 1
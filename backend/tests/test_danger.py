@@ -0,0 +1,51 @@
+# Tehlikeli ifade eşleştirme (server.danger_words ile derlenen otomat)
+import pytest
+
+from danger import PhraseMatcher
+
+
+@pytest.fixture(scope="module")
+def matcher(server):
+    return server.danger_matcher
+
+
+@pytest.mark.parametrize("message", [
+    "göğüs ağrısım var",
+    "nefes darlığım var",
+    "kalp krizim oluyor",
+    "bayılmak üzereyim",
+    "kusmam durmuyor",
+    "nöbetim geldi",
+    "şiddetli kanamam var",
+    "çarpıntım var",
+    "bilinç kaybım oldu",
+    "dün gece zehirlendim",
+    "intihara teşebbüs",
+    "GOGUS AGRISI var",
+    "ŞOK geçiriyor galiba",
+    "allergik şoka girdi",
+])
+def test_inflected_and_folded_forms_match(matcher, message):
+    assert matcher.search(message)
+
+
+@pytest.mark.parametrize("message", [
+    "sokakta yürürken",
+    "ilacı ağzına soktum",
+    "iğne sokuldu",
+    "şoklama tedavisi sordum",
+    "başım ağrıyor",
+])
+def test_harmless_messages_do_not_match(matcher, message):
+    assert not matcher.search(message)
+
+
+def test_match_positions_and_markers():
+    matcher = PhraseMatcher(["kalp krizi", "şok$", "zehirlen*"])
+    text = "Dün KALP KRİZİM oldu, şok"
+    assert [(m.phrase, text[m.start:m.end]) for m in matcher.find_all(text)] == [
+        ("kalp krizi", "KALP KRİZİ"), ("şok", "şok")]
+    # Eski listelerdeki * yok sayılır (ekli biçimler zaten eşleşir)
+    assert matcher.search("zehirlenme belirtileri")
+    # Kelime ortası eşleşmez
+    assert not matcher.search("xkalp krizi")
@@ -0,0 +1,46 @@
+# Doktora Sor /events aboneliği (bkz. bench/sse_capacity.py, bench/bench_doctor_events.py)
+import pytest
+from werkzeug.test import EnvironBuilder
+
+
+@pytest.fixture
+def open_events(server, auth):
+    # WSGI sunucusu gibi: app(environ, start_response) -> akış iterable'ı (henüz okunmamış)
+    def open_stream(username, user_id):
+        token = auth(username, user_id)["Authorization"].split(" ", 1)[1]
+        environ = EnvironBuilder(path="/events", query_string={"token": token}).get_environ()
+        statuses = []
+        app_iter = server.create_app()(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        assert statuses == ["200 OK"]
+        return app_iter
+    return open_stream
+
+
+def held(server):
+    # (açık abonelik, boş abonelik slotu)
+    return server.event_bus.stats()["subscriptions"], server.event_slots._value
+
+
+def test_subscription_released_when_closed_before_streaming(server, open_events):
+    # İstemci generator hiç çalışmadan koparsa abonelik ve slot sızmamalı
+    subscriptions, slots = held(server)
+    app_iter = open_events("events_early_close", 301)
+    assert held(server) == (subscriptions + 1, slots - 1)
+    app_iter.close()
+    assert held(server) == (subscriptions, slots)
+
+
+def test_subscription_released_after_streaming(server, open_events):
+    subscriptions, slots = held(server)
+    app_iter = open_events("events_streamed", 302)
+    assert next(iter(app_iter)).startswith(b"event: ready")
+    app_iter.close()
+    assert held(server) == (subscriptions, slots)
+
+
+def test_subscription_close_is_idempotent(server):
+    subscription = server.event_bus.subscribe(["user:303"])
+    subscription.close()
+    subscription.close()
+    assert subscription.closed
+    assert "user:303" not in server.event_bus._subscribers
@@ -0,0 +1,74 @@
+# Arka plan iş kuyruğu: durum geçişleri (postgres backend'i aynı geçişleri satıra yazar)
+import threading
+import time
+
+import pytest
+
+from jobs import InProcessJobQueue, Job, QueueFull
+
+
+class RecordingQueue(InProcessJobQueue):
+    # PostgresJobQueue gibi her değişikliği dışarı yazar; burada listeye
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.changes = []
+        self.discarded = []
+
+    def _create(self, owner):
+        job = super()._create(owner)
+        job._on_change = lambda j: self.changes.append((j.status, j.stage, j.progress))
+        return job
+
+    def _discard(self, job):
+        self.discarded.append(job.id)
+        super()._discard(job)
+
+
+def wait_finished(jobs, job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job.id).status not in ("done", "failed") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return jobs.get(job.id)
+
+
+def test_job_reports_every_transition():
+    jobs = RecordingQueue(workers=1)
+
+    def work(job):
+        job.set_progress("analyzing", 0.6)
+        return {"reply": "tamam"}
+    job = wait_finished(jobs, jobs.submit("ali", work))
+    assert job.to_dict()["result"] == {"reply": "tamam"}
+    assert jobs.changes == [("running", "running", 0.05), ("running", "analyzing", 0.6), ("done", "done", 1.0)]
+    assert jobs.get(job.id, owner="veli") is None
+
+
+def test_failed_job_keeps_progress_and_error():
+    jobs = RecordingQueue(workers=1)
+
+    def work(job):
+        job.set_progress("extracting", 0.2)
+        raise ValueError("bozuk pdf")
+    job = wait_finished(jobs, jobs.submit("ali", work))
+    assert (job.status, job.error, job.result) == ("failed", "bozuk pdf", None)
+    assert jobs.changes[-1] == ("failed", "failed", 0.2)
+
+
+def test_full_queue_discards_job():
+    jobs = RecordingQueue(workers=1, max_queue=1)
+    release = threading.Event()
+    jobs.submit("ali", lambda job: release.wait(5))
+    while not jobs.changes:  # ilk iş worker'da
+        time.sleep(0.01)
+    jobs.submit("ali", lambda job: None)
+    with pytest.raises(QueueFull):
+        jobs.submit("ali", lambda job: None)
+    assert len(jobs.discarded) == 1
+    release.set()
+
+
+def test_job_without_listener():
+    job = Job("ali")
+    job.set_status("done", 1.0, result={"reply": "x"})
+    assert job.to_dict() == {"job_id": job.id, "status": "done", "stage": "done", "progress": 1.0,
+                             "result": {"reply": "x"}, "error": None}
@@ -0,0 +1,92 @@
+# Kullanıcı başına hız sınırı ve adil Gemini slot kuyruğu (bkz. bench/noisy_neighbor.py)
+import threading
+import time
+
+import pytest
+import requests
+
+from rate_limit import Limit, MemoryRateLimiter
+from resilience import FairSlots, bind_tenant, current_tenant
+
+
+def test_token_bucket_limits_per_user():
+    limiter = MemoryRateLimiter({"chat": Limit(per_minute=60, burst=3)})
+    assert [limiter.try_acquire("chat", "ali")[0] for _ in range(3)] == [True] * 3
+    allowed, retry_after = limiter.try_acquire("chat", "ali")
+    assert not allowed and 0 < retry_after <= 1.0
+    # Başka kullanıcının ve sınırı olmayan ucun kovası ayrı
+    assert limiter.try_acquire("chat", "veli")[0]
+    assert limiter.try_acquire("profile", "ali")[0]
+    time.sleep(retry_after + 0.05)
+    assert limiter.try_acquire("chat", "ali")[0]
+
+
+@pytest.fixture
+def chat_limit(server, monkeypatch):
+    import rate_limit
+    monkeypatch.setattr(rate_limit.rate_limiter, "enabled", True)
+    monkeypatch.setitem(rate_limit.rate_limiter.limits, "chat", Limit(per_minute=6, burst=2))
+
+
+def test_app_returns_429_with_retry_after(base_url, auth, chat_limit):
+    headers = auth("limited_user", 201)
+    codes = []
+    for i in range(3):
+        response = requests.post(f"{base_url}/chat/{i + 1}", json={"message": f"soru {i}"},
+                                 headers=headers, timeout=30)
+        codes.append(response.status_code)
+    assert codes == [200, 200, 429]
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tenant_is_bound_for_the_request_only(server, auth, chat_limit, monkeypatch, stream):
+    # Test istemcisi isteği bu thread'de çalıştırır: istek sonrası context varsayılana dönmeli
+    seen = []
+
+    def fake_generate(prompt, retry=None):
+        seen.append(current_tenant.get())
+        return "cevap"
+
+    def fake_stream(prompt, retry=None):
+        seen.append(current_tenant.get())
+        yield "cevap"
+    monkeypatch.setattr(server.gemini, "generate", fake_generate)
+    monkeypatch.setattr(server.gemini, "stream", fake_stream)
+    client = server.create_app().test_client()
+    response = client.post("/chat/1" + ("?stream=1" if stream else ""), json={"message": "başım ağrıyor"},
+                           headers=auth(f"tenant_user_{stream}", 202))
+    response.get_data()
+    assert response.status_code == 200
+    assert seen == [(f"tenant_user_{stream}", 1.0)]
+    assert current_tenant.get() == ("-", 1.0)
+
+
+@pytest.mark.parametrize("fair", [True, False])
+def test_fair_slots_let_quiet_tenant_ahead(fair):
+    slots = FairSlots(1, fair=fair)
+    assert slots.acquire()
+    order = []
+
+    def use_slot(tenant):
+        assert slots.acquire(timeout=5)
+        order.append(tenant)
+        slots.release()
+
+    def start(tenant, waiting):
+        thread = threading.Thread(target=bind_tenant(use_slot, tenant), args=(tenant,))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while slots.stats()["waiting"] < waiting and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return thread
+
+    threads = [start("noisy", i + 1) for i in range(5)]
+    threads.append(start("quiet", 6))
+    slots.release()
+    for thread in threads:
+        thread.join()
+    if fair:
+        assert order.index("quiet") <= 1
+    else:
+        assert order.index("quiet") == 5
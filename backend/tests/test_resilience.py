@@ -0,0 +1,89 @@
+# Tekrar deneme / devre kesici / hedging (bkz. bench/fault_injection.py)
+import os
+import time
+
+import pytest
+import requests
+
+from gemini_client import GeminiClient
+from resilience import CircuitBreaker, Hedger, RetryPolicy, UpstreamUnavailable
+
+
+def make_client(**options):
+    options.setdefault("retry", RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.05,
+                                            attempt_timeout=2, deadline=5))
+    return GeminiClient(api_base=os.environ["GEMINI_API_BASE"], api_key="test", max_concurrency=8,
+                        pool_size=8, coalesce=False, **options)
+
+
+def first_calls(*values):
+    # İlk çağrılara sırayla values, sonrakilere None (hata yok / gecikme yok)
+    remaining = list(values)
+    return lambda: remaining.pop(0) if remaining else None
+
+
+def test_transient_errors_are_retried(fake, fault):
+    fault.status = first_calls(429, 503)
+    before = fake.request_count
+    assert make_client().generate("tekrar dene")
+    assert fake.request_count - before == 3
+
+
+def test_client_errors_are_not_retried(fake, fault):
+    fault.status = 400
+    before = fake.request_count
+    with pytest.raises(requests.HTTPError):
+        make_client().generate("geçersiz istek")
+    assert fake.request_count - before == 1
+
+
+def test_exhausted_retries_raise_upstream_unavailable(fake, fault):
+    fault.status = 503
+    before = fake.request_count
+    with pytest.raises(UpstreamUnavailable) as error:
+        make_client().generate("kesinti")
+    assert isinstance(error.value.__cause__, requests.HTTPError)
+    assert fake.request_count - before == 3
+
+
+def test_attempt_timeout_and_deadline(fault):
+    fault.latency = 2.0
+    client = make_client(retry=RetryPolicy(attempts=5, base_delay=0.01, max_delay=0.05,
+                                           attempt_timeout=0.2, deadline=0.6))
+    started = time.perf_counter()
+    with pytest.raises(UpstreamUnavailable):
+        client.generate("takılan upstream")
+    assert time.perf_counter() - started < 1.2
+
+
+def test_breaker_opens_and_recovers(fake, fault):
+    fault.status = 503
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.3)
+    client = make_client(retry=RetryPolicy(attempts=1, deadline=5), breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            client.generate("devre")
+    assert breaker.state == "open"
+
+    # Açık devre upstream'e gitmez
+    before = fake.request_count
+    with pytest.raises(UpstreamUnavailable) as error:
+        client.generate("devre")
+    assert fake.request_count == before
+    assert error.value.retry_after is not None
+
+    # reset_timeout sonra tek deneme (half-open) başarılıysa devre kapanır
+    fault.status = None
+    time.sleep(0.35)
+    assert client.generate("devre")
+    assert breaker.state == "closed"
+
+
+def test_hedged_request_cuts_tail_latency(fault):
+    fault.latency = first_calls(1.5)  # yalnızca ilk istek yavaş
+    hedger = Hedger(delay=0.1, max_ratio=1.0, max_workers=4)
+    started = time.perf_counter()
+    assert make_client(hedger=hedger).generate("kuyruk gecikmesi")
+    assert time.perf_counter() - started < 1.0
+    stats = hedger.stats()
+    assert stats["hedged"] == 1 and stats["hedge_won"] == 1
@@ -0,0 +1,41 @@
+# Cevap önbelleği: yakın kopya yalnızca aynı soruysa kabul edilir
+import pytest
+
+from response_cache import ResponseCache
+
+BUCKET = "normal|30s|-|-"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("günde 2 tablet ibuprofen içebilir miyim", "günde 8 tablet ibuprofen içebilir miyim"),
+    ("çocuğum 2 yaşında ateşi var ne yapmalıyım", "çocuğum 12 yaşında ateşi var ne yapmalıyım"),
+    ("migren ağrısı için ne yapmalıyım", "migren ağrısı için ne yapmamalıyım"),
+    ("kahve içmeli miyim", "kahve içmemeli miyim"),
+    ("şekerli çay içebilir miyim", "şekersiz çay içebilir miyim"),
+    ("ateşim yüksek bu normal mi", "ateşim yüksek bu normal değil mi"),
+    ("baş ağrısı için ne yapmalıyım", "baş ağrısı için hemen ne yapmalıyım"),
+])
+def test_medically_different_questions_miss(cached, asked):
+    cache = ResponseCache(threshold=0.5)
+    cache.put(cached, BUCKET, "önbellekteki cevap")
+    assert cache.get(asked, BUCKET) is None
+    assert cache.stats()["near_hits"] == 0
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("migren ağrım için ne yapmalıyım acaba söyler misiniz", "migren ağrım için ne yapmalıym acaba söyler misiniz"),
+    ("boğaz ağrısı için hangi çayı içmeliyim", "bogaz agrisi icin hangi cayi icmeliym"),
+])
+def test_spelling_variants_near_hit(cached, asked):
+    cache = ResponseCache()
+    cache.put(cached, BUCKET, "önbellekteki cevap")
+    assert cache.get(asked, BUCKET) == "önbellekteki cevap"
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_spacing_punctuation_and_case_hit_exactly():
+    cache = ResponseCache()
+    cache.put("Baş ağrısı için ne yapmalıyım?", BUCKET, "önbellekteki cevap")
+    assert cache.get("  baş AĞRISI  için ne yapmalıyım", BUCKET) == "önbellekteki cevap"
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.get("Baş ağrısı için ne yapmalıyım?", "obez|30s|-|-") is None
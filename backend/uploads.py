@@ -0,0 +1,303 @@
+# -----------------------
+# Yükleme deposu (içerik adresli)
+# -----------------------
+# Avatar ve Doktora Sor ekleri için ortak yol:
+#   - Dosya parça parça geçici dosyaya yazılır (SHA-256 ile), UPLOAD_MAX_BYTES
+#     aşılırsa yazma kesilir (UploadTooLarge -> 413)
+#   - Yol içerikten türetilir: uploads/<ilk 2 hex>/<sonraki 2 hex>/<sha256><uzantı>
+#     Aynı içerik bir kez saklanır; aynı isimli farklı dosyalar birbirini ezmez
+#   - Referans sayısı upload_blobs tablosunda (migration 006), isteğin kendi
+#     transaction'ında artar/azalır. Sayısı 0'a düşen dosyalar UPLOAD_GC_GRACE
+#     sonra collect_garbage ile silinir (arada tekrar yüklenirse kurtulur)
+#   - Dosya satırla aynı anda görünmeli: save digest başına advisory lock alır (çağıranın
+#     commit'ine kadar); yeni eklenen satırın dosyası her zaman yeniden yazılır. Çağıranın
+#     işlemi commit edilmezse (hata, rollback) istek sonunda satırı olmayan yeni dosyalar
+#     silinir (discard_uncommitted). GC dosyaları satır kilitliyken, commit'ten önce siler.
+#   - Avatarlar için yükleme anında bir kez küçük resim üretilir (<sha>.t<boyut>.jpg)
+#   - İçerik adresli dosyalar değişmez: uzun ömürlü Cache-Control + immutable;
+#     Range / koşullu istekler send_from_directory ile
+# Eski (düz isimli) dosyalar olduğu gibi servis edilir, referans sayılmaz.
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+import fitz
+import psycopg2
+from flask import g, has_app_context, send_from_directory
+from werkzeug.exceptions import NotFound
+
+import db
+
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads"))
+UPLOAD_URL_BASE = os.getenv("UPLOAD_URL_BASE", "http://127.0.0.1:5000/uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CACHE_MAX_AGE = int(os.getenv("UPLOAD_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+UPLOAD_GC_GRACE = int(os.getenv("UPLOAD_GC_GRACE", "3600"))
+AVATAR_THUMB_SIZE = int(os.getenv("AVATAR_THUMB_SIZE", "256"))
+# Sıkıştırılmış küçük dosya çok büyük bir resme açılabilir (piksel bombası)
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", str(40 * 1000 * 1000)))
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg"}
+COPY_CHUNK = 1024 * 1024
+# pg_advisory_xact_lock(sınıf, digest'in ilk 28 biti); çakışma yalnızca gereksiz bekleme demek
+UPLOAD_LOCK_CLASS = 7301006
+
+_BLOB_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)?$")
+_STORED_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}[.a-z0-9]*$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def extension(filename):
+    ext = filename.rsplit(".", 1)[1].lower() if "." in (filename or "") else ""
+    return f".{ext}" if re.fullmatch(r"[a-z0-9]{1,8}", ext) else ""
+
+
+def blob_path(digest, ext=""):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def thumbnail_path(relpath, size=AVATAR_THUMB_SIZE):
+    match = _BLOB_RE.match(relpath or "")
+    if not match:
+        return None
+    digest = match.group(1)
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.t{size}.jpg"
+
+
+def digest_lock_key(digest):
+    return int(digest[:7], 16)
+
+
+def is_content_addressed(relpath):
+    return bool(_STORED_RE.match(relpath))
+
+
+def make_thumbnail(path, ext, size=AVATAR_THUMB_SIZE):
+    # fitz resim dosyalarını tek sayfalık belge olarak açar; en uzun kenar size piksele
+    # indirilir (küçük resimler büyütülmez). JPEG baytları döner.
+    try:
+        with fitz.open(path, filetype=ext.lstrip(".")) as doc:
+            if doc.is_pdf or doc.page_count != 1:
+                raise InvalidImage("Geçersiz resim")
+            page = doc[0]
+            width, height = page.rect.width, page.rect.height
+            if not width or not height or width * height > AVATAR_MAX_PIXELS:
+                raise InvalidImage("Geçersiz resim")
+            scale = min(1.0, size / max(width, height))
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+            return pixmap.tobytes("jpg", jpg_quality=85)
+    except InvalidImage:
+        raise
+    except Exception as e:
+        raise InvalidImage(f"Geçersiz resim: {e}")
+
+
+class UploadStore:
+    def __init__(self, root=UPLOAD_FOLDER, max_bytes=UPLOAD_MAX_BYTES, url_base=UPLOAD_URL_BASE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.url_base = url_base.rstrip("/")
+        self._tmp_dir = os.path.join(root, ".tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_saved = 0
+        self.thumbnails = 0
+        self.rejected = 0
+        self.collected = 0
+        self.discarded = 0
+
+    def _stream_to_temp(self, stream):
+        # Geçici dosya aynı dosya sisteminde: os.replace atomik
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"Dosya en fazla {self.max_bytes // (1024 * 1024)} MB olabilir")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def _place(self, relpath, tmp_path=None, data=None, replace=False):
+        # Dosya zaten varsa (aynı içerik) dokunulmaz; replace=True: satır yeni eklendi, varolan
+        # dosya silinmek üzere olabilir (geri alınan yükleme / GC) -> atomik olarak yeniden yazılır
+        path = os.path.join(self.root, relpath)
+        if os.path.exists(path) and not replace:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if data is not None:
+            fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+        os.replace(tmp_path, path)
+        return True
+
+    def _remove(self, relpath):
+        for name in (relpath, thumbnail_path(relpath)):
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def save(self, cursor, file_storage, thumbnail=False):
+        # Dosyayı saklar, referansını cursor'ın transaction'ında artırır; göreli yol döner.
+        # Çağıran commit eder. thumbnail=True: resim değilse InvalidImage.
+        # İstek dışında çağıran, commit edilmeyen işlemin dosyasını kendisi siler.
+        ext = extension(file_storage.filename)
+        try:
+            tmp_path, digest, size = self._stream_to_temp(file_storage.stream)
+        except UploadTooLarge:
+            with self._lock:
+                self.rejected += 1
+            raise
+        try:
+            thumb = make_thumbnail(tmp_path, ext) if thumbnail else None
+            # Aynı içeriğin geri alınan yüklemesinin temizliği bu işlem bitene kadar bekler
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (UPLOAD_LOCK_CLASS, digest_lock_key(digest)))
+            # xmax = 0: satır bu işlemde eklendi (GC silmiş ya da hiç yoktu)
+            cursor.execute(
+                """
+                INSERT INTO upload_blobs (digest, path, size, refcount)
+                VALUES (%s, %s, %s, 1)
+                ON CONFLICT (digest) DO UPDATE
+                    SET refcount = upload_blobs.refcount + 1, released_at = NULL
+                RETURNING path, xmax = 0
+                """,
+                (digest, blob_path(digest, ext), size)
+            )
+            # İlk yüklemenin uzantısı kalıcıdır
+            relpath, inserted = cursor.fetchone()
+            placed = self._place(relpath, tmp_path, replace=inserted)
+            thumb_placed = thumb is not None and self._place(thumbnail_path(relpath), data=thumb, replace=inserted)
+            if inserted and has_app_context():
+                g.setdefault("placed_uploads", []).append(relpath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            if placed:
+                self.stored += 1
+            else:
+                self.deduplicated += 1
+                self.bytes_saved += size
+            if thumb_placed:
+                self.thumbnails += 1
+        return relpath
+
+    def release(self, cursor, relpath):
+        # Eski (düz isimli) dosyalar sayılmaz
+        match = _BLOB_RE.match(relpath or "")
+        if not match:
+            return
+        cursor.execute(
+            """
+            UPDATE upload_blobs
+            SET refcount = GREATEST(refcount - 1, 0),
+                released_at = CASE WHEN refcount <= 1 THEN NOW() ELSE released_at END
+            WHERE digest = %s
+            """,
+            (match.group(1),)
+        )
+
+    def discard_uncommitted(self, exception=None):
+        # teardown_appcontext: istekte yeni satırla yazılan dosyalardan, satırı commit
+        # edilmemiş olanları siler. İsteğin işlemi önce bitirilir (commit edilmediyse geri
+        # alınır, save'in advisory lock'u bırakılır).
+        placed = g.pop("placed_uploads", None)
+        if not placed:
+            return
+        db.release_db(exception)
+        paths = {_BLOB_RE.match(relpath).group(1): relpath for relpath in placed}
+        try:
+            with db.connection() as conn:
+                cursor = conn.cursor()
+                # Kilitler sabit sırayla (iki istek aynı iki dosyayı yüklerse kilitlenmesin)
+                for digest in sorted(paths):
+                    # Aynı içeriği yükleyen başka işlem varsa onun commit'i beklenir
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)",
+                                   (UPLOAD_LOCK_CLASS, digest_lock_key(digest)))
+                    cursor.execute("SELECT 1 FROM upload_blobs WHERE digest = %s", (digest,))
+                    if cursor.fetchone() is None:
+                        self._remove(paths[digest])
+                        with self._lock:
+                            self.discarded += 1
+        except psycopg2.Error as e:
+            # Dosya satırsız kalır; içerik adresli olduğu için aynı yükleme onu yeniden kullanır
+            print("Geri alınan yükleme temizlenemedi:", e)
+
+    def collect_garbage(self, conn, grace=UPLOAD_GC_GRACE, limit=100):
+        # Referansı grace saniyedir 0 olan dosyaları (ve küçük resimlerini) siler. Dosyalar
+        # satırlar kilitliyken, commit'ten önce silinir: aynı içeriği yeniden yükleyen save
+        # INSERT'te bekler, commit sonrası yeni satır ekleyip dosyayı yeniden yazar
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM upload_blobs WHERE digest IN (
+                SELECT digest FROM upload_blobs
+                WHERE refcount = 0 AND released_at < NOW() - make_interval(secs => %s)
+                LIMIT %s FOR UPDATE SKIP LOCKED
+            )
+            RETURNING path
+            """,
+            (grace, limit)
+        )
+        paths = [row[0] for row in cursor.fetchall()]
+        for relpath in paths:
+            self._remove(relpath)
+        conn.commit()
+        with self._lock:
+            self.collected += len(paths)
+        return len(paths)
+
+    def url(self, relpath):
+        return f"{self.url_base}/{relpath}" if relpath else ""
+
+    def avatar_url(self, relpath):
+        # Küçük resim varsa o; eski avatarlar için orijinal
+        thumb = thumbnail_path(relpath)
+        if thumb and os.path.exists(os.path.join(self.root, thumb)):
+            return self.url(thumb)
+        return self.url(relpath)
+
+    def send(self, relpath):
+        # Range ve If-None-Match / If-Modified-Since: send_from_directory (conditional)
+        if any(part.startswith(".") for part in relpath.split("/")):
+            raise NotFound()
+        if is_content_addressed(relpath):
+            response = send_from_directory(self.root, relpath, max_age=UPLOAD_CACHE_MAX_AGE)
+            response.headers["Cache-Control"] = f"public, max-age={UPLOAD_CACHE_MAX_AGE}, immutable"
+            return response
+        response = send_from_directory(self.root, relpath, max_age=0)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "bytes_saved": self.bytes_saved,
+                "thumbnails": self.thumbnails,
+                "rejected": self.rejected,
+                "collected": self.collected,
+                "discarded": self.discarded
+            }
@@ -0,0 +1,9 @@
+# -----------------------
+# Üretim giriş noktası
+# -----------------------
+# Kullanım: gunicorn -c gunicorn.conf.py wsgi:app
+# Her worker bu modülü kendisi import eder (preload yok): DB havuzu, Gemini
+# oturumu ve iş kuyruğu süreçleri worker başına ve ilk kullanımda açılır.
+from server import create_app
+
+app = create_app()
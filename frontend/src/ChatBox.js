@@ -54,15 +54,41 @@ export default function ChatBox({ token, selectedChat, onAnyMessageSent }) {
     setLoading(true);
 
     try {
-      const res = await axios.post(
-        `http://127.0.0.1:5000/chat/${selectedChat}`,
-        { message: messageText },
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
-
-      const botReply = res.data?.reply || "⚠️ Yanıt alınamadı.";
-      const botMsg = { sender: "bot", text: botReply };
-      setMessages(prev => [...prev, botMsg]);
+      // Streaming (SSE) cevap: parçalar geldikçe bot mesajını güncelle
+      const res = await fetch(`http://127.0.0.1:5000/chat/${selectedChat}?stream=1`, {
+        method: "POST",
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": "application/json",
+          Accept: "text/event-stream",
+        },
+        body: JSON.stringify({ message: messageText }),
+      });
+      if (!res.ok) throw new Error((await res.json())?.error || res.statusText);
+
+      setMessages(prev => [...prev, { sender: "bot", text: "" }]);
+      const updateBotMsg = text =>
+        setMessages(prev => [...prev.slice(0, -1), { sender: "bot", text }]);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let botReply = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const evt of events) {
+          const dataLine = evt.split("\n").find(l => l.startsWith("data:"));
+          if (!dataLine) continue;
+          const data = JSON.parse(dataLine.slice(5));
+          botReply = data.reply !== undefined ? data.reply : botReply + data.text;
+          updateBotMsg(botReply);
+        }
+      }
+      if (!botReply) updateBotMsg("⚠️ Yanıt alınamadı.");
       if (onAnyMessageSent) onAnyMessageSent();
     } catch (err) {
       console.error("Mesaj gönderme hatası:", err.response?.data || err.message);
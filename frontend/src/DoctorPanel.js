@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef, useCallback } from "react";
 import axios from "axios";
 import DoctorHeader from "./DoctorHeader";
 import "./DoctorPanel.css";
+import { openEventStream } from "./eventStream";
 import { FaDownload, FaPaperclip } from "react-icons/fa";
 
 
@@ -13,21 +14,24 @@ export default function DoctorPanel({ token }) {
   const [fileToSend, setFileToSend] = useState({});
   const messagesEndRef = useRef({});
 
-  const fetchQuestions = useCallback(async () => {
+  const [nextCursor, setNextCursor] = useState(null);
+
+  // İlk sayfa (en yeni sorular); "Daha fazla" ile ?before=<cursor> sonraki sayfa
+  const fetchQuestions = useCallback(async (before = null) => {
     try {
       const res = await axios.get("http://127.0.0.1:5000/doctor-questions", {
         headers: { Authorization: `Bearer ${token}` },
+        params: before ? { before } : {},
       });
-      // ID bazlı uniq
-      const uniqueQuestions = [];
-      const ids = new Set();
-      res.data.forEach(q => {
-        if (!ids.has(q.id)) {
-          ids.add(q.id);
-          uniqueQuestions.push(q);
-        }
+      // ID bazlı uniq; önceden yüklenmiş eski sayfalar korunur
+      const ids = new Set(res.data.map(q => q.id));
+      setQuestions(prev => {
+        const kept = prev.filter(q => !ids.has(q.id));
+        return before ? [...prev, ...res.data.filter(q => !prev.some(p => p.id === q.id))] : [...res.data, ...kept];
       });
-      setQuestions(uniqueQuestions);
+      const cursor = res.headers["x-next-cursor"] || null;
+      if (before || !cursor) setNextCursor(cursor);
+      else setNextCursor(prev => prev ?? cursor);
     } catch (err) {
       console.error(err);
     }
@@ -35,15 +39,8 @@ export default function DoctorPanel({ token }) {
 
 
 
-  useEffect(() => {
-    fetchQuestions(); // dışarıdaki fonksiyon
-    const interval = setInterval(() => fetchQuestions(), 5000);
-    return () => clearInterval(interval);
-  }, [fetchQuestions]); // dependency olarak ekle
-
-
   // Mesajları çek
-  const fetchMessages = async (questionId) => {
+  const fetchMessages = useCallback(async (questionId) => {
     try {
       const res = await axios.get(
         `http://127.0.0.1:5000/doctor-question/${questionId}/messages`,
@@ -54,7 +51,37 @@ export default function DoctorPanel({ token }) {
     } catch (err) {
       console.error(err);
     }
-  };
+  }, [token]);
+
+  // Olay gelince yalnızca ilgili soru yeniden çekilir
+  const activeQuestionRef = useRef(null);
+  useEffect(() => {
+    activeQuestionRef.current = activeQuestionId;
+  }, [activeQuestionId]);
+
+  // Polling yerine sunucu olayları (SSE); "ready" her (yeniden) bağlanmada gelir
+  useEffect(() => {
+    const refreshQuestions = () => fetchQuestions();
+    const resync = () => {
+      fetchQuestions();
+      if (activeQuestionRef.current) fetchMessages(activeQuestionRef.current);
+    };
+    return openEventStream(
+      `http://127.0.0.1:5000/events?token=${encodeURIComponent(token)}`,
+      {
+        ready: refreshQuestions,
+        question: refreshQuestions,
+        status: refreshQuestions,
+        resync,
+        message: (e) => {
+          const { question_id } = JSON.parse(e.data);
+          fetchQuestions();
+          if (activeQuestionRef.current === question_id) fetchMessages(question_id);
+        },
+      },
+      resync
+    );
+  }, [token, fetchQuestions, fetchMessages]);
 
   // Mesaj gönder (metin + opsiyonel dosya)
   const sendMessage = async (questionId) => {
@@ -153,6 +180,11 @@ export default function DoctorPanel({ token }) {
 
               </div>
             ))}
+            {nextCursor && (
+              <button className="load-more-button" onClick={() => fetchQuestions(nextCursor)}>
+                Daha fazla
+              </button>
+            )}
           </div>
         </div>
 
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useCallback, useRef } from "react";
 import axios from "axios";
 import "./DoktoraSor.css";
+import { openEventStream } from "./eventStream";
 import { FaTrash, FaPaperclip, FaDownload} from "react-icons/fa";
 
 
@@ -18,16 +19,47 @@ export default function DoktoraSor({ token }) {
   const [fileForQuestion, setFileForQuestion] = useState(null);
   const [fileForMessage, setFileForMessage] = useState(null);
 
+  // Koşullu GET + delta: son ETag ve cursor saklanır; değişmediyse 304,
+  // değiştiyse yalnızca yeni/değişen kayıtlar gelir
+  const questionsSyncRef = useRef({ etag: null, cursor: null });
+  const messagesSyncRef = useRef({ questionId: null, etag: null, cursor: null });
+  useEffect(() => {
+    questionsSyncRef.current = { etag: null, cursor: null };
+    messagesSyncRef.current = { questionId: null, etag: null, cursor: null };
+  }, [token]);
+
+  const syncRequest = (sync) => ({
+    headers: {
+      Authorization: `Bearer ${token}`,
+      ...(sync.etag ? { "If-None-Match": sync.etag } : {}),
+    },
+    params: sync.cursor ? { since: sync.cursor } : {},
+    validateStatus: (status) => status === 200 || status === 304,
+  });
+
   // Kullanıcının tüm sorularını çek
   const fetchQuestions = useCallback(async () => {
     try {
-      const res = await axios.get("http://127.0.0.1:5000/my-questions", {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setQuestions(res.data);
+      const sync = questionsSyncRef.current;
+      const res = await axios.get("http://127.0.0.1:5000/my-questions", syncRequest(sync));
+      if (res.status === 304) return;
+      questionsSyncRef.current = { etag: res.headers["etag"], cursor: res.headers["x-next-cursor"] };
+      if (!sync.cursor) {
+        setQuestions(res.data);
+        return;
+      }
+      // Değişenleri birleştir, silinenleri çıkar
+      const changed = new Set(res.data.map((q) => q.id));
+      setQuestions((prev) =>
+        prev
+          .filter((q) => !changed.has(q.id))
+          .concat(res.data.filter((q) => !q.deleted))
+          .sort((a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id)
+      );
     } catch (err) {
       console.error("Sorular alınamadı:", err);
     }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [token]);
 
 useEffect(() => {
@@ -49,16 +81,26 @@ const fetchMessages = useCallback(
   async (qId = selectedQuestion?.id) => {
     if (!qId) return;
     try {
+      // Başka soruya geçildiyse tam liste, aynı soruda yalnızca yeni mesajlar
+      if (messagesSyncRef.current.questionId !== qId) {
+        messagesSyncRef.current = { questionId: qId, etag: null, cursor: null };
+      }
+      const sync = messagesSyncRef.current;
       const res = await axios.get(
         `http://127.0.0.1:5000/doctor-question/${qId}/messages`,
-        { headers: { Authorization: `Bearer ${token}` } }
+        syncRequest(sync)
       );
-      setMessages(res.data);
+      // Cevap gelene kadar başka soru açıldıysa uygulama
+      if (res.status === 304 || messagesSyncRef.current !== sync) return;
+      messagesSyncRef.current = { questionId: qId, etag: res.headers["etag"], cursor: res.headers["x-next-cursor"] };
+      if (sync.cursor) setMessages((prev) => [...prev, ...res.data]);
+      else setMessages(res.data);
       // scrollToBottom(); 
     } catch (err) {
       console.error("Mesajlar alınamadı:", err);
     }
   },
+  // eslint-disable-next-line react-hooks/exhaustive-deps
   [selectedQuestion, token]
 );
 
@@ -159,19 +201,28 @@ const scrollToBottom = () => {
   };
 
   
+  // Olay gelince yalnızca açık soru yeniden çekilir (ref: soru değişince bağlantı yenilenmesin)
+  const selectedQuestionRef = useRef(null);
+  const fetchMessagesRef = useRef(fetchMessages);
   useEffect(() => {
-    fetchQuestions();
-    const interval = setInterval(() => fetchQuestions(), 3000);
-    return () => clearInterval(interval);
-  }, [fetchQuestions]);
+    selectedQuestionRef.current = selectedQuestion;
+    fetchMessagesRef.current = fetchMessages;
+  }, [selectedQuestion, fetchMessages]);
 
-  // Mesajları 3 saniyede bir güncelle
+  // 3 saniyelik polling yerine sunucu olayları (SSE); "ready" her (yeniden) bağlanmada gelir
   useEffect(() => {
-    if (selectedQuestion) {
-      const interval = setInterval(() => fetchMessages(), 3000);
-      return () => clearInterval(interval);
-    }
-  }, [selectedQuestion, fetchMessages]);
+    const refresh = (questionId) => {
+      fetchQuestions();
+      const open = selectedQuestionRef.current;
+      if (open && (questionId === undefined || open.id === questionId)) fetchMessagesRef.current(open.id);
+    };
+    const onEvent = (e) => refresh(JSON.parse(e.data).question_id);
+    return openEventStream(
+      `http://127.0.0.1:5000/events?token=${encodeURIComponent(token)}`,
+      { ready: () => refresh(), resync: () => refresh(), question: onEvent, message: onEvent, status: onEvent },
+      () => refresh()
+    );
+  }, [token, fetchQuestions]);
 
   return (
     <div className="doktor-sor-container">
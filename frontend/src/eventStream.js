@@ -0,0 +1,29 @@
+// /events (SSE) bağlantısı. Sunucu worker başına abonelik sınırındaysa 503 döner ve
+// EventSource kendiliğinden yeniden bağlanmaz: bu durumda listeyi bir kez yenileyip
+// 10-20 sn sonra tekrar bağlanılır (bekleyen panel kaçırdığı olayları "ready" ile toplar).
+const RETRY_MIN_MS = 10000;
+const RETRY_JITTER_MS = 10000;
+
+export function openEventStream(url, listeners, onFallback) {
+  let source = null;
+  let timer = null;
+  let stopped = false;
+
+  const connect = () => {
+    source = new EventSource(url);
+    Object.entries(listeners).forEach(([type, fn]) => source.addEventListener(type, fn));
+    source.onerror = () => {
+      // CONNECTING: tarayıcı kendisi yeniden bağlanıyor
+      if (stopped || source.readyState !== EventSource.CLOSED) return;
+      onFallback();
+      timer = setTimeout(connect, RETRY_MIN_MS + Math.random() * RETRY_JITTER_MS);
+    };
+  };
+
+  connect();
+  return () => {
+    stopped = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+}